@@ -5,12 +5,22 @@ import time
 import base64
 import zipfile
 import io
+import pandas as pd
 from datetime import datetime
 from dotenv import load_dotenv
-from src.gestion_bdd import initialiser_bdd, bdd_est_disponible, ajouter_fournisseur_db, trouver_associations_fournisseur, update_regles_fournisseur, ajouter_ecriture_comptable, get_fournisseur_info, get_fournisseur_details, update_fournisseur_full
-from src.appels_ia import initialisation_client_gemini, get_infos_facture, application_regle_imputation_V2
-from src.pdf_manager import ajouter_texte_definitif
+from src.gestion_bdd import ajouter_fournisseur_db, get_profil_fournisseur, update_regles_fournisseur, update_fournisseur_full
+from src.appels_ia import get_infos_facture, application_regle_imputation_V2, extraire_facture_complete, extraire_valeurs_regles, liberer_documents, AIDE_REGLE
+from src.pdf_manager import ajouter_texte_definitif, extraire_factures_pdf
+from src.prechargement import get_prechargeur, planifier_analyses, ATTENTE_ECRAN_DEFAUT
+from src.client_gemini import get_disjoncteur
+from src.modeles_fournisseurs import imputations_par_modele, convertir_montant
 from src.compression_pdf import compresser_pdf
+from src.ressources import get_ressources
+from src.traitement_lot import seuil_mode_lot, soumettre_lot, etat_lot, avancement_lot, recuperer_resultats_lot
+from src.resolution_fournisseurs import get_resolveur, reconnaitre_fournisseur
+from src.journal_ecritures import get_journal
+from src.doublons_factures import fichiers_deja_traites, factures_deja_traitees, empreinte_facture, description_facture
+from src.cache_ia import calculer_empreinte
 
 # Configuration de la page
 
@@ -38,9 +48,41 @@ def cleanup_temp_files():
         os.makedirs(TEMP_DIR, exist_ok=True)
         os.makedirs(READY_DIR, exist_ok=True)
 
+def repartir_factures(temp_path, infos_factures, nom_fichier, db_url=None):
+    """
+    Découpe un fichier uploadé selon les factures détectées et mémorise leurs infos.
+    Retourne la liste des chemins à traiter (le fichier d'origine s'il n'y a qu'une facture).
+    Si `db_url` est donné, les factures déjà validées (même fournisseur, numéro, date et total)
+    sont écartées et signalées.
+    """
+    fichiers_a_ajouter = [temp_path] # Par défaut, on garde le fichier tel quel
+
+    if infos_factures and len(infos_factures) > 1:
+        # Découpage physique
+        chemins_split = extraire_factures_pdf(temp_path, infos_factures, dossier_sortie=TEMP_DIR)
+        if chemins_split:
+            fichiers_a_ajouter = chemins_split
+            # On supprime le fichier original "upload_" car il est remplacé par les splits
+            # os.remove(temp_path) # Optionnel : garder pour debug ou supprimer
+        else:
+            st.warning(f"Échec du découpage pour {nom_fichier}, traitement du fichier entier.")
+
+    # On garde les infos de chaque facture et le document source (pages reprises par la passe "règles")
+    if infos_factures and len(infos_factures) == len(fichiers_a_ajouter):
+        for chemin, infos in zip(fichiers_a_ajouter, infos_factures):
+            st.session_state["infos_factures"][chemin] = {**infos, "source": temp_path, "nb_factures_source": len(infos_factures)}
+
+        if db_url:
+            doublons = factures_deja_traitees(infos_factures, db_url)
+            for facture in doublons.values():
+                st.session_state["doublons"].append(f"{nom_fichier} : {description_facture(facture)}")
+            fichiers_a_ajouter = [chemin for position, chemin in enumerate(fichiers_a_ajouter) if position not in doublons]
+
+    return fichiers_a_ajouter
+
 @st.dialog("Modifier le fournisseur")
 def show_edit_supplier_dialog(nom_fournisseur, db_url):
-    data_fournisseur = get_fournisseur_details(nom_fournisseur, db_url)
+    data_fournisseur = get_profil_fournisseur(nom_fournisseur, db_url)
     if not data_fournisseur:
         st.error("Impossible de récupérer les données du fournisseur.")
         return
@@ -53,17 +95,22 @@ def show_edit_supplier_dialog(nom_fournisseur, db_url):
         new_mode = c2.selectbox("Mode", ["A", "M"], index=0 if data_fournisseur["mode"] == "A" else 1, format_func=lambda x: "Automatique" if x == "A" else "Manuel")
 
         st.markdown("#### Comptes et Règles")
-        new_comptes_regles = {}
-        for i in range(1, 7):
-            cc1, cc2 = st.columns(2)
-            compte_key = f"compte{i}"
-            regle_key = f"regle{i}"
-            
-            val_compte = data_fournisseur.get(compte_key) or ""
-            val_regle = data_fournisseur.get(regle_key) or ""
-            
-            new_comptes_regles[compte_key] = cc1.text_input(f"Compte {i}", value=val_compte)
-            new_comptes_regles[regle_key] = cc2.text_input(f"Règle {i}", value=val_regle)
+        regles_editees = st.data_editor(
+            pd.DataFrame(data_fournisseur["associations"], columns=["compte", "regle"]),
+            num_rows="dynamic",
+            use_container_width=True,
+            hide_index=True,
+            column_config={
+                "compte": st.column_config.TextColumn("Compte"),
+                "regle": st.column_config.TextColumn("Règle", help=AIDE_REGLE),
+            },
+            key="regles_dialog",
+        )
+        new_associations = [
+            (str(ligne["compte"]).strip(), ligne["regle"] if pd.notna(ligne["regle"]) else "")
+            for ligne in regles_editees.to_dict("records")
+            if pd.notna(ligne["compte"]) and str(ligne["compte"]).strip()
+        ]
 
         submitted = st.form_submit_button("Enregistrer les modifications")
         
@@ -72,7 +119,7 @@ def show_edit_supplier_dialog(nom_fournisseur, db_url):
                 "fournisseur": nom_fournisseur, # On ne change pas le nom ici pour simplifier
                 "fournisseur_associe": new_associe,
                 "mode": new_mode,
-                **new_comptes_regles
+                "associations": new_associations
             }
             
             if update_fournisseur_full(nom_fournisseur, update_data, db_url):
@@ -100,22 +147,55 @@ def ajout_factures_page():
             st.error("Clé API Gemini manquante (.env)")
             st.stop()
 
+        # Base et client Gemini partagés par le processus : aucun appel réseau ici,
+        # l'état de la base est tenu à jour en arrière-plan
+        ressources = get_ressources()
+
         # Vérification BDD
-        db_url = os.getenv("DATABASE_URL")
-        if db_url and initialiser_bdd(db_url) and bdd_est_disponible(db_url):
+        db_url = ressources.db_url
+        if db_url and ressources.base_disponible():
             st.success("Base de données connectée")
         else:
             st.error("Base de données indisponible (Vérifiez .env)")
             st.stop()
 
-        # Initialisation Client Gemini
-        client = initialisation_client_gemini()
+        # Client Gemini
+        client = ressources.client_gemini()
         if client:
             st.success("Client IA prêt")
         else:
             st.error("Erreur client Gemini")
             st.stop()
 
+        # Quota ou service Gemini en défaut : les appels (et le préchargement) sont suspendus
+        pause_ia = get_disjoncteur().temps_restant()
+        if pause_ia > 0:
+            st.warning(f"Appels IA suspendus (quota atteint) : reprise dans {pause_ia:.0f} s")
+
+        # Écritures validées pas encore arrivées en base
+        journal = get_journal()
+        etat_journal = journal.etat()
+        if etat_journal["en_echec"]:
+            st.warning(f"⏳ {etat_journal['en_attente']} facture(s) en attente d'enregistrement en base (nouvel essai automatique)")
+        elif etat_journal["en_attente"]:
+            st.info(f"⏳ {etat_journal['en_attente']} facture(s) en cours d'enregistrement en base")
+
+        # Factures refusées à plusieurs reprises par une base joignable : plus de nouvel essai automatique
+        if etat_journal["rejetees"]:
+            st.error(f"❌ {etat_journal['rejetees']} facture(s) refusée(s) par la base de données")
+            with st.expander("Factures refusées"):
+                for facture in journal.factures_rejetees():
+                    date_texte = facture["date_facture"].strftime("%d/%m/%Y") if facture["date_facture"] else "sans date"
+                    st.markdown(f"**{facture['fournisseur'] or 'Inconnu'}** ({date_texte}, {facture['montant']} €)  \n"
+                                f"{facture['nom_fichier'] or ''} : {facture['erreur'] or ''}")
+                    c_relancer, c_abandonner = st.columns(2)
+                    if c_relancer.button("Réessayer", key=f"relancer_journal_{facture['id']}"):
+                        journal.relancer(facture["id"])
+                        st.rerun()
+                    if c_abandonner.button("Abandonner", key=f"abandonner_journal_{facture['id']}"):
+                        journal.abandonner(facture["id"])
+                        st.rerun()
+
     # Initialisation de la clé du uploader pour permettre le reset
     if "uploader_key" not in st.session_state:
         st.session_state["uploader_key"] = 0
@@ -146,11 +226,13 @@ def ajout_factures_page():
             
         if st.button("Nouvelle série"):
             # Nettoyage complet
-            keys_to_delete = ["current_index", "files_to_process", "last_upload_names", "fournisseur", "date_facture", "imputations", "pdf_processed", "creation_mode", "current_file", "batch_finished", "processed_files"]
+            keys_to_delete = ["current_index", "files_to_process", "infos_factures", "last_upload_names", "doublons", "doublons_forces", "fournisseur", "date_facture", "imputations", "pdf_processed", "creation_mode", "current_file", "batch_finished", "processed_files", "lot_en_cours"]
             for k in keys_to_delete:
                 if k in st.session_state:
                     del st.session_state[k]
-            # Nettoyage des fichiers temporaires
+            # Nettoyage des fichiers temporaires (locaux et côté Gemini)
+            get_prechargeur().vider()
+            liberer_documents()
             cleanup_temp_files()
             st.rerun()
             
@@ -173,6 +255,16 @@ def ajout_factures_page():
         # --- PRÉ-TRAITEMENT : Détection et Découpage des Factures Multiples ---
         # On vérifie si la liste des fichiers uploadés a changé pour relancer le découpage
         current_upload_names = [f.name for f in uploaded_files_obj]
+
+        # Mode lot : extraction de toute la série en un seul travail Gemini (moins cher, résultat différé)
+        mode_lot = False
+        if len(uploaded_files_obj) >= seuil_mode_lot():
+            mode_lot = st.toggle(
+                "📦 Mode lot",
+                key="mode_lot",
+                help="Analyse de toute la série en différé via l'API Batch de Gemini (coût réduit). "
+                     "Le traitement peut prendre plusieurs minutes."
+            )
         
         if "files_to_process" not in st.session_state or \
            "last_upload_names" not in st.session_state or \
@@ -180,54 +272,67 @@ def ajout_factures_page():
             
             st.session_state["last_upload_names"] = current_upload_names
             st.session_state["files_to_process"] = [] # Liste des chemins de fichiers finaux à traiter
+            st.session_state["infos_factures"] = {} # Résultat de l'extraction combinée, par chemin de fichier
+            get_prechargeur().vider() # Les analyses et documents de la série précédente ne servent plus
+            liberer_documents()
             st.session_state["processed_files"] = [] # Liste des fichiers traités prêts pour le ZIP
+            st.session_state["doublons"] = [] # Factures écartées car déjà traitées
+
+            # Fichiers déjà traités (même contenu, toutes les factures validées) : écartés avant
+            # tout appel à Gemini, sauf si l'utilisateur a demandé à les retraiter
+            doublons_forces = st.session_state.get("doublons_forces") == current_upload_names
+            empreintes = {f.name: calculer_empreinte(f.getvalue()) for f in uploaded_files_obj}
+            deja_traites = {} if doublons_forces else fichiers_deja_traites(list(empreintes.values()), db_url)
+            fichiers_nouveaux = []
+            for uploaded_file in uploaded_files_obj:
+                factures = deja_traites.get(empreintes[uploaded_file.name])
+                if factures:
+                    st.session_state["doublons"].append(
+                        f"{uploaded_file.name} : " + " ; ".join(description_facture(f) for f in factures)
+                    )
+                else:
+                    fichiers_nouveaux.append(uploaded_file)
+            db_url_doublons = None if doublons_forces else db_url
             
             # On s'assure que le dossier temp existe
             os.makedirs(TEMP_DIR, exist_ok=True)
             os.makedirs(READY_DIR, exist_ok=True)
             
+            if mode_lot and fichiers_nouveaux:
+                # Sauvegarde de tous les fichiers puis soumission d'un seul lot
+                chemins_upload = []
+                for uploaded_file in fichiers_nouveaux:
+                    temp_path = os.path.join(TEMP_DIR, f"upload_{uploaded_file.name}")
+                    with open(temp_path, "wb") as f:
+                        f.write(uploaded_file.getbuffer())
+                    chemins_upload.append(temp_path)
+
+                with st.spinner("Soumission du lot à Gemini..."):
+                    st.session_state["lot_en_cours"] = {
+                        "suivi": soumettre_lot(chemins_upload, client),
+                        "chemins": chemins_upload,
+                        "db_url_doublons": db_url_doublons,
+                    }
+
             progress_bar = st.progress(0)
             status_text = st.empty()
             
-            for idx, uploaded_file in enumerate(uploaded_files_obj):
-                status_text.text(f"Analyse du fichier {idx+1}/{len(uploaded_files_obj)} : {uploaded_file.name}...")
-                progress_bar.progress((idx) / len(uploaded_files_obj))
+            for idx, uploaded_file in enumerate(fichiers_nouveaux if not mode_lot else []):
+                status_text.text(f"Analyse du fichier {idx+1}/{len(fichiers_nouveaux)} : {uploaded_file.name}...")
+                progress_bar.progress((idx) / len(fichiers_nouveaux))
                 
                 # 1. Sauvegarde temporaire du fichier uploadé
                 temp_path = os.path.join(TEMP_DIR, f"upload_{uploaded_file.name}")
                 with open(temp_path, "wb") as f:
                     f.write(uploaded_file.getbuffer())
                 
-                # 2. Vérification du nombre de pages
-                try:
-                    from pypdf import PdfReader
-                    reader = PdfReader(temp_path)
-                    num_pages = len(reader.pages)
-                except Exception as e:
-                    st.error(f"Erreur lecture PDF {uploaded_file.name}: {e}")
-                    num_pages = 1 # Fallback
-                
-                fichiers_a_ajouter = [temp_path] # Par défaut, on garde le fichier tel quel
+                # 2. Extraction combinée : découpage + fournisseur, date, numéro, total en un seul appel
+                status_text.text(f"Analyse IA de : {uploaded_file.name}...")
+                infos_factures = extraire_facture_complete(temp_path, client)
                 
-                # 3. Si > 1 page, on demande à l'IA s'il y a plusieurs factures
-                if num_pages > 1:
-                    status_text.text(f"Analyse IA multi-factures pour : {uploaded_file.name}...")
-                    from src.appels_ia import analyser_et_separer_factures
-                    from src.pdf_manager import extraire_factures_pdf
-                    
-                    # Appel IA pour détecter les factures
-                    infos_factures = analyser_et_separer_factures(temp_path, client)
-                    
-                    if infos_factures and len(infos_factures) > 1:
-                        status_text.text(f"Découpage de {len(infos_factures)} factures détectées dans {uploaded_file.name}...")
-                        # Découpage physique
-                        chemins_split = extraire_factures_pdf(temp_path, infos_factures, dossier_sortie=TEMP_DIR)
-                        if chemins_split:
-                            fichiers_a_ajouter = chemins_split
-                            # On supprime le fichier original "upload_" car il est remplacé par les splits
-                            # os.remove(temp_path) # Optionnel : garder pour debug ou supprimer
-                        else:
-                            st.warning(f"Échec du découpage pour {uploaded_file.name}, traitement du fichier entier.")
+                if infos_factures and len(infos_factures) > 1:
+                    status_text.text(f"Découpage de {len(infos_factures)} factures détectées dans {uploaded_file.name}...")
+                fichiers_a_ajouter = repartir_factures(temp_path, infos_factures, uploaded_file.name, db_url_doublons)
                 
                 # Ajout des fichiers (splités ou original) à la liste de traitement
                 st.session_state["files_to_process"].extend(fichiers_a_ajouter)
@@ -237,10 +342,49 @@ def ajout_factures_page():
             
             # Reset des index de traitement
             st.session_state["current_index"] = 0
-            keys_to_reset = ["fournisseur", "date_facture", "imputations", "pdf_processed", "creation_mode", "current_file"]
+            keys_to_reset = ["fournisseur", "fournisseur_lu", "date_facture", "imputations", "pdf_processed", "creation_mode", "current_file"]
             for k in keys_to_reset:
                 if k in st.session_state: del st.session_state[k]
 
+        # Lot soumis : on attend ses résultats avant de commencer la validation
+        if "lot_en_cours" in st.session_state:
+            lot = st.session_state["lot_en_cours"]
+            etat = etat_lot(lot["suivi"], client)
+
+            if etat == "en_cours":
+                traites, total = avancement_lot(lot["suivi"], client)
+                st.info(f"📦 Lot en cours de traitement par Gemini : {traites} / {total} fichiers analysés.")
+                if st.button("🔄 Actualiser"):
+                    st.rerun()
+                st.stop()
+
+            if etat == "echec":
+                st.warning("Le lot Gemini a échoué : les fichiers sans résultat sont analysés un par un.")
+
+            resultats = recuperer_resultats_lot(lot["suivi"], client)
+            with st.spinner("Répartition des factures du lot..."):
+                for temp_path in lot["chemins"]:
+                    infos_factures = resultats.get(temp_path)
+                    if infos_factures is None:
+                        # Absent du lot (erreur, lot échoué) : analyse interactive
+                        infos_factures = extraire_facture_complete(temp_path, client)
+                    st.session_state["files_to_process"].extend(
+                        repartir_factures(temp_path, infos_factures, os.path.basename(temp_path), lot.get("db_url_doublons"))
+                    )
+            del st.session_state["lot_en_cours"]
+            st.session_state["current_index"] = 0
+
+        # Factures écartées car déjà traitées (aucune analyse ni saisie en double)
+        if st.session_state.get("doublons"):
+            st.warning(
+                "♻️ Déjà traité(s) et validé(s), ignoré(s) :\n\n"
+                + "\n".join(f"- {doublon}" for doublon in st.session_state["doublons"])
+            )
+            if st.button("Traiter quand même", key="forcer_doublons"):
+                st.session_state["doublons_forces"] = current_upload_names
+                del st.session_state["last_upload_names"] # Relance le pré-traitement
+                st.rerun()
+
         # --- FIN PRÉ-TRAITEMENT ---
 
         # Récupération de la liste des fichiers à traiter (chemins absolus ou relatifs)
@@ -280,7 +424,7 @@ def ajout_factures_page():
             st.session_state["current_file"] = current_file_name
             
             # Reset des états spécifiques au fichier
-            keys_to_reset = ["fournisseur", "date_facture", "imputations", "imputations_file", "pdf_processed", "creation_mode"]
+            keys_to_reset = ["fournisseur", "fournisseur_lu", "date_facture", "imputations", "imputations_file", "pdf_processed", "creation_mode"]
             for k in keys_to_reset:
                 if k in st.session_state: del st.session_state[k]
             
@@ -289,8 +433,7 @@ def ajout_factures_page():
             for key in st.session_state.keys():
                 if isinstance(key, str) and (
                     key.startswith("input_") or 
-                    key.startswith("man_compte_") or 
-                    key.startswith("man_montant_") or
+                    key.startswith("man_lignes_") or
                     key.startswith("manual_mode_") or
                     key.startswith("paiement_radio_") or
                     key.startswith("num_cheque_") or
@@ -306,13 +449,45 @@ def ajout_factures_page():
 
 
         # Étape 1 : Identification (Nom + Date)
+        infos_courantes = st.session_state.get("infos_factures", {}).get(current_file_path)
+
+        # Analyses en arrière-plan : la facture affichée en priorité, puis les suivantes
+        # pendant que l'utilisateur valide celle-ci
+        prechargeur = get_prechargeur()
+        planifier_analyses(prechargeur, files_to_process, st.session_state["current_index"], client, db_url, st.session_state.get("infos_factures"))
+
         if "fournisseur" not in st.session_state:
             with st.spinner("Analyse de la facture (Fournisseur & Date)..."):
-                # On utilise temp_working_path qui est la copie de travail
-                nom_fournisseur, date_str = get_infos_facture(temp_working_path, client)
+                # Attente bornée : inutile si l'extraction combinée a déjà donné fournisseur et date,
+                # ou si le disjoncteur est ouvert (la tâche attend alors la reprise des appels)
+                if infos_courantes or get_disjoncteur().est_ouvert():
+                    attente = 0
+                else:
+                    attente = ATTENTE_ECRAN_DEFAUT
+                analyse = prechargeur.obtenir(current_file_path, timeout=attente)
+                if analyse:
+                    # Fournisseur déjà reconnu en arrière-plan d'après le nom lu
+                    nom_fournisseur = analyse["fournisseur"]
+                    date_str = analyse["date_str"]
+                    if analyse.get("fournisseur_lu"):
+                        st.session_state["fournisseur_lu"] = analyse["fournisseur_lu"]
+                elif infos_courantes:
+                    # Déjà obtenu par l'extraction combinée du pré-traitement
+                    nom_fournisseur = infos_courantes.get("nom_fournisseur")
+                    date_str = infos_courantes.get("date_facture")
+                else:
+                    # On utilise temp_working_path qui est la copie de travail
+                    nom_fournisseur, date_str = get_infos_facture(temp_working_path, client)
                 
                 # Fallback si erreur
-                if not nom_fournisseur: nom_fournisseur = "Inconnu"
+                if not nom_fournisseur:
+                    st.warning("Identification IA impossible (quota ou service indisponible) : vérifiez le fournisseur.")
+                    nom_fournisseur = "Inconnu"
+                elif db_url:
+                    # Nom lu légèrement différent d'un fournisseur connu (accents, forme juridique...)
+                    nom_fournisseur, fournisseur_lu = reconnaitre_fournisseur(nom_fournisseur, db_url)
+                    if fournisseur_lu:
+                        st.session_state["fournisseur_lu"] = fournisseur_lu
                 
                 # Parsing date
                 date_obj = datetime.now().date()
@@ -328,19 +503,28 @@ def ajout_factures_page():
         nom_fournisseur = st.session_state["fournisseur"]
         date_facture_init = st.session_state["date_facture"]
 
-        nom_fournisseur = st.session_state["fournisseur"]
-        date_facture_init = st.session_state["date_facture"]
+        if st.session_state.get("fournisseur_lu"):
+            st.info(f"Fournisseur lu sur la facture : « {st.session_state['fournisseur_lu']} », reconnu comme **{nom_fournisseur}**.")
 
         c_title, c_btn = st.columns([3, 1])
         c_title.subheader(f"Fournisseur : {nom_fournisseur}")
         if c_btn.button("Modifier le fournisseur"):
             show_edit_supplier_dialog(nom_fournisseur, db_url)
 
-        # Étape 2 : Recherche en BDD
-        associations = trouver_associations_fournisseur(nom_fournisseur, db_url)
+        # Étape 2 : Recherche en BDD (profil complet en une requête, mis en cache)
+        profil_fournisseur = get_profil_fournisseur(nom_fournisseur, db_url)
+        associations = profil_fournisseur["associations"] if profil_fournisseur else []
 
         if not associations and "creation_mode" not in st.session_state:
             st.warning(f"Fournisseur inconnu : {nom_fournisseur}")
+            candidats = [nom for nom, score in get_resolveur(db_url).candidats(nom_fournisseur, limite=3) if nom != nom_fournisseur]
+            if candidats:
+                st.caption("Fournisseurs connus proches :")
+                for i, (col, candidat) in enumerate(zip(st.columns(len(candidats)), candidats)):
+                    if col.button(f"Utiliser {candidat}", key=f"candidat_fournisseur_{i}"):
+                        st.session_state["fournisseur_lu"] = nom_fournisseur
+                        st.session_state["fournisseur"] = candidat
+                        st.rerun()
             c1, c2 = st.columns(2)
             if c1.button("Créer ce fournisseur"):
                 st.session_state["creation_mode"] = True
@@ -356,13 +540,23 @@ def ajout_factures_page():
                 fournisseur_associe = st.text_input("Fournisseur associé (optionnel)")
                 mode = st.selectbox("Mode", ["A", "M"], format_func=lambda x: "Automatique" if x == "A" else "Manuel")
                 
-                comptes_regles = []
-                for i in range(1, 7):
-                    c1, c2 = st.columns(2)
-                    compte = c1.text_input(f"Compte {i}")
-                    regle = c2.text_input(f"Règle {i}")
-                    if compte:
-                        comptes_regles.append((compte, regle))
+                st.markdown("#### Comptes et Règles")
+                regles_editees = st.data_editor(
+                    pd.DataFrame([], columns=["compte", "regle"]),
+                    num_rows="dynamic",
+                    use_container_width=True,
+                    hide_index=True,
+                    column_config={
+                        "compte": st.column_config.TextColumn("Compte"),
+                        "regle": st.column_config.TextColumn("Règle", help=AIDE_REGLE),
+                    },
+                    key="regles_creation",
+                )
+                comptes_regles = [
+                    (str(ligne["compte"]).strip(), ligne["regle"] if pd.notna(ligne["regle"]) else "")
+                    for ligne in regles_editees.to_dict("records")
+                    if pd.notna(ligne["compte"]) and str(ligne["compte"]).strip()
+                ]
                 
                 
                 c_submit, c_cancel = st.columns(2)
@@ -390,9 +584,22 @@ def ajout_factures_page():
             if "imputations" not in st.session_state:
                 with st.spinner("Extraction des données..."):
                     regles_pour_ia = [assoc for assoc in associations if len(assoc) > 1 and assoc[1]]
-                    if regles_pour_ia:
+                    analyse = prechargeur.obtenir(current_file_path, timeout=0)
+                    if regles_pour_ia and analyse and analyse["imputations"] is not None and analyse["associations"] == associations:
+                        # Déjà calculé en arrière-plan avec les mêmes règles
+                        st.session_state["imputations"] = analyse["imputations"]
+                    elif regles_pour_ia:
                         try:
-                            resultats_ia = application_regle_imputation_V2(temp_working_path, client, regles_pour_ia)
+                            # Fournisseur récurrent : modèle appris en local, sinon Gemini
+                            resultats_ia = imputations_par_modele(nom_fournisseur, current_file_path, regles_pour_ia, db_url)
+                            if resultats_ia is None and infos_courantes:
+                                # Passe "règles" sur les seules pages de cette facture dans le document source
+                                resultats_ia = extraire_valeurs_regles(
+                                    infos_courantes["source"], client, regles_pour_ia,
+                                    infos_courantes.get("page_debut"), infos_courantes.get("page_fin")
+                                )
+                            elif resultats_ia is None:
+                                resultats_ia = application_regle_imputation_V2(temp_working_path, client, regles_pour_ia)
                             st.session_state["imputations"] = resultats_ia
                         except Exception as e:
                             st.error(f"Erreur IA : {e}")
@@ -400,6 +607,12 @@ def ajout_factures_page():
                     else:
                         st.session_state["imputations"] = tuple()
 
+                    # Les fonctions IA renvoient un message (str) en cas d'échec : on l'affiche
+                    # au lieu de découper le message en montants
+                    if isinstance(st.session_state["imputations"], str):
+                        st.error(f"Erreur IA : {st.session_state['imputations']}")
+                        st.session_state["imputations"] = tuple(["Erreur"] * len(regles_pour_ia))
+
             st.subheader("Prévisualisation & Validation")
             
             # Injection CSS pour les boutons
@@ -438,8 +651,7 @@ def ajout_factures_page():
                 
                 # Si pas forcé, on regarde la config du fournisseur
                 if not is_manual and associations:
-                    mode_fournisseur = get_fournisseur_info(nom_fournisseur, db_url)
-                    if mode_fournisseur == 'M':
+                    if profil_fournisseur["mode"] == 'M':
                         is_manual = True
                     # Si 'A', on laisse False par défaut
                 
@@ -456,19 +668,35 @@ def ajout_factures_page():
                 
                 # Liste pour stocker les écritures à sauvegarder
                 ecritures_a_sauvegarder = []
+                # Montants saisis illisibles : la validation est bloquée tant qu'ils ne sont pas corrigés
+                montants_invalides = []
 
                 if mode_manuel:
                     st.markdown("#### Saisie des comptes")
                     comptes_manuels_pour_db = []
-                    for i in range(6):
-                        c_acc, c_mnt = st.columns([1, 1])
-                        compte_man = c_acc.text_input(f"Compte {i+1}", key=f"man_compte_{i}_{current_file_name}")
-                        montant_man = c_mnt.text_input(f"Montant {i+1}", key=f"man_montant_{i}_{current_file_name}")
+                    # Autant de comptes que nécessaire (lignes ajoutées ou supprimées dans le tableau)
+                    lignes_manuelles = st.data_editor(
+                        pd.DataFrame([], columns=["compte", "montant"]),
+                        num_rows="dynamic",
+                        use_container_width=True,
+                        hide_index=True,
+                        column_config={
+                            "compte": st.column_config.TextColumn("Compte"),
+                            "montant": st.column_config.TextColumn("Montant", help="Exemple : 1 234,56"),
+                        },
+                        key=f"man_lignes_{current_file_name}",
+                    )
+                    for ligne in lignes_manuelles.to_dict("records"):
+                        compte_man = str(ligne["compte"]).strip() if pd.notna(ligne["compte"]) else ""
+                        montant_man = str(ligne["montant"]).strip() if pd.notna(ligne["montant"]) else ""
                         
                         if compte_man and montant_man:
                             lignes_rouge.append(f" - {compte_man} : {montant_man}")
                             comptes_manuels_pour_db.append((compte_man, "")) # Pas de mot clé pour le manuel
-                            ecritures_a_sauvegarder.append({"compte": compte_man, "montant": montant_man})
+                            montant = convertir_montant(montant_man)
+                            if montant is None:
+                                montants_invalides.append(compte_man)
+                            ecritures_a_sauvegarder.append({"compte": compte_man, "montant": montant})
                     
                     update_db = st.checkbox("Mettre à jour les règles par défaut pour ce fournisseur avec ces comptes ?")
 
@@ -486,7 +714,13 @@ def ajout_factures_page():
                         valeur_modifiee = st.text_input(f"Montant pour {compte}", value=valeur_defaut, key=f"input_{i}_{current_file_name}")
                         if valeur_modifiee:
                             lignes_rouge.append(f" - {compte} : {valeur_modifiee}")
-                            ecritures_a_sauvegarder.append({"compte": compte, "montant": valeur_modifiee})
+                            montant = convertir_montant(valeur_modifiee)
+                            if montant is None:
+                                montants_invalides.append(compte)
+                            ecritures_a_sauvegarder.append({"compte": compte, "montant": montant})
+
+                if montants_invalides:
+                    st.error(f"Montant illisible pour : {', '.join(montants_invalides)} (exemple attendu : 1 234,56)")
                 
                 # -------------------------------------------------
                 # Ajout des options de paiement (DÉPLACÉ ICI)
@@ -537,13 +771,13 @@ def ajout_factures_page():
                         # Passage au fichier suivant
                         st.session_state["current_index"] += 1
                         # Reset des états pour le prochain
-                        keys_to_reset = ["fournisseur", "date_facture", "imputations", "pdf_processed", "creation_mode", "current_file", "force_manual_mode"]
+                        keys_to_reset = ["fournisseur", "fournisseur_lu", "date_facture", "imputations", "pdf_processed", "creation_mode", "current_file", "force_manual_mode"]
                         for k in keys_to_reset:
                             if k in st.session_state: del st.session_state[k]
                         st.rerun()
 
                 # Bouton Valider (Droite, Vert/Primaire)
-                if c_val.button("Valider et Suivant", type="primary"):
+                if c_val.button("Valider et Suivant", type="primary", disabled=bool(montants_invalides)):
                     # 0. Mise à jour BDD si demandé
                     if mode_manuel and update_db and comptes_manuels_pour_db:
                         if update_regles_fournisseur(nom_fournisseur_final, comptes_manuels_pour_db, db_url):
@@ -551,7 +785,7 @@ def ajout_factures_page():
                         else:
                             st.warning("Impossible de mettre à jour les règles (Fournisseur inconnu ou erreur).")
 
-                        keys_to_reset = ["fournisseur", "date_facture", "imputations", "pdf_processed", "creation_mode", "current_file"]
+                        keys_to_reset = ["fournisseur", "fournisseur_lu", "date_facture", "imputations", "pdf_processed", "creation_mode", "current_file"]
                         for k in keys_to_reset:
                             if k in st.session_state: del st.session_state[k]
                         st.rerun()
@@ -562,25 +796,47 @@ def ajout_factures_page():
                     except:
                         new_date_obj = datetime.now()
 
-                    # 1.5 Appliquer définitivement le texte sur le fichier de travail
-                    ajouter_texte_definitif(temp_working_path, texte_rouge_genere, texte_noir)
-
                     # 2. Sauvegarder dans le dossier READY (pas d'archivage serveur)
                     date_str = new_date.strftime("%d-%m-%Y")
                     nom_clean = "".join(c for c in nom_fournisseur_final if c.isalnum() or c in (' ', '_', '-')).strip()
                     nom_fichier_final = f"{nom_clean}_{date_str}.pdf"
                     chemin_final = os.path.join(READY_DIR, nom_fichier_final)
 
-                    # 2.5 Sauvegarde en BDD des écritures
-                    for ecriture in ecritures_a_sauvegarder:
-                        ajouter_ecriture_comptable(
-                            compte=ecriture["compte"],
-                            date_facture=new_date_obj,
-                            fournisseur=nom_fournisseur_final,
-                            montant=ecriture["montant"],
-                            nom_fichier=nom_fichier_final,
-                            db_url=db_url
-                        )
+                    # Empreintes de la facture, enregistrées avec ses écritures : un nouveau dépôt
+                    # sera reconnu comme doublon
+                    infos_extraites = st.session_state.get("infos_factures", {}).get(current_file_path)
+                    chemin_source = (infos_extraites or {}).get("source", current_file_path)
+                    empreinte = empreinte_facture(chemin_source, infos_extraites, nom_fichier_final)
+
+                    # Apprentissage du modèle du fournisseur (montants validés + PDF d'origine),
+                    # fait en arrière-plan une fois les écritures en base
+                    apprentissage = None
+                    if not mode_manuel:
+                        regles_avec_texte = [(assoc[0], assoc[1]) for assoc in associations if len(assoc) > 1 and assoc[1]]
+                        comptes_avec_regle = {compte for compte, _ in regles_avec_texte}
+                        valeurs_validees = [(e["compte"], e["montant"]) for e in ecritures_a_sauvegarder if e["compte"] in comptes_avec_regle]
+                        if valeurs_validees:
+                            apprentissage = {"fournisseur": nom_fournisseur_final, "pdf": current_file_path,
+                                             "valeurs": valeurs_validees, "regles": regles_avec_texte}
+
+                    # 2.5 Écritures inscrites au journal local (envoyées à la base en arrière-plan,
+                    # toutes les lignes de la facture ensemble)
+                    cle_facture = get_journal().ajouter([
+                        {
+                            "compte": ecriture["compte"],
+                            "date_facture": new_date_obj,
+                            "fournisseur": nom_fournisseur_final,
+                            "montant": ecriture["montant"],
+                            "nom_fichier": nom_fichier_final,
+                        }
+                        for ecriture in ecritures_a_sauvegarder
+                    ], db_url, apprentissage=apprentissage, empreinte=empreinte)
+                    if cle_facture is None:
+                        st.error("Erreur lors de l'enregistrement des écritures : aucune ligne n'a été enregistrée, réessayez.")
+                        st.stop()
+
+                    # Appliquer définitivement le texte sur le fichier de travail (une fois les écritures journalisées)
+                    ajouter_texte_definitif(temp_working_path, texte_rouge_genere, texte_noir)
 
                     # Compression du PDF vers le dossier READY
                     with st.spinner("Traitement et compression..."):
@@ -604,7 +860,7 @@ def ajout_factures_page():
                         # Passage au fichier suivant
                         st.session_state["current_index"] += 1
                         # Reset des états pour le prochain
-                        keys_to_reset = ["fournisseur", "date_facture", "imputations", "pdf_processed", "creation_mode", "current_file"]
+                        keys_to_reset = ["fournisseur", "fournisseur_lu", "date_facture", "imputations", "pdf_processed", "creation_mode", "current_file"]
                         for k in keys_to_reset:
                             if k in st.session_state: del st.session_state[k]
                         st.rerun()
@@ -631,5 +887,6 @@ if __name__ == "__main__":
         st.Page(ajout_factures_page, title="Ajout de factures", icon="📄"),
         st.Page("pages/1_Gestion_Fournisseurs.py", title="Gestion Fournisseurs", icon="👥"),
         st.Page("pages/02_Ecritures_Comptables.py", title="Ecritures Comptables", icon="📊"),
+        st.Page("pages/03_Tableau_de_Bord.py", title="Tableau de Bord", icon="📈"),
     ])
     pg.run()
@@ -3,7 +3,10 @@ import pandas as pd
 import os
 from datetime import datetime
 from dotenv import load_dotenv
-from src.gestion_bdd import get_toutes_ecritures, update_ecriture, delete_ecriture, initialiser_bdd, bdd_est_disponible
+from src.gestion_bdd import rechercher_ecritures, update_ecriture, delete_ecriture
+from src.ressources import get_ressources
+from src.journal_ecritures import get_journal
+from src.export_comptable import FORMATS_EXPORT, preparer_export
 
 # Configuration de la page
 st.set_page_config(page_title="Gestion Écritures", page_icon="📊", layout="wide")
@@ -11,6 +14,28 @@ st.set_page_config(page_title="Gestion Écritures", page_icon="📊", layout="wi
 # Chargement des variables d'environnement
 load_dotenv()
 
+# Nombre d'écritures par page
+TAILLE_PAGE = 50
+
+# Libellé affiché -> option de tri de rechercher_ecritures
+OPTIONS_TRI = {
+    "Pertinence (recherche), sinon Date": "pertinence",
+    "Date Facture (Récent -> Ancien)": "date_desc",
+    "Date Facture (Ancien -> Récent)": "date_asc",
+    "Montant (Décroissant)": "montant_desc",
+    "Montant (Croissant)": "montant_asc",
+    "Fournisseur (A-Z)": "fournisseur_asc",
+    "Compte (A-Z)": "compte_asc",
+    "Compte (Z-A)": "compte_desc",
+}
+
+# Libellé affiché -> format de preparer_export
+OPTIONS_EXPORT = {
+    "FEC (Fichier des Écritures Comptables)": "fec",
+    "CSV (Excel)": "csv",
+    "XLSX": "xlsx",
+}
+
 @st.dialog("Modifier l'écriture")
 def show_edit_dialog(ecriture, db_url):
     with st.form("edit_form"):
@@ -53,17 +78,15 @@ def main():
     st.title("📊 Gestion des Écritures Comptables")
 
     # Vérification BDD
-    db_url = os.getenv("DATABASE_URL")
-    if not db_url or not bdd_est_disponible(db_url):
+    ressources = get_ressources()
+    db_url = ressources.db_url
+    if not db_url or not ressources.base_disponible():
         st.error("Base de données indisponible.")
         st.stop()
 
-    # Chargement des données
-    ecritures = get_toutes_ecritures(db_url)
-    
-    if not ecritures:
-        st.info("Aucune écriture comptable trouvée.")
-        return
+    en_attente = get_journal().etat()["en_attente"]
+    if en_attente:
+        st.info(f"⏳ {en_attente} facture(s) validée(s) pas encore enregistrée(s) en base : elles apparaîtront ici dans quelques instants.")
 
     # --- Filtres et Recherche ---
     st.markdown("### 🔍 Recherche et Filtres")
@@ -73,74 +96,69 @@ def main():
         search_term = st.text_input("Rechercher (Fournisseur, Compte, Fichier, Date)", placeholder="Tapez pour rechercher...")
     
     with col_sort:
-        sort_option = st.selectbox(
-            "Trier par",
-            options=[
-                "Date Facture (Récent -> Ancien)", 
-                "Date Facture (Ancien -> Récent)", 
-                "Montant (Décroissant)", 
-                "Montant (Croissant)", 
-                "Fournisseur (A-Z)",
-                "Compte (A-Z)",
-                "Compte (Z-A)"
-            ]
-        )
-
-    # Application des filtres
-    filtered_ecritures = ecritures
+        sort_label = st.selectbox("Trier par", options=list(OPTIONS_TRI.keys()))
+
+    with st.expander("Filtres avancés"):
+        c_date_min, c_date_max, c_montant_min, c_montant_max = st.columns(4)
+        date_min = c_date_min.date_input("Date min", value=None, format="DD/MM/YYYY")
+        date_max = c_date_max.date_input("Date max", value=None, format="DD/MM/YYYY")
+        montant_min = c_montant_min.number_input("Montant min", value=None, step=0.01)
+        montant_max = c_montant_max.number_input("Montant max", value=None, step=0.01)
+
+    with st.expander("📤 Export pour la comptabilité"):
+        st.caption("Reprend les dates des filtres avancés ; le fichier est produit à la demande.")
+        c_format, c_comptes = st.columns(2)
+        format_export = OPTIONS_EXPORT[c_format.selectbox("Format", options=list(OPTIONS_EXPORT.keys()))]
+        saisie_comptes = c_comptes.text_input("Comptes (débuts de numéro, séparés par des virgules)", placeholder="Tous")
+        comptes_export = [c.strip() for c in saisie_comptes.split(",") if c.strip()]
+        extension, _ = FORMATS_EXPORT[format_export]
+        periode = "_".join(d.strftime("%Y%m%d") for d in (date_min, date_max) if d)
+        # Export écrit sur disque puis téléchargé par morceaux (jamais chargé en mémoire)
+        if st.button("Préparer l'export"):
+            nom_fichier = f"ecritures{'_' + periode if periode else ''}.{extension}"
+            url = preparer_export(db_url, format_export, nom_fichier, date_min, date_max, comptes_export)
+            if url is None:
+                st.error("Erreur lors de l'export des écritures : aucun fichier n'a été produit.")
+            else:
+                st.markdown(f'<a href="{url}" download="{nom_fichier}">📥 Télécharger {nom_fichier}</a>', unsafe_allow_html=True)
+
+    filtres = {
+        "recherche": search_term.strip() or None,
+        "date_min": date_min,
+        "date_max": date_max,
+        "montant_min": montant_min,
+        "montant_max": montant_max,
+        "tri": OPTIONS_TRI[sort_label],
+    }
+
+    # Pagination par curseur : pile des curseurs des pages déjà vues (retour à la page 1 si les filtres changent)
+    if st.session_state.get("filtres_ecritures") != filtres:
+        st.session_state["filtres_ecritures"] = filtres
+        st.session_state["pile_curseurs"] = [None]
+    pile_curseurs = st.session_state["pile_curseurs"]
+
+    # Chargement de la page courante uniquement (filtres, tri et pagination faits par la base)
+    ecritures, curseur_suivant = rechercher_ecritures(db_url, apres=pile_curseurs[-1], limite=TAILLE_PAGE, **filtres)
     
-    # 1. Recherche
-    if search_term:
-        term = search_term.lower()
-        filtered_ecritures = []
-        for e in ecritures:
-            # Formatage de la date pour la recherche (DD/MM/YYYY)
-            date_str = e['date_facture'].strftime("%d/%m/%Y") if e['date_facture'] else ""
-            
-            if (term in (e['fournisseur'] or "").lower() or
-                term in (e['compte'] or "").lower() or
-                term in (e['nom_fichier'] or "").lower() or
-                term in date_str):
-                filtered_ecritures.append(e)
-        
-    # 3. Tri
-    def normalize_compte_sort(compte_str):
-        """
-        Normalise le numéro de compte pour le tri.
-        Transforme "X/Y" en "XX/00Y" pour un tri alphanumérique correct.
-        Ex: "1/25" -> "01/025"
-            "1/144" -> "01/144"
-        Ainsi "01/025" < "01/144"
-        """
-        if not compte_str:
-            return ""
-        try:
-            parts = compte_str.split('/')
-            if len(parts) == 2:
-                # On suppose X/Y
-                part1 = int(parts[0])
-                part2 = int(parts[1])
-                return f"{part1:02d}/{part2:03d}"
-            return compte_str
-        except:
-            return compte_str
-
-    if sort_option == "Date Facture (Récent -> Ancien)":
-        filtered_ecritures.sort(key=lambda x: x['date_facture'] or datetime.min, reverse=True)
-    elif sort_option == "Date Facture (Ancien -> Récent)":
-        filtered_ecritures.sort(key=lambda x: x['date_facture'] or datetime.min)
-    elif sort_option == "Montant (Décroissant)":
-        filtered_ecritures.sort(key=lambda x: float(x['montant'] or 0), reverse=True)
-    elif sort_option == "Montant (Croissant)":
-        filtered_ecritures.sort(key=lambda x: float(x['montant'] or 0))
-    elif sort_option == "Fournisseur (A-Z)":
-        filtered_ecritures.sort(key=lambda x: (x['fournisseur'] or "").lower())
-    elif sort_option == "Compte (A-Z)":
-        filtered_ecritures.sort(key=lambda x: normalize_compte_sort(x['compte']))
-    elif sort_option == "Compte (Z-A)":
-        filtered_ecritures.sort(key=lambda x: normalize_compte_sort(x['compte']), reverse=True)
-
-    st.markdown(f"*Nombre d'écritures affichées : {len(filtered_ecritures)}*")
+    if not ecritures and len(pile_curseurs) > 1:
+        # Page vidée (suppressions) : retour à la page précédente
+        pile_curseurs.pop()
+        st.rerun()
+
+    if not ecritures:
+        st.info("Aucune écriture comptable trouvée.")
+        return
+
+    num_page = len(pile_curseurs)
+    c_prec, c_info, c_suiv = st.columns([1, 3, 1])
+    if c_prec.button("◀ Précédent", disabled=num_page == 1):
+        pile_curseurs.pop()
+        st.rerun()
+    c_info.markdown(f"*Page {num_page} — écritures {(num_page - 1) * TAILLE_PAGE + 1} à {(num_page - 1) * TAILLE_PAGE + len(ecritures)}*")
+    if c_suiv.button("Suivant ▶", disabled=curseur_suivant is None):
+        pile_curseurs.append(curseur_suivant)
+        st.rerun()
+
     st.markdown("---")
 
     # En-têtes du tableau
@@ -164,7 +182,7 @@ def main():
             return f"{val} €"
 
     # Affichage des lignes
-    for ecriture in filtered_ecritures:
+    for ecriture in ecritures:
         cols = st.columns([1.5, 3, 1.5, 1.5, 3, 2, 1.5])
         
         # Formatage des dates
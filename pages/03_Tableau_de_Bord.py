@@ -0,0 +1,83 @@
+import streamlit as st
+import pandas as pd
+from datetime import date
+from dotenv import load_dotenv
+from src.gestion_bdd import get_synthese_ecritures
+from src.ressources import get_ressources
+
+# Configuration de la page
+st.set_page_config(page_title="Tableau de Bord", page_icon="📈", layout="wide")
+
+# Chargement des variables d'environnement
+load_dotenv()
+
+# Nombre de comptes / fournisseurs affichés dans les classements
+TAILLE_CLASSEMENT = 15
+
+NOMS_MOIS = ["Janv.", "Févr.", "Mars", "Avr.", "Mai", "Juin", "Juil.", "Août", "Sept.", "Oct.", "Nov.", "Déc."]
+
+
+def format_montant(val):
+    try:
+        # Format: 1 234,56 €
+        return "{:,.2f}".format(float(val)).replace(",", " ").replace(".", ",") + " €"
+    except:
+        return f"{val} €"
+
+def tableau_synthese(synthese, libelle, valeur_absente):
+    """Tableau (libellé, nombre d'écritures, total) d'un axe de la synthèse."""
+    return pd.DataFrame({
+        libelle: [ligne["cle"] or valeur_absente for ligne in synthese],
+        "Écritures": [ligne["nb_ecritures"] for ligne in synthese],
+        "Total": [format_montant(ligne["total"]) for ligne in synthese],
+    })
+
+def main():
+    st.title("📈 Tableau de Bord")
+
+    # Vérification BDD
+    ressources = get_ressources()
+    db_url = ressources.db_url
+    if not db_url or not ressources.base_disponible():
+        st.error("Base de données indisponible.")
+        st.stop()
+
+    annee_courante = date.today().year
+    annee = st.selectbox("Exercice", options=list(range(annee_courante, annee_courante - 10, -1)))
+    debut, fin = date(annee, 1, 1), date(annee, 12, 31)
+
+    # Trois lectures de la table de synthèse (aucun parcours du journal)
+    par_mois = get_synthese_ecritures(db_url, "mois", debut, fin)
+    par_compte = get_synthese_ecritures(db_url, "compte", debut, fin)
+    par_fournisseur = get_synthese_ecritures(db_url, "fournisseur", debut, fin)
+
+    if not par_mois:
+        st.info(f"Aucune écriture comptable en {annee}.")
+        return
+
+    total_annee = sum(float(ligne["total"]) for ligne in par_mois)
+    nb_annee = sum(ligne["nb_ecritures"] for ligne in par_mois)
+    c_total, c_nb, c_fournisseurs = st.columns(3)
+    c_total.metric("Total de l'exercice", format_montant(total_annee))
+    c_nb.metric("Écritures", nb_annee)
+    c_fournisseurs.metric("Fournisseurs", len(par_fournisseur))
+
+    st.markdown("### 📅 Par mois")
+    totaux_mois = {ligne["cle"].month: float(ligne["total"]) for ligne in par_mois}
+    st.bar_chart(
+        pd.DataFrame({"Mois": NOMS_MOIS, "Total": [totaux_mois.get(m, 0.0) for m in range(1, 13)]}),
+        x="Mois", y="Total", sort=False,
+    )
+
+    col_comptes, col_fournisseurs = st.columns(2)
+    with col_comptes:
+        st.markdown("### 🧾 Par compte")
+        st.dataframe(tableau_synthese(par_compte[:TAILLE_CLASSEMENT], "Compte", "(sans compte)"),
+                     hide_index=True, use_container_width=True)
+    with col_fournisseurs:
+        st.markdown("### 🏢 Par fournisseur")
+        st.dataframe(tableau_synthese(par_fournisseur[:TAILLE_CLASSEMENT], "Fournisseur", "(sans fournisseur)"),
+                     hide_index=True, use_container_width=True)
+
+if __name__ == "__main__":
+    main()
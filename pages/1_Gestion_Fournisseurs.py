@@ -2,7 +2,10 @@ import streamlit as st
 import os
 import pandas as pd
 from dotenv import load_dotenv
-from src.gestion_bdd import get_tous_les_fournisseurs, update_fournisseur_full, initialiser_bdd
+from src.gestion_bdd import get_tous_les_fournisseurs, update_fournisseur_full, rechercher_fournisseurs, importer_fournisseurs_db
+from src.ressources import get_ressources
+from src.appels_ia import AIDE_REGLE
+from src.echange_fournisseurs import lire_fichier_fournisseurs, valider_fournisseurs, comparer_fournisseurs, exporter_fournisseurs
 
 # Configuration de la page
 st.set_page_config(page_title="Gestion Fournisseurs", page_icon="👥", layout="wide")
@@ -10,30 +13,98 @@ st.set_page_config(page_title="Gestion Fournisseurs", page_icon="👥", layout="
 # Chargement des variables d'environnement
 load_dotenv()
 
+def section_import_export(db_url):
+    """Export de tous les fournisseurs, import en masse avec simulation avant écriture."""
+    # Confirmation du dernier import (conservée pendant le rechargement de la page)
+    message_import = st.session_state.pop("message_import_fournisseurs", None)
+    if message_import:
+        st.success(message_import)
+
+    with st.expander("📥 Import / 📤 Export des fournisseurs (CSV ou XLSX)"):
+        st.caption("Une ligne par règle : fournisseur ; fournisseur_associe ; mode (A ou M) ; compte ; regle")
+        c_csv, c_xlsx = st.columns(2)
+        c_csv.download_button("Exporter en CSV", data=lambda: exporter_fournisseurs(db_url, "csv"),
+                              file_name="fournisseurs.csv", mime="text/csv", on_click="ignore")
+        c_xlsx.download_button("Exporter en XLSX", data=lambda: exporter_fournisseurs(db_url, "xlsx"),
+                               file_name="fournisseurs.xlsx", on_click="ignore",
+                               mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
+
+        # Clé changée après un import pour vider le sélecteur de fichier
+        if "cle_import_fournisseurs" not in st.session_state:
+            st.session_state["cle_import_fournisseurs"] = 0
+        fichier = st.file_uploader("Fichier à importer", type=["csv", "xlsx"],
+                                   key=f"import_fournisseurs_{st.session_state['cle_import_fournisseurs']}")
+        if not fichier:
+            return
+        try:
+            lignes = lire_fichier_fournisseurs(fichier.getvalue(), fichier.name)
+        except Exception as e:
+            st.error(f"Fichier illisible : {e}")
+            return
+
+        fournisseurs_importes, erreurs = valider_fournisseurs(lignes)
+        if erreurs:
+            st.error(f"{len(erreurs)} erreur(s) : corrigez le fichier avant l'import.")
+            st.write("\n".join(f"- {erreur}" for erreur in erreurs[:50]))
+            return
+
+        # Simulation : rien n'est écrit avant la confirmation
+        differences = comparer_fournisseurs(fournisseurs_importes, db_url)
+        c1, c2, c3 = st.columns(3)
+        c1.metric("À créer", len(differences["crees"]))
+        c2.metric("À modifier", len(differences["modifies"]))
+        c3.metric("Inchangés", len(differences["inchanges"]))
+        if differences["crees"]:
+            st.markdown("**Nouveaux fournisseurs** : " + ", ".join(differences["crees"]))
+        if differences["modifies"]:
+            st.dataframe(pd.DataFrame(differences["modifies"]), use_container_width=True, hide_index=True)
+
+        if st.button("Appliquer l'import", type="primary",
+                     disabled=not (differences["crees"] or differences["modifies"])):
+            nb = importer_fournisseurs_db(fournisseurs_importes, db_url)
+            if nb is None:
+                st.error("Erreur lors de l'import : aucun fournisseur n'a été modifié.")
+            else:
+                # Message affiché après le rechargement de la page
+                st.session_state["message_import_fournisseurs"] = f"{nb} fournisseur(s) importé(s)."
+                st.session_state["cle_import_fournisseurs"] += 1
+                st.rerun()
+
 def main():
     st.title("👥 Gestion des Fournisseurs")
 
     # Vérification BDD
-    db_url = os.getenv("DATABASE_URL")
-    if not db_url:
+    ressources = get_ressources()
+    db_url = ressources.db_url
+    if not db_url or not ressources.base_disponible():
         st.error("Base de données indisponible (Vérifiez .env)")
         st.stop()
 
-    # Chargement des données
-    fournisseurs = get_tous_les_fournisseurs(db_url)
-    
-    if not fournisseurs:
-        st.info("Aucun fournisseur trouvé dans la base de données.")
-        return
+    section_import_export(db_url)
 
     # --- VUE TABLEAU ---
     st.subheader("Liste des Fournisseurs")
+
+    # Recherche approchée (nom ou fournisseur associé, tolérante aux fautes) faite par la base ;
+    # sans recherche, chargement de tous les fournisseurs
+    recherche = st.text_input("Rechercher un fournisseur", placeholder="Nom approximatif...")
+    if recherche:
+        fournisseurs = rechercher_fournisseurs(recherche, db_url, limite=50)
+        if not fournisseurs:
+            st.info("Aucun fournisseur ne correspond à cette recherche.")
+            return
+    else:
+        fournisseurs = get_tous_les_fournisseurs(db_url)
+        if not fournisseurs:
+            st.info("Aucun fournisseur trouvé dans la base de données.")
+            return
     
     # Création d'un DataFrame pour l'affichage
     df = pd.DataFrame(fournisseurs)
     
     # Sélection des colonnes pertinentes pour l'aperçu
-    cols_apercu = ["fournisseur", "fournisseur_associe", "mode", "compte1", "regle1"]
+    df["comptes"] = [", ".join(compte for compte, _ in f["associations"]) for f in fournisseurs]
+    cols_apercu = ["fournisseur", "fournisseur_associe", "mode", "comptes"]
     st.dataframe(df[cols_apercu], use_container_width=True)
 
     st.markdown("---")
@@ -60,18 +131,23 @@ def main():
 
                 st.markdown("#### Comptes et Règles")
                 
-                # Champs dynamiques pour les 6 comptes
-                new_comptes_regles = {}
-                for i in range(1, 7):
-                    cc1, cc2 = st.columns(2)
-                    compte_key = f"compte{i}"
-                    regle_key = f"regle{i}"
-                    
-                    val_compte = data_fournisseur.get(compte_key) or ""
-                    val_regle = data_fournisseur.get(regle_key) or ""
-                    
-                    new_comptes_regles[compte_key] = cc1.text_input(f"Compte {i}", value=val_compte)
-                    new_comptes_regles[regle_key] = cc2.text_input(f"Règle {i}", value=val_regle)
+                # Autant de comptes que nécessaire (lignes ajoutées ou supprimées dans le tableau)
+                regles_editees = st.data_editor(
+                    pd.DataFrame(data_fournisseur["associations"], columns=["compte", "regle"]),
+                    num_rows="dynamic",
+                    use_container_width=True,
+                    hide_index=True,
+                    column_config={
+                        "compte": st.column_config.TextColumn("Compte"),
+                        "regle": st.column_config.TextColumn("Règle", help=AIDE_REGLE),
+                    },
+                    key=f"regles_{data_fournisseur['id']}",
+                )
+                new_associations = [
+                    (str(ligne["compte"]).strip(), ligne["regle"] if pd.notna(ligne["regle"]) else "")
+                    for ligne in regles_editees.to_dict("records")
+                    if pd.notna(ligne["compte"]) and str(ligne["compte"]).strip()
+                ]
 
                 submitted = st.form_submit_button("Enregistrer les modifications")
                 
@@ -81,7 +157,7 @@ def main():
                         "fournisseur": new_nom,
                         "fournisseur_associe": new_associe,
                         "mode": new_mode,
-                        **new_comptes_regles
+                        "associations": new_associations
                     }
                     
                     if update_fournisseur_full(choix_fournisseur, update_data, db_url):
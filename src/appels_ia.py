@@ -1,12 +1,111 @@
 import os
+import io
+import re
 from google import genai
 from google.genai import types
 from google.genai.errors import APIError
 from dotenv import load_dotenv
-from pypdf import PdfReader, PdfWriter
+from pypdf import PdfReader
 import json
 import time
 import ast
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from src.cache_ia import get_cache_ia, calculer_cle_cache
+from src.extraction_texte import extraire_couche_texte
+from src.client_gemini import envelopper_client
+from src.pdf_manager import extraire_pages_pdf
+
+
+# Modèle Gemini utilisé par défaut (fait aussi partie de la clé du cache)
+MODELE_GEMINI = 'gemini-2.5-flash'
+
+# Transport des documents : en ligne (inline) sous ce seuil, via la Files API au-delà
+SEUIL_INLINE_DEFAUT_MO = 10
+# Attente de l'activation d'un fichier téléversé (secondes)
+ATTENTE_INITIALE = 0.25
+ATTENTE_MAX = 4.0
+DELAI_MAX_ACTIVATION = 120.0
+
+# Le fournisseur et la date figurent sur la première page : inutile d'envoyer le reste
+PAGES_IDENTIFICATION = [1]
+# Déclaration optionnelle des pages utiles en tête de règle : "[page:-1] Montant TTC", "[pages:1,-1] ..."
+MOTIF_PAGES_REGLE = re.compile(r"^\s*\[pages?\s*:\s*(-?\d+(?:\s*,\s*-?\d+)*)\s*\]\s*", re.IGNORECASE)
+AIDE_REGLE = ("Optionnel : commencez par [page:1] (première page), [page:-1] (dernière page) "
+              "ou [pages:1,-1] pour n'envoyer que ces pages à l'IA.")
+
+
+def analyser_regle(regle: str) -> tuple:
+    """
+    Sépare la déclaration de pages d'une règle d'imputation de son texte.
+
+    "[page:-1] Montant TTC" -> ([-1], "Montant TTC")
+    "Montant TTC"           -> (None, "Montant TTC")
+    """
+    correspondance = MOTIF_PAGES_REGLE.match(regle or "")
+    if not correspondance:
+        return None, regle
+    pages = [int(p) for p in correspondance.group(1).split(",")]
+    return pages, regle[correspondance.end():]
+
+
+def pages_des_regles(regles_imputation: list):
+    """
+    Pages à envoyer pour appliquer ces règles : l'union des pages déclarées,
+    ou None (document complet) si une règle ne déclare pas ses pages.
+    """
+    pages = set()
+    for regle in regles_imputation:
+        pages_regle, _ = analyser_regle(regle[1])
+        if pages_regle is None:
+            return None
+        pages.update(pages_regle)
+    return sorted(pages) or None
+
+
+def pages_facture(regles_imputation: list, page_debut: int = None, page_fin: int = None):
+    """
+    Pages du document source à envoyer pour appliquer ces règles à la facture située des pages
+    `page_debut` à `page_fin` (base 1) : les pages déclarées par les règles, comptées dans la facture
+    ([page:-1] = dernière page de la facture), sinon toutes les pages de la facture.
+    Sans `page_debut`/`page_fin`, le document est une seule facture (voir `pages_des_regles`).
+    """
+    pages_regles = pages_des_regles(regles_imputation)
+    if not (page_debut and page_fin):
+        return pages_regles
+    page_debut, page_fin = int(page_debut), int(page_fin)
+    toutes = list(range(page_debut, page_fin + 1))
+    if pages_regles is None:
+        return toutes
+    pages = {page_debut + page - 1 if page > 0 else page_fin + page + 1 for page in pages_regles}
+    return sorted(page for page in pages if page_debut <= page <= page_fin) or toutes
+
+
+def textes_regles(regles_imputation: list) -> list:
+    """Texte des règles tel qu'envoyé à Gemini (sans la déclaration de pages)."""
+    return [analyser_regle(r[1])[1] for r in regles_imputation]
+
+
+def _lire_cache(pdf_bytes: bytes, prompt: str, regles, nom_modele: str):
+    """
+    Cherche une réponse déjà obtenue pour ce PDF et cette demande.
+    Retourne (cle, resultat) ; resultat vaut None si rien n'est en cache.
+    """
+    cache = get_cache_ia()
+    if cache is None:
+        return None, None
+    cle = calculer_cle_cache(pdf_bytes, prompt, regles, nom_modele)
+    resultat = cache.lire(cle)
+    if resultat is not None:
+        print("♻️ Réponse Gemini récupérée depuis le cache.")
+    return cle, resultat
+
+
+def _ecrire_cache(cle, resultat):
+    """Mémorise une réponse valide de Gemini."""
+    cache = get_cache_ia()
+    if cache is not None and cle is not None:
+        cache.ecrire(cle, resultat)
 
 
 def initialisation_client_gemini():
@@ -17,6 +116,8 @@ def initialisation_client_gemini():
     - Charge les variables d'environnement depuis le fichier `.env`.
     - Récupère la clé API `GENAI_KEY`.
     - Crée une instance du client `genai.Client` pour interagir avec l'API Gemini.
+    - L'enveloppe dans un `ClientGeminiFiable` (limiteur de débit, nouvelles tentatives,
+      disjoncteur) qui s'utilise comme le client d'origine.
 
     En cas de succès :
         → Retourne l'objet client initialisé.
@@ -24,7 +125,7 @@ def initialisation_client_gemini():
         → Retourne `None` et affiche un message d'erreur.
 
     Returns:
-        genai.Client | None: Instance du client Gemini ou None si l'initialisation échoue.
+        ClientGeminiFiable | None: Client Gemini protégé ou None si l'initialisation échoue.
     """
     # Charger les variables depuis le fichier .env
     load_dotenv()
@@ -34,7 +135,7 @@ def initialisation_client_gemini():
 
     # Initialisation de l'API
     try:
-        client = genai.Client(api_key=GENAI_KEY)
+        client = envelopper_client(genai.Client(api_key=GENAI_KEY))
         print("Client Gemini initialisé avec succès.")
         return client
     except Exception as e:
@@ -49,33 +150,33 @@ def get_infos_facture(pdf_path: str, client: genai.Client) -> tuple:
     Retourne:
         tuple: (nom_fournisseur, date_facture) ou (None, None) en cas d'erreur.
     """
-    pdf_file = None
+    document = None
     try:
-        print(f"⏳ Téléchargement du fichier PDF ({pdf_path}) dans le service Gemini...")
-        pdf_file = client.files.upload(file=pdf_path)
-        
-        while pdf_file.state != 'ACTIVE':
-            if pdf_file.state != 'PROCESSING':
-                 raise RuntimeError(f"Le traitement du fichier a échoué. État actuel : {pdf_file.state}")
-            time.sleep(1)
-            pdf_file = client.files.get(name=pdf_file.name)
-        
         prompt = (
             "À partir de cette facture, extrais :\n"
             "1. Le nom complet du fournisseur.\n"
             "2. La date de la facture (format JJ/MM/AAAA).\n"
             "Renvoie UNIQUEMENT un tuple Python : ('Nom Fournisseur', 'JJ/MM/AAAA')."
         )
-        
+
+        # Même PDF, même demande : pas besoin de rappeler Gemini
+        # Seule la première page est transmise (en-tête de la facture)
+        document = DocumentGemini(pdf_path, client, pages=PAGES_IDENTIFICATION)
+        cle_cache, resultat_cache = _lire_cache(document.pdf_bytes, prompt, None, MODELE_GEMINI)
+        if resultat_cache is not None:
+            return resultat_cache
+
+        # Texte extrait si le PDF en a un, sinon le fichier téléversé
         response = client.models.generate_content(
-            model='gemini-2.5-flash',
-            contents=[prompt, pdf_file]
+            model=MODELE_GEMINI,
+            contents=[prompt, document.contenu()]
         )
         
         texte = response.text.strip()
         try:
             resultat = ast.literal_eval(texte)
             if isinstance(resultat, tuple) and len(resultat) == 2:
+                _ecrire_cache(cle_cache, resultat)
                 return resultat
             return (texte, "Date Inconnue") # Fallback si le format n'est pas respecté
         except:
@@ -86,48 +187,174 @@ def get_infos_facture(pdf_path: str, client: genai.Client) -> tuple:
         return (None, None)
         
     finally:
-        if pdf_file:
-             client.files.delete(name=pdf_file.name)
+        if document:
+            document.liberer()
 
 
-def analyser_et_separer_factures(chemin_pdf: str, client: genai.Client, nom_modele: str = 'gemini-2.5-flash'):
-    """
-    Analyse un fichier PDF contenant potentiellement plusieurs factures
-    et utilise Gemini pour identifier les informations clés, y compris les
-    numéros de page de début et de fin de chaque facture.
+def _seuil_inline_octets() -> int:
+    """Taille maximale d'un PDF envoyé directement dans la requête (GEMINI_SEUIL_INLINE_MO)."""
+    return int(float(os.getenv("GEMINI_SEUIL_INLINE_MO", SEUIL_INLINE_DEFAUT_MO)) * 1024 * 1024)
 
-    :param chemin_pdf: Le chemin d'accès au fichier PDF multi-factures.
-    :param nom_modele: Le modèle Gemini à utiliser.
-    :return: Une liste des informations de facture identifiées, ou None en cas d'erreur.
+
+def attendre_fichier_actif(client: genai.Client, fichier, delai_max: float = DELAI_MAX_ACTIVATION):
     """
-    print(f"Chargement du fichier PDF : {chemin_pdf}...")
-    
-   
+    Attend qu'un fichier téléversé passe à l'état ACTIVE.
+    L'intervalle entre deux vérifications double à chaque tour (0,25 s, 0,5 s, 1 s... plafonné),
+    et l'attente totale est bornée par `delai_max`.
+    """
+    echeance = time.monotonic() + delai_max
+    attente = ATTENTE_INITIALE
+    while fichier.state != 'ACTIVE':
+        if fichier.state != 'PROCESSING':
+            raise RuntimeError(f"Le traitement du fichier a échoué. État actuel : {fichier.state}")
+        restant = echeance - time.monotonic()
+        if restant <= 0:
+            raise RuntimeError(f"Le fichier {fichier.name} n'est pas actif après {delai_max:.0f} s.")
+        time.sleep(min(attente, restant))
+        attente = min(attente * 2, ATTENTE_MAX)
+        fichier = client.files.get(name=fichier.name)
+    return fichier
+
 
-    # 2. Vérification et lecture du nombre de pages
+# Les suppressions de fichiers Gemini se font hors du chemin critique
+_executeur_suppressions = ThreadPoolExecutor(max_workers=2, thread_name_prefix="suppression_gemini")
+
+
+def _supprimer_fichier(client: genai.Client, nom: str):
     try:
-        reader = PdfReader(chemin_pdf)
-        nombre_pages = len(reader.pages)
-        print(f"Le document contient {nombre_pages} pages.")
+        client.files.delete(name=nom)
+        print(f"🗑️ Fichier Gemini supprimé : {nom}")
     except Exception as e:
-        print(f"Erreur lors de la lecture du fichier PDF : {e}")
-        return None
+        print(f"⚠️ Suppression du fichier Gemini impossible ({nom}) : {e}")
 
-    # --- 3. Définition du Schéma de Réponse (Structure JSON attendue) ---
-    # AJOUT : 'nom_fournisseur' pour nommer le fichier
-    facture_schema = types.Schema(
-        type=types.Type.OBJECT,
-        properties={
-            "nom_fournisseur": types.Schema(type=types.Type.STRING, description="Le nom de l'entreprise ou du fournisseur qui a émis la facture."), 
-            "numero_facture": types.Schema(type=types.Type.STRING, description="Le numéro unique de la facture."),
-            "page_debut": types.Schema(type=types.Type.INTEGER, description="Le numéro de la première page de cette facture (base 1)."),
-            "page_fin": types.Schema(type=types.Type.INTEGER, description="Le numéro de la dernière page de cette facture (base 1)."),
-            "montant_total": types.Schema(type=types.Type.STRING, description="Le montant total de la facture, y compris la devise.")
-        },
-        required=["nom_fournisseur", "numero_facture", "page_debut", "page_fin"] 
-    )
 
-    liste_factures_schema = types.Schema(
+def supprimer_fichier_async(client: genai.Client, nom: str):
+    """Programme la suppression d'un fichier Gemini en arrière-plan."""
+    _executeur_suppressions.submit(_supprimer_fichier, client, nom)
+
+
+class DocumentGemini:
+    """
+    Fichier PDF préparé pour le service Gemini (lecture du fichier et de sa couche texte une fois).
+
+    Mode de transport, du plus léger au plus lourd :
+    - PDF numérique : seul le texte extrait est envoyé, à chaque requête ;
+    - petit scan : le PDF est joint directement à chaque requête (inline) ;
+    - gros scan (au-delà de GEMINI_SEUIL_INLINE_MO) : le fichier est téléversé une fois,
+      puis seule sa référence est envoyée aux requêtes suivantes.
+
+    Si `pages` est fourni, seul un sous-document de ces pages est transmis
+    (voir `extraire_pages_pdf`).
+    """
+
+    def __init__(self, pdf_path: str, client: genai.Client, pages: list = None):
+        self.pdf_path = pdf_path
+        self.client = client
+        with open(pdf_path, "rb") as f:
+            self.pdf_bytes = f.read()
+        self.sous_document = False
+        if pages:
+            pdf_reduit = extraire_pages_pdf(self.pdf_bytes, pages)
+            self.sous_document = pdf_reduit is not self.pdf_bytes
+            self.pdf_bytes = pdf_reduit
+        self.texte = extraire_couche_texte(self.pdf_bytes)
+        self._fichier = None
+
+    def contenu(self):
+        """
+        Retourne la partie à joindre au prompt : le texte extrait si le PDF en a un,
+        sinon le PDF en ligne, sinon la référence au fichier (upload au premier appel uniquement).
+        """
+        if self.texte is not None:
+            return f"Contenu textuel de la facture (extrait du PDF) :\n{self.texte}"
+
+        if len(self.pdf_bytes) <= _seuil_inline_octets():
+            return types.Part.from_bytes(data=self.pdf_bytes, mime_type="application/pdf")
+
+        if self._fichier is None:
+            print(f"⏳ Téléchargement du fichier PDF ({self.pdf_path}) dans le service Gemini...")
+            if self.sous_document:
+                fichier = self.client.files.upload(file=io.BytesIO(self.pdf_bytes), config={"mime_type": "application/pdf"})
+            else:
+                fichier = self.client.files.upload(file=self.pdf_path)
+            self._fichier = attendre_fichier_actif(self.client, fichier)
+        return self._fichier
+
+    def partie(self) -> types.Part:
+        """
+        Même contenu que `contenu()`, toujours sous forme de `types.Part`
+        (format exigé par les requêtes du traitement par lot).
+        """
+        contenu = self.contenu()
+        if isinstance(contenu, str):
+            return types.Part.from_text(text=contenu)
+        if isinstance(contenu, types.Part):
+            return contenu
+        return types.Part.from_uri(file_uri=contenu.uri, mime_type=contenu.mime_type)
+
+    def liberer(self):
+        """Programme la suppression du fichier côté Gemini s'il a été téléversé (sans attendre)."""
+        if self._fichier is not None:
+            supprimer_fichier_async(self.client, self._fichier.name)
+            self._fichier = None
+
+
+# Documents préparés (et téléversés s'il y a lieu), réutilisables d'un rerun Streamlit à l'autre
+_documents_envoyes = {}
+_verrou_documents = threading.Lock()
+
+
+def obtenir_document(pdf_path: str, client: genai.Client, pages: list = None) -> DocumentGemini:
+    """
+    Retourne le DocumentGemini associé à ce chemin, réduit à `pages` si elles sont données
+    (créé au premier appel).
+    """
+    cle = (pdf_path, tuple(pages)) if pages else pdf_path
+    with _verrou_documents:
+        document = _documents_envoyes.get(cle)
+        if document is None:
+            document = DocumentGemini(pdf_path, client, pages=pages)
+            _documents_envoyes[cle] = document
+        return document
+
+
+def liberer_documents():
+    """
+    Supprime du service Gemini tous les documents transmis (fin de série).
+    """
+    with _verrou_documents:
+        documents = list(_documents_envoyes.values())
+        _documents_envoyes.clear()
+    for document in documents:
+        document.liberer()
+
+
+def _schema_extraction(avec_regles: bool) -> types.Schema:
+    """
+    Schéma JSON de l'extraction combinée : découpage, identification et, si demandé,
+    valeurs des règles d'imputation pour chaque facture du document.
+    """
+    proprietes = {
+        "nom_fournisseur": types.Schema(type=types.Type.STRING, description="Le nom de l'entreprise ou du fournisseur qui a émis la facture."),
+        "numero_facture": types.Schema(type=types.Type.STRING, description="Le numéro unique de la facture."),
+        "date_facture": types.Schema(type=types.Type.STRING, description="La date de la facture au format JJ/MM/AAAA."),
+        "page_debut": types.Schema(type=types.Type.INTEGER, description="Le numéro de la première page de cette facture (base 1)."),
+        "page_fin": types.Schema(type=types.Type.INTEGER, description="Le numéro de la dernière page de cette facture (base 1)."),
+        "montant_total": types.Schema(type=types.Type.STRING, description="Le montant total de la facture, y compris la devise."),
+    }
+    requis = ["nom_fournisseur", "numero_facture", "date_facture", "page_debut", "page_fin"]
+
+    if avec_regles:
+        proprietes["valeurs_regles"] = types.Schema(
+            type=types.Type.ARRAY,
+            items=types.Schema(type=types.Type.STRING),
+            description="Les valeurs demandées par les règles d'imputation, dans l'ordre des règles."
+        )
+        requis.append("valeurs_regles")
+
+    facture_schema = types.Schema(type=types.Type.OBJECT, properties=proprietes, required=requis)
+
+    return types.Schema(
         type=types.Type.OBJECT,
         properties={
             "factures": types.Schema(
@@ -138,51 +365,140 @@ def analyser_et_separer_factures(chemin_pdf: str, client: genai.Client, nom_mode
         },
         required=["factures"]
     )
-    
-    # --- 4. Création de l'Instruction (Prompt) ---
+
+
+def extraire_facture_complete(pdf_path: str, client: genai.Client, regles_imputation: list = None, nom_modele: str = MODELE_GEMINI):
+    """
+    Extraction combinée en un seul appel Gemini : pour chaque facture du PDF,
+    retourne les pages de début/fin, le fournisseur, la date, le numéro, le montant total
+    et, si `regles_imputation` est fourni, les valeurs demandées par ces règles.
+
+    Une seconde passe `extraire_valeurs_regles`, une fois le fournisseur identifié,
+    n'envoie ensuite que les pages de la facture concernée.
+
+    :param pdf_path: Le chemin d'accès au fichier PDF (une ou plusieurs factures).
+    :param regles_imputation: Liste optionnelle de tuples (compte, regle).
+    :return: Une liste de dictionnaires (un par facture), ou None en cas d'erreur.
+    """
+    try:
+        nombre_pages = len(PdfReader(pdf_path).pages)
+    except Exception as e:
+        print(f"Erreur lors de la lecture du fichier PDF : {e}")
+        return None
+
+    regles = textes_regles(regles_imputation) if regles_imputation else None
+    prompt = prompt_extraction(nombre_pages, regles)
+
+    try:
+        document = obtenir_document(pdf_path, client)
+        cle_cache, resultat_cache = _lire_cache(document.pdf_bytes, prompt, regles, nom_modele)
+        if resultat_cache is not None:
+            return resultat_cache
+
+        print("⏳ Extraction combinée (découpage, identification, règles)...")
+        response = client.models.generate_content(
+            model=nom_modele,
+            contents=[prompt, document.contenu()],
+            config=config_extraction(bool(regles)),
+        )
+
+        factures = lire_factures_extraites(response.text)
+        _ecrire_cache(cle_cache, factures)
+        return factures
+
+    except Exception as e:
+        print(f"Erreur Gemini (extraction combinée) : {e}")
+        return None
+
+
+def prompt_extraction(nombre_pages: int, regles: list = None) -> str:
+    """
+    Instruction de l'extraction combinée (partagée avec le traitement par lot).
+    """
     prompt = f"""
-    Le fichier PDF fourni contient potentiellement plusieurs factures.
-    Votre tâche est d'analyser l'intégralité du document (pages 1 à {nombre_pages})
-    et d'identifier chaque facture distincte. Pour chaque facture, vous devez extraire :
+    Le fichier PDF fourni contient une ou plusieurs factures (pages 1 à {nombre_pages}).
+    Pour chaque facture distincte, extrais :
     1. Le nom du fournisseur (nom_fournisseur).
     2. Son numéro unique (numero_facture).
-    3. La première page où elle commence (page_debut, base 1).
-    4. La dernière page où elle se termine (page_fin, base 1).
-    5. Le montant total.
-    
-    Retournez la liste de toutes les factures identifiées dans le format JSON spécifié.
+    3. La date de la facture au format JJ/MM/AAAA (date_facture).
+    4. La première page où elle commence (page_debut, base 1).
+    5. La dernière page où elle se termine (page_fin, base 1).
+    6. Le montant total (montant_total).
+    """
+    if regles:
+        prompt += f"""
+    7. Les valeurs suivantes, dans cet ordre (valeurs_regles) : {regles}
+    """
+    prompt += """
+    Retourne la liste de toutes les factures identifiées dans le format JSON spécifié.
     """
+    return prompt
+
+
+def config_extraction(avec_regles: bool) -> types.GenerateContentConfig:
+    """Configuration (réponse JSON structurée) de l'extraction combinée."""
+    return types.GenerateContentConfig(
+        response_mime_type="application/json",
+        response_schema=_schema_extraction(avec_regles),
+    )
+
+
+def lire_factures_extraites(texte_reponse: str) -> list:
+    """Convertit la réponse JSON de l'extraction combinée en liste de factures."""
+    factures = json.loads(texte_reponse).get("factures", [])
+    for facture in factures:
+        if "valeurs_regles" in facture:
+            facture["valeurs_regles"] = tuple(facture["valeurs_regles"])
+    return factures
+
+
+def extraire_valeurs_regles(pdf_path: str, client: genai.Client, regles_imputation: list,
+                            page_debut: int = None, page_fin: int = None, nom_modele: str = MODELE_GEMINI):
+    """
+    Seconde passe "règles uniquement" sur le document analysé par `extraire_facture_complete`.
+
+    Seules les pages utiles sont envoyées (voir `pages_facture`) : celles de la facture située
+    des pages `page_debut` à `page_fin` du document source, réduites aux pages déclarées par les règles.
+    Retourne un tuple de résultats (même contrat que `application_regle_imputation_V2`),
+    ou un message d'erreur.
+    """
+    regles = textes_regles(regles_imputation)
+
+    prompt = (
+        f"À partir du fichier PDF joint, renvoie-moi les données suivantes, dans cet ordre :\n"
+        f"{regles}"
+    )
+
+    schema = types.Schema(
+        type=types.Type.OBJECT,
+        properties={
+            "valeurs": types.Schema(type=types.Type.ARRAY, items=types.Schema(type=types.Type.STRING))
+        },
+        required=["valeurs"]
+    )
 
-    # --- 5. Envoi à l'API Gemini ---
-    fichier_media = None # Initialisation pour le bloc finally
     try:
-        # Upload du fichier pour l'analyse
-        fichier_media = client.files.upload(file=chemin_pdf)
-        print(f"Fichier téléversé : {fichier_media.name}")
-        
-        # Appel à l'API
+        document = obtenir_document(pdf_path, client, pages_facture(regles_imputation, page_debut, page_fin))
+        cle_cache, resultat_cache = _lire_cache(document.pdf_bytes, prompt, regles, nom_modele)
+        if resultat_cache is not None:
+            return resultat_cache
+
+        print("⏳ Application des règles sur les pages de la facture...")
         response = client.models.generate_content(
             model=nom_modele,
-            contents=[prompt, fichier_media],
+            contents=[prompt, document.contenu()],
             config=types.GenerateContentConfig(
                 response_mime_type="application/json",
-                response_schema=liste_factures_schema,
+                response_schema=schema,
             ),
         )
 
-        # Traitement de la Réponse
-        resultats = json.loads(response.text)
-        return resultats.get("factures", [])
-        
-    except Exception as e:
-        print(f"Une erreur est survenue lors de l'appel à l'API Gemini : {e}")
-        return None
-    finally:
-        # Suppression du fichier téléversé après utilisation (même en cas d'erreur)
-        if fichier_media:
-            client.files.delete(name=fichier_media.name)
-            print("Fichier téléversé supprimé.")
+        resultat_tuple = tuple(json.loads(response.text).get("valeurs", []))
+        _ecrire_cache(cle_cache, resultat_tuple)
+        return resultat_tuple
 
+    except Exception as e:
+        return f"❌ Erreur inattendue : {e}"
 
 
 def application_regle_imputation(pdf_path: str, client: genai.Client, regles_imputation: list) -> tuple:
@@ -191,24 +507,13 @@ def application_regle_imputation(pdf_path: str, client: genai.Client, regles_imp
     Retourne un tuple contenant les résultats.
     """
     
-    pdf_file = None
+    document = None
     try:
-        print(f"⏳ Téléchargement du fichier PDF ({pdf_path}) dans le service Gemini...")
-        pdf_file = client.files.upload(file=pdf_path)
-        print(f"   Fichier téléversé : {pdf_file.name}")
-
-        # Attente de l'état ACTIF
-        while pdf_file.state != 'ACTIVE':
-            if pdf_file.state != 'PROCESSING':
-                raise RuntimeError(f"Le traitement du fichier a échoué. État actuel : {pdf_file.state}")
-            print(f"   État du fichier : {pdf_file.state}. Attente de 2 secondes...")
-            time.sleep(2)
-            pdf_file = client.files.get(name=pdf_file.name)
-        
-        print("✅ Le fichier est maintenant ACTIF et prêt à être utilisé.")
+        # Texte, PDF en ligne ou upload selon le document (voir DocumentGemini)
+        document = DocumentGemini(pdf_path, client)
 
         # Préparation du prompt
-        regles = [r[1] for r in regles_imputation]
+        regles = textes_regles(regles_imputation)
         prompt = (
             f"A partir du fichier pdf joint, renvoie moi les données suivantes dans un tuple :\n"
             f"{regles}\n"
@@ -217,8 +522,8 @@ def application_regle_imputation(pdf_path: str, client: genai.Client, regles_imp
 
         print("⏳ Envoi de la demande d'analyse...")
         response = client.models.generate_content(
-            model='gemini-2.5-flash',
-            contents=[prompt, pdf_file]
+            model=MODELE_GEMINI,
+            contents=[prompt, document.contenu()]
         )
 
         print("✅ Réponse reçue de Gemini.")
@@ -241,44 +546,44 @@ def application_regle_imputation(pdf_path: str, client: genai.Client, regles_imp
     except Exception as e:
         return f"Une erreur inattendue s'est produite : {e}"
     finally:
-        if pdf_file:
-            print(f"🗑️ Suppression du fichier temporaire : {pdf_file.name}")
-            client.files.delete(name=pdf_file.name)
+        if document:
+            document.liberer()
 
 
 def application_regle_imputation_V2(pdf_path: str, client: genai.Client, regles_imputation: list) -> tuple:
     """
-    Analyse un fichier PDF de facture avec Gemini sans upload.
-    Envoie le PDF directement en mémoire pour extraire les données selon les règles d'imputation.
+    Analyse un fichier PDF de facture avec Gemini, sans upload sauf pour les très gros scans.
+    Envoie le texte du PDF, ou le PDF directement en mémoire, pour extraire les données
+    selon les règles d'imputation.
     Retourne un tuple contenant les résultats.
     """
+    document = None
     try:
-        # Lecture du fichier PDF en mémoire
-        with open(pdf_path, "rb") as f:
-            pdf_bytes = f.read()
+        # Lecture du fichier PDF en mémoire, réduit aux pages déclarées par les règles
+        document = DocumentGemini(pdf_path, client, pages=pages_des_regles(regles_imputation))
+        pdf_bytes = document.pdf_bytes
         print(f"📄 Fichier PDF chargé en mémoire : {pdf_path} ({len(pdf_bytes)} octets)")
 
         # Préparation du prompt
-        regles = [r[1] for r in regles_imputation]
+        regles = textes_regles(regles_imputation)
         prompt = (
             f"À partir du fichier PDF joint, renvoie-moi les données suivantes dans un tuple Python :\n"
             f"{regles}\n"
             f"Donne-moi UNIQUEMENT le tuple au format (résultat1, résultat2, ...)"
         )
 
-        # Envoi direct du PDF au modèle Gemini (sans upload)
-        print("⏳ Envoi du PDF au modèle Gemini...")
+        cle_cache, resultat_cache = _lire_cache(pdf_bytes, prompt, regles, MODELE_GEMINI)
+        if resultat_cache is not None:
+            return resultat_cache
+
+        # PDF numérique : on envoie seulement son texte, sinon le PDF en mémoire
+        if document.texte is not None:
+            print(f"📝 Couche texte détectée : envoi de {len(document.texte)} caractères au lieu du PDF.")
+
+        print("⏳ Envoi du document au modèle Gemini...")
         response = client.models.generate_content(
-            model="gemini-2.5-flash",
-            contents=[
-                {
-                    "role": "user",
-                    "parts": [
-                        {"text": prompt},
-                        {"inline_data": {"mime_type": "application/pdf", "data": pdf_bytes}},
-                    ],
-                }
-            ],
+            model=MODELE_GEMINI,
+            contents=[prompt, document.contenu()],
         )
 
         print("✅ Réponse reçue de Gemini.")
@@ -290,6 +595,7 @@ def application_regle_imputation_V2(pdf_path: str, client: genai.Client, regles_
             resultat_tuple = ast.literal_eval(texte_reponse)
             if not isinstance(resultat_tuple, tuple):
                 raise ValueError("La réponse n'est pas un tuple valide.")
+            _ecrire_cache(cle_cache, resultat_tuple)
             return resultat_tuple
 
         except (SyntaxError, ValueError) as e:
@@ -297,20 +603,6 @@ def application_regle_imputation_V2(pdf_path: str, client: genai.Client, regles_
 
     except Exception as e:
         return f"❌ Erreur inattendue : {e}"
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
+    finally:
+        if document:
+            document.liberer()
@@ -0,0 +1,238 @@
+"""
+Moteurs de stockage de gestion_bdd, choisis d'après l'URL de la base :
+
+- `postgresql://...` (ou `postgres://...`) : base PostgreSQL distante (Neon), via le pool de gestion_bdd ;
+- `sqlite:///chemin/vers/comptabilite.db` : base SQLite locale (mode WAL), pour un poste seul,
+  sans latence réseau et utilisable hors ligne.
+
+Les requêtes sont écrites pour psycopg2 (paramètres `%s`) ; la connexion SQLite les adapte
+et fournit les fonctions SQL du schéma PostgreSQL (normaliser_compte, similarity...).
+"""
+
+import re
+import sqlite3
+import threading
+from datetime import date, datetime
+from decimal import Decimal
+
+DIALECTE_POSTGRES = "postgres"
+DIALECTE_SQLITE = "sqlite"
+
+PREFIXE_SQLITE = "sqlite:///"
+# Attente maximale (millisecondes) quand un autre processus écrit dans la base SQLite
+DELAI_VERROU_SQLITE = 5000
+
+
+def dialecte_url(db_url: str) -> str:
+    """Dialecte SQL de la base désignée par cette URL."""
+    if db_url and db_url.startswith(PREFIXE_SQLITE):
+        return DIALECTE_SQLITE
+    return DIALECTE_POSTGRES
+
+
+def dialecte(connexion_ou_curseur) -> str:
+    """Dialecte SQL d'une connexion (ou d'un curseur) obtenue par gestion_bdd."""
+    return getattr(connexion_ou_curseur, "dialecte", DIALECTE_POSTGRES)
+
+
+# ----------------------------
+# Fonctions SQL du schéma, pour SQLite
+# ----------------------------
+def normaliser_compte(compte):
+    """Équivalent de la fonction SQL normaliser_compte : "1/25" -> "01/025"."""
+    if compte is None:
+        return ""
+    parties = re.fullmatch(r"\s*([0-9]+)\s*/\s*([0-9]+)\s*", compte)
+    if not parties:
+        return compte
+    return f"{int(parties.group(1)):02d}/{int(parties.group(2)):03d}"
+
+
+def texte_recherche_ecriture(fournisseur, compte, nom_fichier, date_facture):
+    """Équivalent de la fonction SQL texte_recherche_ecriture (date stockée en AAAA-MM-JJ)."""
+    date_texte = None
+    if date_facture:
+        annee, mois, jour = str(date_facture)[:10].split("-")
+        date_texte = f"{jour}/{mois}/{int(annee)}"
+    morceaux = [m for m in (fournisseur, compte, nom_fichier, date_texte) if m is not None]
+    return " ".join(str(m) for m in morceaux).lower()
+
+
+def _trigrammes(texte: str) -> set:
+    """Trigrammes de chaque mot (alphanumérique), comme pg_trgm."""
+    resultat = set()
+    for mot in re.findall(r"\w+", (texte or "").lower()):
+        mot = f"  {mot} "
+        resultat.update(mot[i:i + 3] for i in range(len(mot) - 2))
+    return resultat
+
+
+def similarity(texte_a, texte_b) -> float:
+    """Équivalent de similarity() de pg_trgm : trigrammes communs / trigrammes distincts."""
+    a, b = _trigrammes(texte_a), _trigrammes(texte_b)
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def word_similarity(texte_a, texte_b) -> float:
+    """
+    Équivalent approché de word_similarity() de pg_trgm : meilleure similarité entre `texte_a`
+    et une suite de mots consécutifs de `texte_b` (autant de mots que dans `texte_a`).
+    """
+    mots = re.findall(r"\w+", (texte_b or "").lower())
+    taille = max(1, len(re.findall(r"\w+", (texte_a or "").lower())))
+    fenetres = [" ".join(mots[i:i + taille]) for i in range(max(1, len(mots) - taille + 1))]
+    return max(similarity(texte_a, fenetre) for fenetre in fenetres)
+
+
+def _majuscules(texte):
+    return texte.upper() if isinstance(texte, str) else texte
+
+
+def _minuscules(texte):
+    return texte.lower() if isinstance(texte, str) else texte
+
+
+# Dates et montants : mêmes types Python qu'avec psycopg2
+sqlite3.register_adapter(date, lambda d: d.isoformat())
+sqlite3.register_adapter(datetime, lambda d: d.isoformat(" "))
+sqlite3.register_adapter(Decimal, float)
+sqlite3.register_converter("DATE", lambda valeur: date.fromisoformat(valeur.decode()[:10]))
+sqlite3.register_converter("TIMESTAMP", lambda valeur: datetime.fromisoformat(valeur.decode()))
+
+
+# ----------------------------
+# Connexion SQLite au comportement de psycopg2
+# ----------------------------
+def adapter_requete(requete: str) -> str:
+    """Paramètres psycopg2 -> SQLite : `%s` devient `?` et `%%` redevient `%`."""
+    return re.sub(r"%([s%])", lambda m: "?" if m.group(1) == "s" else "%", requete)
+
+
+class CurseurSQLite:
+    """Curseur SQLite acceptant les requêtes écrites pour psycopg2."""
+
+    dialecte = DIALECTE_SQLITE
+
+    def __init__(self, connexion):
+        self.connexion = connexion
+        self._curseur = connexion._conn.cursor()
+
+    def _debuter(self, requete: str):
+        # Comme psycopg2 : la première instruction ouvre une transaction (DDL compris)
+        if not self.connexion._conn.in_transaction and not requete.lstrip().upper().startswith("BEGIN"):
+            self._curseur.execute("BEGIN")
+
+    def execute(self, requete, parametres=()):
+        self._debuter(requete)
+        self._curseur.execute(adapter_requete(requete), parametres or ())
+        return self
+
+    def executemany(self, requete, liste_parametres):
+        self._debuter(requete)
+        self._curseur.executemany(adapter_requete(requete), liste_parametres)
+        return self
+
+    def fetchone(self):
+        return self._curseur.fetchone()
+
+    def fetchall(self):
+        return self._curseur.fetchall()
+
+    def fetchmany(self, taille):
+        return self._curseur.fetchmany(taille)
+
+    @property
+    def description(self):
+        return self._curseur.description
+
+    @property
+    def rowcount(self):
+        return self._curseur.rowcount
+
+    def close(self):
+        self._curseur.close()
+
+
+class ConnexionSQLite:
+    """Connexion SQLite (mode WAL) avec les fonctions SQL du schéma et des transactions à la psycopg2."""
+
+    dialecte = DIALECTE_SQLITE
+
+    def __init__(self, chemin: str):
+        # Transactions gérées explicitement (isolation_level=None), ouvertes par le curseur
+        self._conn = sqlite3.connect(
+            chemin, isolation_level=None, check_same_thread=False,
+            detect_types=sqlite3.PARSE_DECLTYPES,
+        )
+        self._conn.execute("PRAGMA journal_mode = WAL")
+        self._conn.execute("PRAGMA synchronous = NORMAL")
+        self._conn.execute("PRAGMA foreign_keys = ON")
+        self._conn.execute(f"PRAGMA busy_timeout = {DELAI_VERROU_SQLITE}")
+        # UPPER/LOWER natifs de SQLite ignorent les accents : on prend ceux de Python
+        self._conn.create_function("UPPER", 1, _majuscules, deterministic=True)
+        self._conn.create_function("LOWER", 1, _minuscules, deterministic=True)
+        self._conn.create_function("normaliser_compte", 1, normaliser_compte, deterministic=True)
+        self._conn.create_function("texte_recherche_ecriture", 4, texte_recherche_ecriture, deterministic=True)
+        self._conn.create_function("similarity", 2, similarity, deterministic=True)
+        self._conn.create_function("word_similarity", 2, word_similarity, deterministic=True)
+        self.closed = 0
+
+    def cursor(self):
+        return CurseurSQLite(self)
+
+    def commit(self):
+        if self._conn.in_transaction:
+            self._conn.execute("COMMIT")
+
+    def rollback(self):
+        if self._conn.in_transaction:
+            self._conn.execute("ROLLBACK")
+
+    def close(self):
+        self._conn.close()
+        self.closed = 1
+
+
+class BaseSQLite:
+    """
+    Connexions à une base SQLite, réutilisées d'un appel à l'autre
+    (même interface `prendre()` / `rendre()` que le pool PostgreSQL).
+    """
+
+    def __init__(self, db_url: str):
+        self.chemin = db_url[len(PREFIXE_SQLITE):]
+        self._libres = []
+        self._verrou = threading.Lock()
+
+    def prendre(self) -> ConnexionSQLite:
+        with self._verrou:
+            if self._libres:
+                return self._libres.pop()
+        return ConnexionSQLite(self.chemin)
+
+    def rendre(self, conn: ConnexionSQLite):
+        if conn.closed:
+            return
+        try:
+            conn.rollback()
+        except Exception:
+            conn.close()
+            return
+        with self._verrou:
+            self._libres.append(conn)
+
+
+_bases_sqlite = {}
+_verrou_bases = threading.Lock()
+
+
+def get_base_sqlite(db_url: str) -> BaseSQLite:
+    """Retourne l'accès partagé à la base SQLite de cette URL (créé au premier appel)."""
+    with _verrou_bases:
+        base = _bases_sqlite.get(db_url)
+        if base is None:
+            base = BaseSQLite(db_url)
+            _bases_sqlite[db_url] = base
+        return base
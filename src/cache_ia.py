@@ -0,0 +1,219 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+
+
+# Constantes
+CHEMIN_CACHE_DEFAUT = os.path.join("data", "cache", "cache_ia.sqlite3")
+TAILLE_MAX_DEFAUT_MO = 200
+DUREE_MAX_DEFAUT_JOURS = 90
+
+
+def calculer_empreinte(pdf_bytes: bytes) -> str:
+    """
+    Calcule l'empreinte SHA-256 (hexadécimale) du contenu d'un fichier.
+    """
+    return hashlib.sha256(pdf_bytes).hexdigest()
+
+
+def calculer_cle_cache(pdf_bytes: bytes, prompt: str, regles, nom_modele: str) -> str:
+    """
+    Construit la clé du cache à partir du contenu du PDF, du prompt, des règles et du modèle.
+    Deux appels identiques (mêmes octets, même demande) produisent toujours la même clé.
+    """
+    h = hashlib.sha256()
+    h.update(pdf_bytes)
+    h.update(json.dumps([prompt, regles, nom_modele], ensure_ascii=False, sort_keys=True, default=str).encode("utf-8"))
+    return h.hexdigest()
+
+
+def _encoder(valeur):
+    """Les tuples ne survivent pas à JSON : on les marque pour pouvoir les reconstruire."""
+    if isinstance(valeur, tuple):
+        return {"__tuple__": [_encoder(v) for v in valeur]}
+    if isinstance(valeur, list):
+        return [_encoder(v) for v in valeur]
+    if isinstance(valeur, dict):
+        return {k: _encoder(v) for k, v in valeur.items()}
+    return valeur
+
+
+def _decoder(valeur):
+    if isinstance(valeur, dict):
+        if set(valeur.keys()) == {"__tuple__"}:
+            return tuple(_decoder(v) for v in valeur["__tuple__"])
+        return {k: _decoder(v) for k, v in valeur.items()}
+    if isinstance(valeur, list):
+        return [_decoder(v) for v in valeur]
+    return valeur
+
+
+class CacheIA:
+    """
+    Cache persistant (SQLite local) des réponses Gemini.
+
+    - Les entrées plus anciennes que `duree_max_secondes` sont ignorées puis supprimées.
+    - Quand la taille totale dépasse `taille_max_octets`, les entrées les moins
+      récemment utilisées sont supprimées en premier.
+    - Les compteurs `hits` / `misses` sont tenus pour le processus courant.
+    """
+
+    def __init__(self, chemin: str = CHEMIN_CACHE_DEFAUT,
+                 taille_max_octets: int = TAILLE_MAX_DEFAUT_MO * 1024 * 1024,
+                 duree_max_secondes: float = DUREE_MAX_DEFAUT_JOURS * 86400):
+        self.chemin = chemin
+        self.taille_max_octets = taille_max_octets
+        self.duree_max_secondes = duree_max_secondes
+        self.hits = 0
+        self.misses = 0
+        self._verrou = threading.Lock()
+        self._initialiser()
+
+    def _connexion(self):
+        conn = sqlite3.connect(self.chemin, timeout=5)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def _initialiser(self):
+        dossier = os.path.dirname(self.chemin)
+        if dossier:
+            os.makedirs(dossier, exist_ok=True)
+        conn = self._connexion()
+        try:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS cache_ia (
+                    cle TEXT PRIMARY KEY,
+                    valeur TEXT NOT NULL,
+                    taille INTEGER NOT NULL,
+                    date_creation REAL NOT NULL,
+                    date_acces REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_cache_ia_acces ON cache_ia (date_acces)")
+            conn.commit()
+        finally:
+            conn.close()
+
+    def lire(self, cle: str):
+        """
+        Retourne la valeur associée à la clé, ou None si absente ou expirée.
+        """
+        with self._verrou:
+            try:
+                conn = self._connexion()
+                try:
+                    row = conn.execute(
+                        "SELECT valeur, date_creation FROM cache_ia WHERE cle = ?", (cle,)
+                    ).fetchone()
+                    maintenant = time.time()
+                    if not row or maintenant - row[1] > self.duree_max_secondes:
+                        self.misses += 1
+                        return None
+                    conn.execute("UPDATE cache_ia SET date_acces = ? WHERE cle = ?", (maintenant, cle))
+                    conn.commit()
+                    self.hits += 1
+                    return _decoder(json.loads(row[0]))
+                finally:
+                    conn.close()
+            except Exception as e:
+                print(f"⚠️ Cache IA illisible : {e}")
+                self.misses += 1
+                return None
+
+    def ecrire(self, cle: str, valeur):
+        """
+        Enregistre une valeur (sérialisable en JSON) puis applique l'éviction.
+        """
+        with self._verrou:
+            try:
+                texte = json.dumps(_encoder(valeur), ensure_ascii=False)
+                maintenant = time.time()
+                conn = self._connexion()
+                try:
+                    conn.execute(
+                        "INSERT OR REPLACE INTO cache_ia (cle, valeur, taille, date_creation, date_acces) VALUES (?, ?, ?, ?, ?)",
+                        (cle, texte, len(texte.encode("utf-8")), maintenant, maintenant)
+                    )
+                    self._evincer(conn, maintenant)
+                    conn.commit()
+                finally:
+                    conn.close()
+            except Exception as e:
+                print(f"⚠️ Écriture dans le cache IA impossible : {e}")
+
+    def _evincer(self, conn, maintenant: float):
+        """Supprime les entrées expirées puis les moins récemment utilisées si le cache est trop gros."""
+        conn.execute("DELETE FROM cache_ia WHERE date_creation < ?", (maintenant - self.duree_max_secondes,))
+
+        taille_totale = conn.execute("SELECT COALESCE(SUM(taille), 0) FROM cache_ia").fetchone()[0]
+        if taille_totale <= self.taille_max_octets:
+            return
+
+        a_supprimer = []
+        for cle, taille in conn.execute("SELECT cle, taille FROM cache_ia ORDER BY date_acces ASC"):
+            if taille_totale <= self.taille_max_octets:
+                break
+            a_supprimer.append((cle,))
+            taille_totale -= taille
+        conn.executemany("DELETE FROM cache_ia WHERE cle = ?", a_supprimer)
+
+    def statistiques(self) -> dict:
+        """
+        Retourne les compteurs du processus et l'occupation actuelle du cache.
+        """
+        with self._verrou:
+            nb_entrees, taille = 0, 0
+            try:
+                conn = self._connexion()
+                try:
+                    nb_entrees, taille = conn.execute("SELECT COUNT(*), COALESCE(SUM(taille), 0) FROM cache_ia").fetchone()
+                finally:
+                    conn.close()
+            except Exception as e:
+                print(f"⚠️ Cache IA illisible : {e}")
+            return {"hits": self.hits, "misses": self.misses, "entrees": nb_entrees, "taille_octets": taille}
+
+    def vider(self):
+        """Supprime toutes les entrées du cache."""
+        with self._verrou:
+            conn = self._connexion()
+            try:
+                conn.execute("DELETE FROM cache_ia")
+                conn.commit()
+            finally:
+                conn.close()
+
+
+_cache_ia = None
+_verrou_cache = threading.Lock()
+
+
+def get_cache_ia():
+    """
+    Retourne le cache IA partagé par le processus (créé au premier appel).
+
+    Variables d'environnement :
+    - CACHE_IA_ACTIF : "0" pour désactiver le cache (retourne None).
+    - CACHE_IA_CHEMIN : chemin du fichier SQLite.
+    - CACHE_IA_TAILLE_MAX_MO : taille maximale du cache en Mo.
+    - CACHE_IA_DUREE_MAX_JOURS : âge maximal d'une entrée en jours.
+    """
+    global _cache_ia
+    if os.getenv("CACHE_IA_ACTIF", "1") == "0":
+        return None
+
+    with _verrou_cache:
+        if _cache_ia is None:
+            try:
+                _cache_ia = CacheIA(
+                    chemin=os.getenv("CACHE_IA_CHEMIN", CHEMIN_CACHE_DEFAUT),
+                    taille_max_octets=int(float(os.getenv("CACHE_IA_TAILLE_MAX_MO", TAILLE_MAX_DEFAUT_MO)) * 1024 * 1024),
+                    duree_max_secondes=float(os.getenv("CACHE_IA_DUREE_MAX_JOURS", DUREE_MAX_DEFAUT_JOURS)) * 86400,
+                )
+            except Exception as e:
+                print(f"⚠️ Cache IA indisponible : {e}")
+                return None
+        return _cache_ia
@@ -0,0 +1,303 @@
+import os
+import time
+import random
+import threading
+from google.genai.errors import APIError
+
+
+# Limites par défaut du compte (à ajuster dans le .env)
+RPM_DEFAUT = 60
+TPM_DEFAUT = 1_000_000
+MAX_TENTATIVES_DEFAUT = 5
+
+# Attente entre deux tentatives (secondes)
+ATTENTE_BASE = 1.0
+ATTENTE_PLAFOND = 60.0
+
+# Disjoncteur : nombre d'échecs consécutifs avant ouverture, et durée de la pause
+SEUIL_ECHECS_DEFAUT = 5
+DUREE_OUVERTURE_DEFAUT = 60.0
+# Attente (secondes) entre deux vérifications pendant l'appel d'essai du disjoncteur
+ATTENTE_ESSAI = 0.5
+
+# Estimation grossière du nombre de jetons d'un document joint (PDF, image)
+JETONS_PAR_DOCUMENT = 1500
+
+
+class DisjoncteurOuvert(RuntimeError):
+    """Levée quand les appels Gemini sont suspendus après une série d'échecs."""
+
+
+class SeauJetons:
+    """
+    Limiteur à seau de jetons : `capacite` jetons disponibles, rechargés
+    au rythme de `capacite` par minute.
+    """
+
+    def __init__(self, capacite: float):
+        self.capacite = float(capacite)
+        self.debit = self.capacite / 60.0
+        self._jetons = self.capacite
+        self._derniere_maj = time.monotonic()
+        self._verrou = threading.Lock()
+
+    def _recharger(self):
+        maintenant = time.monotonic()
+        self._jetons = min(self.capacite, self._jetons + (maintenant - self._derniere_maj) * self.debit)
+        self._derniere_maj = maintenant
+
+    def acquerir(self, nombre: float = 1):
+        """
+        Bloque jusqu'à ce que `nombre` jetons soient disponibles, puis les consomme.
+        Une demande supérieure à la capacité est plafonnée (sinon elle n'aboutirait jamais).
+        """
+        nombre = min(float(nombre), self.capacite)
+        while True:
+            with self._verrou:
+                self._recharger()
+                if self._jetons >= nombre:
+                    self._jetons -= nombre
+                    return
+                attente = (nombre - self._jetons) / self.debit
+            time.sleep(attente)
+
+    def ajuster(self, difference: float):
+        """Corrige le solde après coup (ex. consommation réelle connue après la réponse)."""
+        with self._verrou:
+            self._recharger()
+            self._jetons = min(self.capacite, self._jetons - difference)
+
+
+class Disjoncteur:
+    """
+    Coupe les appels après `seuil_echecs` échecs consécutifs, pendant `duree_ouverture` secondes.
+    Passé ce délai, un seul appel d'essai est autorisé (les autres restent refusés) :
+    s'il réussit, le circuit se referme ; s'il échoue, une nouvelle pause commence.
+    """
+
+    def __init__(self, seuil_echecs: int = SEUIL_ECHECS_DEFAUT, duree_ouverture: float = DUREE_OUVERTURE_DEFAUT):
+        self.seuil_echecs = seuil_echecs
+        self.duree_ouverture = duree_ouverture
+        self._echecs = 0
+        self._ouvert_jusqua = 0.0
+        self._demi_ouvert = False   # pause terminée, circuit pas encore refermé
+        self._essai_en_cours = False
+        self._verrou = threading.Lock()
+
+    def temps_restant(self) -> float:
+        """Secondes avant la reprise des appels (0 si le circuit est fermé ou en attente d'un essai)."""
+        with self._verrou:
+            return max(0.0, self._ouvert_jusqua - time.monotonic())
+
+    def est_ouvert(self) -> bool:
+        return self.temps_restant() > 0
+
+    def autoriser(self):
+        """
+        Lève DisjoncteurOuvert si les appels sont suspendus. Après la pause, le premier appel
+        autorisé est l'appel d'essai : son résultat doit être signalé (succès ou échec).
+        """
+        with self._verrou:
+            restant = self._ouvert_jusqua - time.monotonic()
+            if restant > 0:
+                raise DisjoncteurOuvert(f"Appels Gemini suspendus pendant encore {restant:.0f} s (trop d'échecs consécutifs).")
+            if self._demi_ouvert:
+                if self._essai_en_cours:
+                    raise DisjoncteurOuvert("Appels Gemini suspendus : appel d'essai en cours.")
+                self._essai_en_cours = True
+
+    def attendre_fermeture(self):
+        """Bloque tant que le circuit est ouvert ou qu'un appel d'essai est en cours (tâches en arrière-plan)."""
+        while True:
+            with self._verrou:
+                restant = self._ouvert_jusqua - time.monotonic()
+                essai_en_cours = self._essai_en_cours
+            if restant > 0:
+                time.sleep(restant)
+            elif essai_en_cours:
+                time.sleep(ATTENTE_ESSAI)
+            else:
+                return
+
+    def signaler_succes(self):
+        with self._verrou:
+            self._echecs = 0
+            self._demi_ouvert = False
+            self._essai_en_cours = False
+
+    def signaler_echec(self):
+        with self._verrou:
+            if self._demi_ouvert:
+                # Appel d'essai en échec : nouvelle pause
+                self._ouvert_jusqua = time.monotonic() + self.duree_ouverture
+                self._essai_en_cours = False
+                print(f"⛔ Appel d'essai Gemini en échec : disjoncteur rouvert pour {self.duree_ouverture:.0f} s.")
+                return
+            self._echecs += 1
+            if self._echecs >= self.seuil_echecs:
+                self._ouvert_jusqua = time.monotonic() + self.duree_ouverture
+                self._demi_ouvert = True
+                self._echecs = 0
+                print(f"⛔ Disjoncteur Gemini ouvert pour {self.duree_ouverture:.0f} s.")
+
+
+_disjoncteur = None
+_verrou_disjoncteur = threading.Lock()
+
+
+def get_disjoncteur() -> Disjoncteur:
+    """
+    Retourne le disjoncteur partagé par le processus.
+    Variables d'environnement : GEMINI_SEUIL_ECHECS, GEMINI_DUREE_PAUSE.
+    """
+    global _disjoncteur
+    with _verrou_disjoncteur:
+        if _disjoncteur is None:
+            _disjoncteur = Disjoncteur(
+                int(os.getenv("GEMINI_SEUIL_ECHECS", SEUIL_ECHECS_DEFAUT)),
+                float(os.getenv("GEMINI_DUREE_PAUSE", DUREE_OUVERTURE_DEFAUT)),
+            )
+        return _disjoncteur
+
+
+def erreur_reessayable(erreur: Exception) -> bool:
+    """Quota dépassé (429), erreur serveur (5xx) ou coupure réseau."""
+    if isinstance(erreur, APIError):
+        return erreur.code == 429 or (erreur.code or 0) >= 500
+    return isinstance(erreur, (ConnectionError, TimeoutError))
+
+
+def estimer_jetons(contents) -> int:
+    """Estimation du nombre de jetons d'une requête (~4 caractères par jeton)."""
+    if contents is None:
+        return 0
+    if isinstance(contents, str):
+        return len(contents) // 4 + 1
+    if isinstance(contents, (list, tuple)):
+        return sum(estimer_jetons(c) for c in contents)
+    if isinstance(contents, dict):
+        return sum(estimer_jetons(v) for v in contents.values())
+    texte = getattr(contents, "text", None)
+    if isinstance(texte, str):
+        return len(texte) // 4 + 1
+    return JETONS_PAR_DOCUMENT
+
+
+class _ModelesFiables:
+    """Remplace `client.models` : mêmes méthodes, appels protégés."""
+
+    def __init__(self, client_fiable):
+        self._client_fiable = client_fiable
+
+    def generate_content(self, **kwargs):
+        return self._client_fiable.executer(
+            self._client_fiable.client.models.generate_content,
+            jetons=estimer_jetons(kwargs.get("contents")),
+            **kwargs
+        )
+
+    def __getattr__(self, nom):
+        return getattr(self._client_fiable.client.models, nom)
+
+
+def _depuis_le_debut(methode):
+    """Rembobine le fichier ouvert passé en `file` avant chaque tentative (téléversement)."""
+    def appel(*args, **kwargs):
+        fichier = kwargs.get("file")
+        if hasattr(fichier, "seek"):
+            fichier.seek(0)
+        return methode(*args, **kwargs)
+    return appel
+
+
+class _ServiceFiable:
+    """Remplace `client.files` ou `client.batches` : mêmes méthodes, appels protégés."""
+
+    def __init__(self, client_fiable, nom_service: str):
+        self._client_fiable = client_fiable
+        self._nom_service = nom_service
+
+    def __getattr__(self, nom):
+        attribut = getattr(getattr(self._client_fiable.client, self._nom_service), nom)
+        if not callable(attribut):
+            return attribut
+
+        def appel_protege(*args, **kwargs):
+            return self._client_fiable.executer(_depuis_le_debut(attribut), *args, **kwargs)
+        return appel_protege
+
+
+class ClientGeminiFiable:
+    """
+    Enveloppe d'un `genai.Client` partagée par toute l'application :
+    - limiteur de débit (requêtes et jetons par minute) ;
+    - nouvelles tentatives avec attente aléatoire décorrélée sur 429 / 5xx ;
+    - disjoncteur qui suspend les appels (et la file de préchargement) après trop d'échecs.
+
+    S'utilise exactement comme le client d'origine : `client.models.generate_content`
+    et toutes les méthodes de `client.files` et `client.batches` sont protégées.
+    """
+
+    def __init__(self, client, rpm: int = RPM_DEFAUT, tpm: int = TPM_DEFAUT,
+                 max_tentatives: int = MAX_TENTATIVES_DEFAUT, disjoncteur: Disjoncteur = None):
+        self.client = client
+        self.limiteur_requetes = SeauJetons(rpm)
+        self.limiteur_jetons = SeauJetons(tpm)
+        self.max_tentatives = max_tentatives
+        self.disjoncteur = disjoncteur or get_disjoncteur()
+        self.models = _ModelesFiables(self)
+        self.files = _ServiceFiable(self, "files")
+        self.batches = _ServiceFiable(self, "batches")
+
+    def __getattr__(self, nom):
+        # Autres attributs : accès direct au client d'origine
+        return getattr(self.client, nom)
+
+    def executer(self, appel, *args, jetons: int = 0, **kwargs):
+        """
+        Exécute un appel Gemini sous la protection du limiteur, des nouvelles tentatives
+        et du disjoncteur.
+        """
+        attente = ATTENTE_BASE
+        for tentative in range(1, self.max_tentatives + 1):
+            self.disjoncteur.autoriser()
+            self.limiteur_requetes.acquerir(1)
+            self.limiteur_jetons.acquerir(jetons)
+
+            try:
+                reponse = appel(*args, **kwargs)
+            except Exception as e:
+                if not erreur_reessayable(e):
+                    # Le service a répondu (requête refusée) : il est disponible
+                    self.disjoncteur.signaler_succes()
+                    raise
+                self.disjoncteur.signaler_echec()
+                if tentative == self.max_tentatives:
+                    raise
+                # Attente aléatoire décorrélée : entre la base et 3x l'attente précédente
+                attente = min(ATTENTE_PLAFOND, random.uniform(ATTENTE_BASE, attente * 3))
+                print(f"⚠️ Gemini indisponible ({e}). Nouvelle tentative {tentative + 1}/{self.max_tentatives} dans {attente:.1f} s...")
+                time.sleep(attente)
+                continue
+
+            self.disjoncteur.signaler_succes()
+
+            # Consommation réelle de jetons, si Gemini la communique
+            usage = getattr(reponse, "usage_metadata", None)
+            total = getattr(usage, "total_token_count", None) if usage else None
+            if isinstance(total, int):
+                self.limiteur_jetons.ajuster(total - min(jetons, self.limiteur_jetons.capacite))
+            return reponse
+
+
+def envelopper_client(client) -> ClientGeminiFiable:
+    """
+    Enveloppe un `genai.Client` avec les limites lues dans l'environnement :
+    GEMINI_RPM, GEMINI_TPM, GEMINI_MAX_TENTATIVES.
+    """
+    return ClientGeminiFiable(
+        client,
+        rpm=int(os.getenv("GEMINI_RPM", RPM_DEFAUT)),
+        tpm=int(os.getenv("GEMINI_TPM", TPM_DEFAUT)),
+        max_tentatives=int(os.getenv("GEMINI_MAX_TENTATIVES", MAX_TENTATIVES_DEFAUT)),
+    )
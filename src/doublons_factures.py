@@ -0,0 +1,119 @@
+"""
+Détection des factures déjà traitées, pour ne pas les analyser ni les saisir deux fois.
+
+Chaque facture validée laisse deux empreintes dans la table empreintes_factures :
+
+- l'empreinte SHA-256 du fichier déposé : un fichier redéposé tel quel est écarté
+  dès le dépôt, avant tout appel à Gemini, si toutes ses factures ont été validées ;
+- la clé (fournisseur, numéro, date, total) lue par l'extraction : une facture rescannée
+  ou reçue par un autre canal est signalée après l'analyse, avant la validation.
+"""
+
+import re
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+from src.cache_ia import calculer_empreinte
+from src.gestion_bdd import trouver_factures_traitees
+from src.resolution_fournisseurs import normaliser_nom
+
+
+def empreinte_fichier(chemin: str) -> str:
+    """Empreinte SHA-256 du contenu d'un fichier."""
+    with open(chemin, "rb") as f:
+        return calculer_empreinte(f.read())
+
+
+def _montant(texte):
+    """ "1 234,56 €" -> "1234.56" ; None si aucun montant lisible."""
+    chiffres = re.sub(r"[^0-9,.\-]", "", str(texte or ""))
+    decimales = re.search(r"[,.](\d{1,2})$", chiffres)
+    entier = chiffres[:decimales.start()] if decimales else chiffres
+    entier = re.sub(r"[,.]", "", entier)
+    try:
+        valeur = Decimal(f"{entier or 0}.{decimales.group(1) if decimales else 0}")
+    except InvalidOperation:
+        return None
+    return f"{valeur:.2f}" if (entier or decimales) else None
+
+
+def _date(texte):
+    texte = str(texte or "").strip()
+    try:
+        return datetime.strptime(texte, "%d/%m/%Y").date().isoformat()
+    except ValueError:
+        return texte
+
+
+def cle_facture(infos: dict):
+    """
+    Clé d'une facture d'après les valeurs extraites : "FOURNISSEUR|NUMERO|AAAA-MM-JJ|TOTAL".
+    Retourne None sans fournisseur ou sans numéro (la clé serait trop peu discriminante).
+    """
+    if not infos:
+        return None
+    fournisseur = normaliser_nom(infos.get("nom_fournisseur") or "")
+    numero = re.sub(r"[^0-9A-Z]", "", str(infos.get("numero_facture") or "").upper())
+    if not fournisseur or not numero:
+        return None
+    return "|".join([fournisseur, numero, _date(infos.get("date_facture")), _montant(infos.get("montant_total")) or ""])
+
+
+def fichiers_deja_traites(empreintes: list, db_url: str) -> dict:
+    """
+    Fichiers déposés dont toutes les factures ont déjà été validées. Un fichier dont une partie
+    seulement des factures est enregistrée n'y figure pas : il est analysé, et seules les factures
+    déjà connues sont écartées (voir factures_deja_traitees).
+
+    :return: Dictionnaire empreinte -> liste des factures enregistrées pour ce fichier.
+    """
+    par_fichier = {}
+    for facture in trouver_factures_traitees(empreintes, [], db_url):
+        par_fichier.setdefault(facture["empreinte_pdf"], []).append(facture)
+    return {
+        empreinte: factures for empreinte, factures in par_fichier.items()
+        if len(factures) >= max(f["nb_factures_fichier"] or 1 for f in factures)
+    }
+
+
+def factures_deja_traitees(infos_factures: list, db_url: str) -> dict:
+    """
+    Factures extraites d'un fichier dont la clé est déjà connue.
+
+    :return: Dictionnaire position dans `infos_factures` -> facture enregistrée.
+    """
+    cles = [cle_facture(infos) for infos in infos_factures or []]
+    connues = {f["cle_facture"]: f for f in trouver_factures_traitees([], cles, db_url)}
+    return {position: connues[cle] for position, cle in enumerate(cles) if cle in connues}
+
+
+def empreinte_facture(chemin_source: str, infos: dict, nom_fichier: str):
+    """
+    Empreintes d'une facture validée (`chemin_source` : fichier déposé), à enregistrer
+    avec ses écritures (voir ajouter_ecritures_comptables). None si le fichier est illisible.
+    """
+    try:
+        empreinte = empreinte_fichier(chemin_source)
+    except OSError as e:
+        print(f"⚠️ Empreinte de {chemin_source} impossible : {e}")
+        return None
+    infos = infos or {}
+    return {
+        "empreinte_pdf": empreinte,
+        "cle_facture": cle_facture(infos),
+        "fournisseur": infos.get("nom_fournisseur"),
+        "numero_facture": infos.get("numero_facture"),
+        "date_facture": infos.get("date_facture"),
+        "montant_total": infos.get("montant_total"),
+        "nom_fichier": nom_fichier,
+        "nb_factures_fichier": infos.get("nb_factures_source", 1),
+    }
+
+
+def description_facture(facture: dict) -> str:
+    """Résumé lisible d'une facture enregistrée, pour les messages de doublon."""
+    morceaux = [facture.get("fournisseur"), f"n° {facture['numero_facture']}" if facture.get("numero_facture") else None,
+                facture.get("date_facture"), facture.get("montant_total")]
+    resume = ", ".join(m for m in morceaux if m) or facture.get("nom_fichier") or "facture"
+    if facture.get("date_ajout"):
+        resume += f" (validée le {facture['date_ajout']:%d/%m/%Y})"
+    return resume
@@ -0,0 +1,151 @@
+"""
+Import et export en masse des fournisseurs et de leurs règles (CSV ou XLSX).
+
+Format : une ligne par règle, les colonnes du fournisseur étant répétées
+(une seule ligne, compte vide, pour un fournisseur sans règle) :
+
+    fournisseur ; fournisseur_associe ; mode ; compte ; regle
+"""
+
+import io
+import csv
+from openpyxl import Workbook, load_workbook
+from src.gestion_bdd import get_tous_les_fournisseurs, normaliser_nom_fournisseur
+
+COLONNES_FOURNISSEURS = ["fournisseur", "fournisseur_associe", "mode", "compte", "regle"]
+MODES = ("A", "M")
+
+
+def _texte(valeur) -> str:
+    if isinstance(valeur, float) and valeur.is_integer():
+        valeur = int(valeur) # Compte saisi comme un nombre dans Excel
+    return "" if valeur is None else str(valeur).strip()
+
+
+def lire_fichier_fournisseurs(contenu: bytes, nom_fichier: str) -> list:
+    """
+    Lit un fichier CSV (séparateur ; ou ,) ou XLSX au format COLONNES_FOURNISSEURS.
+    Retourne la liste des lignes (dictionnaires), en-têtes en minuscules.
+    Lève ValueError si le fichier est illisible ou s'il manque une colonne.
+    """
+    if nom_fichier.lower().endswith(".xlsx"):
+        classeur = load_workbook(io.BytesIO(contenu), read_only=True, data_only=True)
+        lignes = classeur.active.iter_rows(values_only=True)
+        entete = [_texte(v).lower() for v in next(lignes, [])]
+        donnees = [dict(zip(entete, ligne)) for ligne in lignes]
+        classeur.close()
+    else:
+        try:
+            texte = contenu.decode("utf-8-sig")
+        except UnicodeDecodeError:
+            texte = contenu.decode("cp1252") # Export Excel "CSV (séparateur : point-virgule)"
+        premiere_ligne = texte.split("\n", 1)[0]
+        delimiteur = ";" if premiere_ligne.count(";") >= premiere_ligne.count(",") else ","
+        lecteur = csv.reader(io.StringIO(texte), delimiter=delimiteur)
+        entete = [_texte(v).lower() for v in next(lecteur, [])]
+        donnees = [dict(zip(entete, ligne)) for ligne in lecteur]
+
+    manquantes = [c for c in ("fournisseur", "mode", "compte") if c not in entete]
+    if manquantes:
+        raise ValueError(f"Colonne(s) manquante(s) : {', '.join(manquantes)}")
+    return donnees
+
+
+def valider_fournisseurs(lignes: list):
+    """
+    Regroupe les lignes par fournisseur (nom sans tenir compte de la casse) et les vérifie.
+
+    :return: Tuple (fournisseurs, erreurs) : liste de dictionnaires
+             {fournisseur, fournisseur_associe, mode, associations} et liste de messages
+             (numéro de ligne du fichier, en-tête = ligne 1).
+    """
+    fournisseurs = {}
+    erreurs = []
+    for numero, ligne in enumerate(lignes, start=2):
+        nom = _texte(ligne.get("fournisseur"))
+        associe = _texte(ligne.get("fournisseur_associe"))
+        mode = _texte(ligne.get("mode")).upper()
+        compte = _texte(ligne.get("compte"))
+        regle = _texte(ligne.get("regle"))
+
+        if not any((nom, associe, mode, compte, regle)):
+            continue # Ligne vide
+        if not nom:
+            erreurs.append(f"Ligne {numero} : nom du fournisseur manquant")
+            continue
+        if mode not in MODES:
+            erreurs.append(f"Ligne {numero} : mode « {mode} » invalide pour {nom} (A ou M attendu)")
+            continue
+        if regle and not compte:
+            erreurs.append(f"Ligne {numero} : règle sans compte pour {nom}")
+            continue
+
+        cle = normaliser_nom_fournisseur(nom)
+        fournisseur = fournisseurs.setdefault(cle, {
+            "fournisseur": nom, "fournisseur_associe": associe, "mode": mode, "associations": [],
+        })
+        if (fournisseur["fournisseur_associe"], fournisseur["mode"]) != (associe, mode):
+            erreurs.append(f"Ligne {numero} : fournisseur associé ou mode différent des lignes précédentes pour {nom}")
+            continue
+        if compte:
+            fournisseur["associations"].append((compte, regle))
+
+    return list(fournisseurs.values()), erreurs
+
+
+def comparer_fournisseurs(fournisseurs: list, db_url: str) -> dict:
+    """
+    Simulation de l'import : ce qui serait créé ou modifié, sans rien écrire.
+
+    :return: {"crees": [noms], "modifies": [{fournisseur, avant, apres}], "inchanges": [noms]}
+    """
+    existants = {normaliser_nom_fournisseur(f["fournisseur"]): f for f in get_tous_les_fournisseurs(db_url)}
+    differences = {"crees": [], "modifies": [], "inchanges": []}
+    for fournisseur in fournisseurs:
+        existant = existants.get(normaliser_nom_fournisseur(fournisseur["fournisseur"]))
+        if existant is None:
+            differences["crees"].append(fournisseur["fournisseur"])
+            continue
+        avant = (existant["fournisseur_associe"] or "", existant["mode"], [(c, r or "") for c, r in existant["associations"]])
+        apres = (fournisseur["fournisseur_associe"], fournisseur["mode"], fournisseur["associations"])
+        if avant == apres:
+            differences["inchanges"].append(existant["fournisseur"])
+        else:
+            differences["modifies"].append({
+                "fournisseur": existant["fournisseur"],
+                "avant": _resume(*avant),
+                "apres": _resume(*apres),
+            })
+    return differences
+
+
+def _resume(associe: str, mode: str, associations: list) -> str:
+    comptes = ", ".join(compte for compte, _ in associations)
+    return f"mode {mode}" + (f", associé {associe}" if associe else "") + f", comptes : {comptes or '-'}"
+
+
+def _lignes_export(fournisseurs: list):
+    for f in fournisseurs:
+        associations = f["associations"] or [("", "")]
+        for compte, regle in associations:
+            yield [f["fournisseur"], f["fournisseur_associe"] or "", f["mode"] or "", compte, regle or ""]
+
+
+def exporter_fournisseurs(db_url: str, format_export: str = "csv") -> bytes:
+    """Tous les fournisseurs et leurs règles au format d'import ("csv" ou "xlsx")."""
+    fournisseurs = get_tous_les_fournisseurs(db_url)
+    if format_export == "xlsx":
+        classeur = Workbook(write_only=True)
+        feuille = classeur.create_sheet("Fournisseurs")
+        feuille.append(COLONNES_FOURNISSEURS)
+        for ligne in _lignes_export(fournisseurs):
+            feuille.append(ligne)
+        sortie = io.BytesIO()
+        classeur.save(sortie)
+        return sortie.getvalue()
+
+    sortie = io.StringIO()
+    writer = csv.writer(sortie, delimiter=";", lineterminator="\r\n")
+    writer.writerow(COLONNES_FOURNISSEURS)
+    writer.writerows(_lignes_export(fournisseurs))
+    return sortie.getvalue().encode("utf-8-sig")
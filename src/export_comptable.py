@@ -0,0 +1,235 @@
+"""
+Export des écritures comptables pour le cabinet comptable : FEC, CSV ou XLSX.
+
+Les écritures sont lues par paquets (curseur nommé côté serveur avec PostgreSQL)
+et écrites au fur et à mesure dans le fichier de destination : la mémoire utilisée
+ne dépend pas de la taille du journal exporté.
+"""
+
+import io
+import csv
+import time
+import shutil
+import uuid
+from pathlib import Path
+from decimal import Decimal
+from openpyxl import Workbook
+from src.backends_bdd import dialecte, DIALECTE_SQLITE
+from src.gestion_bdd import get_db_connection, rendre_connexion, motif_commence
+
+# Écritures lues par aller-retour avec la base
+TAILLE_PAQUET = 2000
+
+# Exports téléchargeables : servis depuis le dossier `static` de l'application
+# (server.enableStaticServing), lus sur disque et envoyés par morceaux au navigateur.
+# Chaque export est rangé sous un jeton aléatoire et supprimé après DUREE_VIE_EXPORT secondes.
+DOSSIER_EXPORTS = Path(__file__).resolve().parent.parent / "static" / "exports"
+URL_EXPORTS = "app/static/exports"
+DUREE_VIE_EXPORT = 3600
+
+# Format -> (extension, type MIME)
+FORMATS_EXPORT = {
+    "fec": ("txt", "text/plain"),
+    "csv": ("csv", "text/csv"),
+    "xlsx": ("xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+}
+
+# Fichier des écritures comptables (article A47 A-1 du LPF) : journal des achats,
+# contrepartie de chaque facture au compte fournisseurs
+JOURNAL_FEC = ("AC", "Achats")
+COMPTE_FOURNISSEURS = ("401000", "Fournisseurs")
+COLONNES_FEC = [
+    "JournalCode", "JournalLib", "EcritureNum", "EcritureDate", "CompteNum", "CompteLib",
+    "CompAuxNum", "CompAuxLib", "PieceRef", "PieceDate", "EcritureLib", "Debit", "Credit",
+    "EcritureLet", "DateLet", "ValidDate", "Montantdevise", "Idevise",
+]
+COLONNES_CSV = ["Date", "Fournisseur", "Compte", "Montant", "Fichier", "Date d'ajout"]
+
+
+def parcourir_ecritures(db_url: str, date_min=None, date_max=None, comptes: list = None,
+                        taille_paquet: int = TAILLE_PAQUET):
+    """
+    Parcourt les écritures par date puis par facture, sans jamais charger tout le journal.
+
+    :param comptes: Préfixes de comptes à exporter (tous si vide).
+    :return: Générateur de dictionnaires {id, date_facture, fournisseur, compte, montant, nom_fichier, date_ajout}.
+    """
+    conditions = []
+    parametres = []
+    if date_min:
+        conditions.append("date_facture >= %s")
+        parametres.append(date_min)
+    if date_max:
+        conditions.append("date_facture <= %s")
+        parametres.append(date_max)
+    if comptes:
+        # Préfixes saisis par l'utilisateur : % et _ y sont des caractères comme les autres
+        conditions.append("(" + " OR ".join(r"compte LIKE %s ESCAPE '\'" for _ in comptes) + ")")
+        parametres.extend(motif_commence(compte) for compte in comptes)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+    sql_query = f"""
+    SELECT id, date_facture, fournisseur, compte, montant, nom_fichier, date_ajout
+    FROM ecritures_comptables
+    {where}
+    ORDER BY date_facture, nom_fichier, id
+    """
+
+    conn = get_db_connection(db_url)
+    try:
+        if dialecte(conn) == DIALECTE_SQLITE:
+            cursor = conn.cursor()
+        else:
+            # Curseur nommé : les lignes restent sur le serveur et arrivent paquet par paquet
+            cursor = conn.cursor(name="export_ecritures")
+            cursor.itersize = taille_paquet
+        cursor.execute(sql_query, parametres)
+        colonnes = None
+        while True:
+            rows = cursor.fetchmany(taille_paquet)
+            if not rows:
+                break
+            if colonnes is None:
+                colonnes = [desc[0] for desc in cursor.description]
+            for row in rows:
+                yield dict(zip(colonnes, row))
+    finally:
+        rendre_connexion(conn)
+
+
+def _montant_fec(montant) -> str:
+    """Montant au format FEC : deux décimales, virgule décimale, sans séparateur de milliers."""
+    return f"{Decimal(str(montant or 0)):.2f}".replace(".", ",")
+
+
+def _date_fec(valeur) -> str:
+    return valeur.strftime("%Y%m%d") if valeur else ""
+
+
+def _lignes_fec(ecritures):
+    """
+    Lignes FEC : pour chaque facture (mêmes fichier, date et fournisseur), ses comptes
+    au débit puis le total au crédit du compte fournisseurs.
+    """
+    journal_code, journal_lib = JOURNAL_FEC
+    numero = 0
+    facture, lignes_facture = None, []
+
+    def cloturer():
+        date_facture, fournisseur, nom_fichier = facture
+        total = sum(Decimal(str(e["montant"] or 0)) for e in lignes_facture)
+        date_validation = lignes_facture[-1]["date_ajout"]
+        commun = [journal_code, journal_lib, str(numero), _date_fec(date_facture)]
+        fin = ["", "", _date_fec(date_validation) or _date_fec(date_facture), "", ""]
+        libelle = f"{fournisseur or ''} {nom_fichier or ''}".strip()
+        for e in lignes_facture:
+            montant = Decimal(str(e["montant"] or 0))
+            debit, credit = (montant, 0) if montant >= 0 else (0, -montant)
+            compte = e["compte"] or ""
+            yield commun + [compte, f"Compte {compte}", "", "", nom_fichier or "", _date_fec(date_facture),
+                            libelle, _montant_fec(debit), _montant_fec(credit)] + fin
+        debit, credit = (0, total) if total >= 0 else (-total, 0)
+        compte_fournisseurs, libelle_fournisseurs = COMPTE_FOURNISSEURS
+        yield commun + [compte_fournisseurs, libelle_fournisseurs, (fournisseur or "").upper()[:17], fournisseur or "",
+                        nom_fichier or "", _date_fec(date_facture), libelle, _montant_fec(debit), _montant_fec(credit)] + fin
+
+    for ecriture in ecritures:
+        cle = (ecriture["date_facture"], ecriture["fournisseur"], ecriture["nom_fichier"])
+        if cle != facture and lignes_facture:
+            yield from cloturer()
+            lignes_facture = []
+        if cle != facture:
+            numero += 1
+            facture = cle
+        lignes_facture.append(ecriture)
+    if lignes_facture:
+        yield from cloturer()
+
+
+def _ecrire_texte(destination, entete, lignes, delimiteur: str, encodage: str):
+    """Écrit un fichier texte délimité, en vidant le tampon régulièrement."""
+    tampon = io.StringIO()
+    writer = csv.writer(tampon, delimiter=delimiteur, lineterminator="\r\n")
+    writer.writerow(entete)
+    for numero, ligne in enumerate(lignes, start=1):
+        writer.writerow(ligne)
+        if numero % TAILLE_PAQUET == 0:
+            destination.write(tampon.getvalue().encode(encodage))
+            tampon.seek(0)
+            tampon.truncate()
+    destination.write(tampon.getvalue().encode(encodage))
+
+
+def _ligne_tableau(ecriture) -> list:
+    return [
+        ecriture["date_facture"], ecriture["fournisseur"], ecriture["compte"],
+        float(ecriture["montant"]) if ecriture["montant"] is not None else None,
+        ecriture["nom_fichier"], ecriture["date_ajout"],
+    ]
+
+
+def exporter_ecritures(db_url: str, format_export: str, destination, date_min=None, date_max=None,
+                       comptes: list = None) -> int:
+    """
+    Écrit l'export des écritures dans `destination` (fichier binaire ouvert en écriture).
+
+    :param format_export: "fec" (tabulations, UTF-8), "csv" (point-virgule, pour Excel) ou "xlsx".
+    :return: Nombre d'écritures exportées.
+    """
+    if format_export not in FORMATS_EXPORT:
+        raise ValueError(f"Format d'export inconnu : {format_export}")
+
+    compteur = {"ecritures": 0}
+
+    def ecritures_comptees():
+        for ecriture in parcourir_ecritures(db_url, date_min, date_max, comptes):
+            compteur["ecritures"] += 1
+            yield ecriture
+
+    if format_export == "fec":
+        _ecrire_texte(destination, COLONNES_FEC, _lignes_fec(ecritures_comptees()), "\t", "utf-8")
+    elif format_export == "csv":
+        lignes = (
+            [e["date_facture"].strftime("%d/%m/%Y") if e["date_facture"] else "", e["fournisseur"] or "",
+             e["compte"] or "", _montant_fec(e["montant"]), e["nom_fichier"] or "",
+             e["date_ajout"].strftime("%d/%m/%Y %H:%M") if e["date_ajout"] else ""]
+            for e in ecritures_comptees()
+        )
+        _ecrire_texte(destination, COLONNES_CSV, lignes, ";", "utf-8-sig")
+    else:
+        # Mode écriture seule : les lignes sont écrites sur disque au fil de l'eau
+        classeur = Workbook(write_only=True)
+        feuille = classeur.create_sheet("Écritures")
+        feuille.append(COLONNES_CSV)
+        for ecriture in ecritures_comptees():
+            feuille.append(_ligne_tableau(ecriture))
+        classeur.save(destination)
+
+    return compteur["ecritures"]
+
+
+def _purger_exports(dossier: Path, duree_vie: float):
+    """Supprime les exports plus anciens que `duree_vie` secondes."""
+    limite = time.time() - duree_vie
+    for jeton in dossier.iterdir() if dossier.is_dir() else []:
+        if jeton.stat().st_mtime < limite:
+            shutil.rmtree(jeton, ignore_errors=True)
+
+
+def preparer_export(db_url: str, format_export: str, nom_fichier: str, date_min=None, date_max=None,
+                    comptes: list = None, dossier: Path = DOSSIER_EXPORTS):
+    """
+    Produit l'export directement sur disque, dans le dossier des fichiers servis par l'application.
+    Retourne l'adresse (relative) de téléchargement, ou None en cas d'erreur.
+    """
+    jeton = dossier / uuid.uuid4().hex
+    try:
+        _purger_exports(dossier, DUREE_VIE_EXPORT)
+        jeton.mkdir(parents=True)
+        with open(jeton / nom_fichier, "wb") as fichier:
+            exporter_ecritures(db_url, format_export, fichier, date_min, date_max, comptes)
+        return f"{URL_EXPORTS}/{jeton.name}/{nom_fichier}"
+    except Exception as e:
+        shutil.rmtree(jeton, ignore_errors=True)
+        print(f"❌ Erreur lors de l'export des écritures : {e}")
+        return None
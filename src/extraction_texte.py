@@ -0,0 +1,81 @@
+import os
+import re
+
+
+# Seuils de détection d'une couche texte exploitable
+MIN_CARACTERES_PAR_PAGE = 40
+MAX_PROPORTION_ILLISIBLE = 0.05
+
+
+def _compacter(texte: str) -> str:
+    """Supprime les espaces superflus et les lignes vides."""
+    lignes = (re.sub(r"[ \t ]+", " ", ligne).strip() for ligne in texte.splitlines())
+    return "\n".join(ligne for ligne in lignes if ligne)
+
+
+def _texte_page(page, avec_positions: bool) -> str:
+    if not avec_positions:
+        return _compacter(page.get_text("text", sort=True))
+
+    # Un bloc par ligne, précédé de ses coordonnées (x, y en points depuis le coin haut gauche)
+    lignes = []
+    for x0, y0, x1, y1, texte, *_ in page.get_text("blocks", sort=True):
+        texte = _compacter(texte).replace("\n", " | ")
+        if texte:
+            lignes.append(f"[{x0:.0f},{y0:.0f}] {texte}")
+    return "\n".join(lignes)
+
+
+def couche_texte_exploitable(pages_texte: list) -> bool:
+    """
+    Indique si le texte extrait des pages est suffisant pour se passer du PDF :
+    chaque page doit contenir assez de caractères, et peu de caractères illisibles
+    (polices mal encodées).
+    """
+    if not pages_texte:
+        return False
+    for texte in pages_texte:
+        utiles = [c for c in texte if not c.isspace()]
+        if len(utiles) < MIN_CARACTERES_PAR_PAGE:
+            return False
+        illisibles = sum(1 for c in utiles if c == "�" or not c.isprintable())
+        if illisibles / len(utiles) > MAX_PROPORTION_ILLISIBLE:
+            return False
+    return True
+
+
+def extraire_couche_texte(pdf_bytes: bytes, avec_positions: bool = None):
+    """
+    Extrait le texte d'un PDF numérique avec PyMuPDF.
+
+    Retourne un texte compact (une section par page, optionnellement avec les
+    coordonnées de chaque bloc), ou None si le PDF n'a pas de couche texte
+    exploitable (scan, image) : il faut alors envoyer le fichier lui-même.
+
+    Variables d'environnement :
+    - TEXTE_IA_ACTIF : "0" pour toujours envoyer le PDF.
+    - TEXTE_IA_POSITIONS : "1" pour inclure les coordonnées des blocs.
+    """
+    if os.getenv("TEXTE_IA_ACTIF", "1") == "0":
+        return None
+    if avec_positions is None:
+        avec_positions = os.getenv("TEXTE_IA_POSITIONS", "0") == "1"
+
+    try:
+        import fitz  # PyMuPDF
+
+        doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+        try:
+            pages_texte = [_texte_page(page, avec_positions) for page in doc]
+        finally:
+            doc.close()
+    except Exception as e:
+        print(f"⚠️ Lecture de la couche texte impossible : {e}")
+        return None
+
+    if not couche_texte_exploitable(pages_texte):
+        return None
+
+    return "\n".join(
+        f"--- Page {num} ---\n{texte}" for num, texte in enumerate(pages_texte, start=1)
+    )
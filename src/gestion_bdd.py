@@ -1,78 +1,185 @@
 import os
-import psycopg2
-from psycopg2 import sql
+import json
+import copy
+import time
+import threading
+from collections import OrderedDict
+from datetime import date
+from psycopg2.extras import execute_values
+from psycopg2.pool import ThreadedConnectionPool
+from src.migrations import appliquer_migrations
+from src.backends_bdd import dialecte, dialecte_url, get_base_sqlite, DIALECTE_SQLITE
+
+# Pool de connexions (réutilisées d'un appel à l'autre au lieu d'une connexion par requête)
+POOL_MIN_DEFAUT = 1
+POOL_MAX_DEFAUT = 10
+# Au-delà de cette inactivité (secondes), une connexion est vérifiée avant d'être prêtée
+# (Neon coupe les connexions des bases mises en veille)
+DELAI_VERIFICATION_DEFAUT = 30.0
+
+
+class PoolConnexions:
+    """
+    Pool de connexions PostgreSQL partagé par les threads du processus.
+
+    - `prendre()` bloque si toutes les connexions sont prêtées ;
+    - une connexion inactive depuis plus de `delai_verification` secondes est testée
+      (SELECT 1) et remplacée si le serveur l'a fermée ;
+    - `rendre()` annule toute transaction restée ouverte avant de remettre la connexion au pool.
+    """
+
+    def __init__(self, db_url: str, taille_min: int = POOL_MIN_DEFAUT, taille_max: int = POOL_MAX_DEFAUT,
+                 delai_verification: float = DELAI_VERIFICATION_DEFAUT):
+        self.taille_max = taille_max
+        self.delai_verification = delai_verification
+        self._pool = ThreadedConnectionPool(taille_min, taille_max, db_url)
+        self._places = threading.BoundedSemaphore(taille_max)
+        self._derniere_utilisation = {}  # id(connexion) -> instant du dernier retour au pool
+
+    def _est_valide(self, conn) -> bool:
+        if conn.closed:
+            return False
+        derniere = self._derniere_utilisation.get(id(conn))
+        if derniere is None or time.monotonic() - derniere < self.delai_verification:
+            return True
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except Exception:
+            return False
+
+    def prendre(self):
+        self._places.acquire()
+        try:
+            # Les connexions coupées par le serveur sont fermées et remplacées
+            for _ in range(self.taille_max):
+                conn = self._pool.getconn()
+                if self._est_valide(conn):
+                    return conn
+                print("🔄 Connexion BDD expirée, reconnexion...")
+                self._derniere_utilisation.pop(id(conn), None)
+                self._pool.putconn(conn, close=True)
+            return self._pool.getconn()
+        except Exception:
+            self._places.release()
+            raise
+
+    def rendre(self, conn):
+        try:
+            if conn.closed:
+                self._derniere_utilisation.pop(id(conn), None)
+                self._pool.putconn(conn, close=True)
+                return
+            conn.rollback()
+            self._derniere_utilisation[id(conn)] = time.monotonic()
+            self._pool.putconn(conn)
+        except Exception:
+            self._derniere_utilisation.pop(id(conn), None)
+            self._pool.putconn(conn, close=True)
+        finally:
+            self._places.release()
+
+
+_pools = {}                 # db_url -> PoolConnexions
+_connexions_pretees = {}    # id(connexion) -> PoolConnexions ou BaseSQLite
+_verrou_pools = threading.Lock()
+
+
+def get_pool(db_url: str) -> PoolConnexions:
+    """
+    Retourne le pool associé à cette URL (créé au premier appel).
+    Variables d'environnement : DB_POOL_MIN, DB_POOL_MAX, DB_POOL_VERIFICATION.
+    """
+    with _verrou_pools:
+        pool = _pools.get(db_url)
+        if pool is None:
+            pool = PoolConnexions(
+                db_url,
+                int(os.getenv("DB_POOL_MIN", POOL_MIN_DEFAUT)),
+                int(os.getenv("DB_POOL_MAX", POOL_MAX_DEFAUT)),
+                float(os.getenv("DB_POOL_VERIFICATION", DELAI_VERIFICATION_DEFAUT)),
+            )
+            _pools[db_url] = pool
+        return pool
+
 
 def get_db_connection(db_url=None):
     """
-    Etablit une connexion à la base de données PostgreSQL.
+    Emprunte une connexion à la base : pool PostgreSQL, ou base SQLite locale
+    pour une URL `sqlite:///chemin.db` (voir src/backends_bdd.py).
     Si db_url n'est pas fourni, cherche la variable d'environnement DATABASE_URL.
+    La connexion doit être rendue avec `rendre_connexion`.
     """
     if not db_url:
         db_url = os.getenv("DATABASE_URL")
     
     if not db_url:
         raise ValueError("Aucune URL de base de données trouvée (DATABASE_URL manquante).")
-        
-    return psycopg2.connect(db_url)
+
+    if dialecte_url(db_url) == DIALECTE_SQLITE:
+        source = get_base_sqlite(db_url)
+    else:
+        source = get_pool(db_url)
+    conn = source.prendre()
+    with _verrou_pools:
+        _connexions_pretees[id(conn)] = source
+    return conn
+
+
+def rendre_connexion(conn):
+    """
+    Rend une connexion obtenue par `get_db_connection` (à appeler à la place de `conn.close()`).
+    """
+    with _verrou_pools:
+        source = _connexions_pretees.pop(id(conn), None)
+    if source is None:
+        conn.close()
+    else:
+        source.rendre(conn)
+
+def normaliser_nom_fournisseur(nom_fournisseur: str) -> str:
+    """
+    Forme du nom utilisée pour les recherches : comparée à UPPER(fournisseur),
+    elle permet d'utiliser l'index idx_fournisseurs_nom_upper.
+    """
+    return nom_fournisseur.strip().upper()
+
+
+# Bases dont le schéma a déjà été vérifié par ce processus
+_bdd_initialisees = set()
+_verrou_initialisation = threading.Lock()
+
 
 def initialiser_bdd(db_url: str):
     """
-    Initialise la base de données en créant la table nécessaire si elle n'existe pas.
-    """
-    create_table_sql = """
-    CREATE TABLE IF NOT EXISTS fournisseurs_comptes_associes (
-        id SERIAL PRIMARY KEY,
-        fournisseur TEXT UNIQUE NOT NULL,
-        fournisseur_associe TEXT,
-        mode TEXT,
-        compte1 TEXT, regle1 TEXT,
-        compte2 TEXT, regle2 TEXT,
-        compte3 TEXT, regle3 TEXT,
-        compte4 TEXT, regle4 TEXT,
-        compte5 TEXT, regle5 TEXT,
-        compte6 TEXT, regle6 TEXT
-    );
+    Met le schéma de la base à jour (voir src/migrations.py).
+    Les migrations ne sont vérifiées qu'une fois par processus et par base.
     """
-    conn = None
-    try:
-        conn = get_db_connection(db_url)
-        cursor = conn.cursor()
-        cursor.execute(create_table_sql)
-        
-        # Création de la table des écritures comptables
-        create_ecritures_sql = """
-        CREATE TABLE IF NOT EXISTS ecritures_comptables (
-            id SERIAL PRIMARY KEY,
-            compte TEXT,
-            date_facture DATE,
-            fournisseur TEXT,
-            montant NUMERIC,
-            nom_fichier TEXT
-        );
-        """
-        cursor.execute(create_ecritures_sql)
-        
-        # Ajout de la colonne date_ajout si elle n'existe pas
+    with _verrou_initialisation:
+        if db_url in _bdd_initialisees:
+            return True
+
+        conn = None
         try:
-            cursor.execute("ALTER TABLE ecritures_comptables ADD COLUMN IF NOT EXISTS date_ajout TIMESTAMP DEFAULT CURRENT_TIMESTAMP")
+            conn = get_db_connection(db_url)
+            version = appliquer_migrations(conn)
+            _bdd_initialisees.add(db_url)
+            moteur = "SQLite" if dialecte(conn) == DIALECTE_SQLITE else "PostgreSQL"
+            print(f"✅ Base de données initialisée ({moteur}, schéma v{version})")
+            return True
         except Exception as e:
-            print(f"⚠️ Note: Erreur lors de l'ajout de date_ajout (peut-être déjà existante): {e}")
-            conn.rollback()
-        
-        conn.commit()
-        print(f"✅ Base de données initialisée (PostgreSQL)")
-        return True
-    except Exception as e:
-        print(f"❌ Erreur lors de l'initialisation de la BDD : {e}")
-        return False
-    finally:
-        if conn:
-            conn.close()
+            print(f"❌ Erreur lors de l'initialisation de la BDD : {e}")
+            return False
+        finally:
+            if conn:
+                rendre_connexion(conn)
 
 
 def bdd_est_disponible(db_url: str):
     """
-    Vérifie si la base de données PostgreSQL est accessible.
+    Vérifie si la base de données est accessible.
     """
     conn = None
     try:
@@ -87,205 +194,349 @@ def bdd_est_disponible(db_url: str):
         return False
     finally:
         if conn:
-            conn.close()
+            rendre_connexion(conn)
 
-def get_fournisseur_info(fournisseur_id, db_url: str):
+# Cache des profils fournisseurs (durée de vie en secondes, nombre d'entrées)
+PROFILS_TTL_DEFAUT = 300.0
+PROFILS_TAILLE_DEFAUT = 512
+
+_ABSENT = object() # Fournisseur inconnu (résultat mis en cache lui aussi)
+
+
+class CacheProfils:
     """
-    Vérifie si un fournisseur existe et retourne son mode de saisie.
+    Cache LRU à durée de vie limitée des profils fournisseurs.
+
+    Chaque modification d'un fournisseur vide le cache et incrémente `version` :
+    une lecture commencée avant la modification n'est pas mise en cache.
     """
-    if not fournisseur_id:
-        return None
-    
-    fournisseur_id_upper = fournisseur_id.upper().strip() 
-        
-    conn = None
-    try:
-        conn = get_db_connection(db_url)
-        cursor = conn.cursor()
-        
-        sql_query = """
-            SELECT mode 
-            FROM fournisseurs_comptes_associes 
-            WHERE UPPER(fournisseur) = %s 
-        """
-        cursor.execute(sql_query, (fournisseur_id_upper,))
-        result = cursor.fetchone()
-        
-        if result:
-            return result[0] # Retourne le mode ('A' ou 'M')
-        else:
-            return None # Fournisseur non trouvé
 
-    except Exception as e:
-        print(f"Erreur BDD : {e}")
-        return None
-    finally:
-        if conn:
-            conn.close()
+    def __init__(self, taille_max: int = PROFILS_TAILLE_DEFAUT, duree_vie: float = PROFILS_TTL_DEFAUT):
+        self.taille_max = taille_max
+        self.duree_vie = duree_vie
+        self.version = 0
+        self._entrees = OrderedDict()  # cle -> (instant d'expiration, profil)
+        self._verrou = threading.Lock()
 
-def get_fournisseur_details(nom_fournisseur: str, db_url: str):
+    def lire(self, cle):
+        """Retourne le profil en cache, _ABSENT pour un fournisseur inconnu, ou None si rien n'est en cache."""
+        with self._verrou:
+            entree = self._entrees.get(cle)
+            if entree is None:
+                return None
+            expiration, profil = entree
+            if time.monotonic() > expiration:
+                del self._entrees[cle]
+                return None
+            self._entrees.move_to_end(cle)
+            return profil
+
+    def ecrire(self, cle, profil, version: int):
+        with self._verrou:
+            if version != self.version:
+                return # Le fournisseur a pu changer pendant la lecture
+            self._entrees[cle] = (time.monotonic() + self.duree_vie, profil)
+            self._entrees.move_to_end(cle)
+            while len(self._entrees) > self.taille_max:
+                self._entrees.popitem(last=False)
+
+    def invalider(self):
+        with self._verrou:
+            self.version += 1
+            self._entrees.clear()
+
+
+_cache_profils = CacheProfils(
+    int(os.getenv("PROFILS_CACHE_TAILLE", PROFILS_TAILLE_DEFAUT)),
+    float(os.getenv("PROFILS_CACHE_TTL", PROFILS_TTL_DEFAUT)),
+)
+
+
+def invalider_profils_fournisseurs():
+    """Vide le cache des profils (à appeler après toute modification d'un fournisseur)."""
+    _cache_profils.invalider()
+
+
+def version_fournisseurs() -> int:
+    """Compteur incrémenté à chaque modification d'un fournisseur (pour les index en mémoire)."""
+    return _cache_profils.version
+
+
+# Colonnes d'un profil fournisseur : ses règles sont agrégées (dans l'ordre) en une seule colonne JSON
+COLONNES_PROFIL = """
+    f.id, f.fournisseur, f.fournisseur_associe, f.mode,
+    COALESCE((
+        SELECT json_agg(json_build_array(r.compte, r.regle) ORDER BY r.position)
+        FROM regles_imputation r
+        WHERE r.fournisseur_id = f.id
+    ), '[]'::json) AS associations
+"""
+
+# Équivalent SQLite (l'ordre des règles est donné par la sous-requête)
+COLONNES_PROFIL_SQLITE = """
+    f.id, f.fournisseur, f.fournisseur_associe, f.mode,
+    (
+        SELECT json_group_array(json_array(r.compte, r.regle))
+        FROM (SELECT compte, regle FROM regles_imputation WHERE fournisseur_id = f.id ORDER BY position) r
+    ) AS associations
+"""
+
+
+def colonnes_profil(conn) -> str:
+    """Colonnes d'un profil fournisseur dans le dialecte de cette connexion."""
+    return COLONNES_PROFIL_SQLITE if dialecte(conn) == DIALECTE_SQLITE else COLONNES_PROFIL
+
+
+def _lire_profil(cursor, row) -> dict:
+    """Convertit une ligne de COLONNES_PROFIL en dictionnaire (associations en liste de tuples)."""
+    colonnes = [desc[0] for desc in cursor.description]
+    profil = dict(zip(colonnes, row))
+    associations = profil["associations"]
+    if isinstance(associations, str):
+        associations = json.loads(associations) # SQLite renvoie le JSON en texte
+    profil["associations"] = [tuple(association) for association in associations]
+    return profil
+
+
+# Remplace toutes les règles d'un fournisseur en une seule instruction :
+# les positions conservées sont mises à jour, les nouvelles insérées, les autres supprimées.
+SQL_REMPLACER_REGLES = """
+WITH f AS (
+    SELECT id FROM fournisseurs_comptes_associes WHERE {condition}
+),
+nouvelles AS (
+    SELECT * FROM unnest(%s::int[], %s::text[], %s::text[]) AS n (position, compte, regle)
+),
+supprimees AS (
+    DELETE FROM regles_imputation r
+    USING f
+    WHERE r.fournisseur_id = f.id
+      AND r.position NOT IN (SELECT position FROM nouvelles)
+)
+INSERT INTO regles_imputation (fournisseur_id, position, compte, regle)
+SELECT f.id, n.position, n.compte, n.regle
+FROM f CROSS JOIN nouvelles n
+ON CONFLICT (fournisseur_id, position)
+DO UPDATE SET compte = EXCLUDED.compte, regle = EXCLUDED.regle
+"""
+
+# SQLite (ni tableaux ni DELETE dans un WITH) : règles en trop supprimées, puis écrites une à une
+SQL_REGLE_SQLITE = """
+INSERT INTO regles_imputation (fournisseur_id, position, compte, regle)
+VALUES (%s, %s, %s, %s)
+ON CONFLICT (fournisseur_id, position)
+DO UPDATE SET compte = excluded.compte, regle = excluded.regle
+"""
+
+
+def _remplacer_regles(cursor, condition: str, valeur, comptes_regles: list):
     """
-    Récupère toutes les infos d'un fournisseur par son nom.
+    Écrit la liste complète des règles (compte, regle) d'un fournisseur, sans limite de nombre.
+    `condition` identifie le fournisseur ("id = %s" ou "UPPER(fournisseur) = %s").
+    Les lignes sans compte sont ignorées.
+    """
+    regles = [(compte.strip(), regle or "") for compte, regle in comptes_regles if compte and compte.strip()]
+    positions = list(range(1, len(regles) + 1))
+    if dialecte(cursor) == DIALECTE_SQLITE:
+        cursor.execute(f"SELECT id FROM fournisseurs_comptes_associes WHERE {condition}", (valeur,))
+        row = cursor.fetchone()
+        if row is None:
+            return
+        cursor.execute("DELETE FROM regles_imputation WHERE fournisseur_id = %s AND position > %s", (row[0], len(regles)))
+        cursor.executemany(SQL_REGLE_SQLITE, [(row[0], position, *regle) for position, regle in zip(positions, regles)])
+        return
+    cursor.execute(
+        SQL_REMPLACER_REGLES.format(condition=condition),
+        (valeur, positions, [r[0] for r in regles], [r[1] for r in regles])
+    )
+
+
+def get_profil_fournisseur(nom_fournisseur: str, db_url: str):
+    """
+    Récupère en une seule requête tout le profil d'un fournisseur : id, mode, fournisseur associé
+    et la liste `associations` des couples (compte, règle), dans l'ordre.
+
+    Le résultat est mis en cache (PROFILS_CACHE_TTL secondes, PROFILS_CACHE_TAILLE entrées) :
+    un fournisseur récurrent dans une série ne coûte plus aucun aller-retour à la base.
+    Retourne None si le fournisseur est inconnu ou en cas d'erreur.
     """
     if not nom_fournisseur:
         return None
-        
+
+    cle = (db_url, normaliser_nom_fournisseur(nom_fournisseur))
+    profil = _cache_profils.lire(cle)
+    if profil is not None:
+        return None if profil is _ABSENT else copy.deepcopy(profil)
+
+    version = _cache_profils.version
     conn = None
     try:
         conn = get_db_connection(db_url)
         cursor = conn.cursor()
         
-        sql_query = """
-        SELECT id, fournisseur, fournisseur_associe, mode,
-               compte1, regle1, compte2, regle2, compte3, regle3,
-               compte4, regle4, compte5, regle5, compte6, regle6
-        FROM fournisseurs_comptes_associes
-        WHERE UPPER(fournisseur) = UPPER(%s)
+        sql_query = f"""
+        SELECT {colonnes_profil(conn)}
+        FROM fournisseurs_comptes_associes f
+        WHERE UPPER(f.fournisseur) = %s
         """
-        cursor.execute(sql_query, (nom_fournisseur,))
+        cursor.execute(sql_query, (cle[1],))
         row = cursor.fetchone()
         
-        if row:
-            colonnes = [desc[0] for desc in cursor.description]
-            return dict(zip(colonnes, row))
-        return None
+        if not row:
+            _cache_profils.ecrire(cle, _ABSENT, version)
+            return None
+
+        profil = _lire_profil(cursor, row)
+        _cache_profils.ecrire(cle, profil, version)
+        return copy.deepcopy(profil)
     except Exception as e:
-        print(f"Erreur BDD (get_details) : {e}")
+        print(f"Erreur BDD (profil fournisseur) : {e}")
         return None
     finally:
         if conn:
-            conn.close()
+            rendre_connexion(conn)
+
+def get_fournisseur_info(fournisseur_id, db_url: str):
+    """
+    Vérifie si un fournisseur existe et retourne son mode de saisie ('A' ou 'M').
+    """
+    profil = get_profil_fournisseur(fournisseur_id, db_url)
+    return profil["mode"] if profil else None
+
+def get_fournisseur_details(nom_fournisseur: str, db_url: str):
+    """
+    Récupère toutes les infos d'un fournisseur par son nom.
+    """
+    return get_profil_fournisseur(nom_fournisseur, db_url)
 
 def trouver_associations_fournisseur(nom_fournisseur: str, db_url: str):
     """
     Recherche les associations (compte, règle) pour un fournisseur donné.
     Retourne une liste de tuples [(compte, regle), ...].
     """
-    if not nom_fournisseur:
-        return []
+    profil = get_profil_fournisseur(nom_fournisseur, db_url)
+    return profil["associations"] if profil else []
 
+def ajouter_fournisseur_db(nom_fournisseur, fournisseur_associe, mode, comptes_regles, db_url):
+    """
+    Ajoute un nouveau fournisseur et ses règles dans la BDD (une seule transaction).
+    comptes_regles est une liste de tuples [(compte, regle), ...], sans limite de nombre.
+    """
     conn = None
     try:
         conn = get_db_connection(db_url)
         cursor = conn.cursor()
         
-        # Recherche insensible à la casse
-        sql_query = """
-        SELECT compte1, regle1, compte2, regle2, compte3, regle3, 
-               compte4, regle4, compte5, regle5, compte6, regle6
-        FROM fournisseurs_comptes_associes
-        WHERE UPPER(fournisseur) = UPPER(%s)
-        """
-        cursor.execute(sql_query, (nom_fournisseur,))
-        row = cursor.fetchone()
-        
-        associations = []
-        if row:
-            for i in range(0, len(row), 2):
-                compte = row[i]
-                regle = row[i+1]
-                if compte: # On ne garde que si un compte est défini
-                    associations.append((compte, regle))
-        
-        return associations
+        cursor.execute(
+            "INSERT INTO fournisseurs_comptes_associes (fournisseur, fournisseur_associe, mode) VALUES (%s, %s, %s) RETURNING id",
+            (nom_fournisseur, fournisseur_associe, mode)
+        )
+        fournisseur_id = cursor.fetchone()[0]
+        _remplacer_regles(cursor, "id = %s", fournisseur_id, comptes_regles)
+
+        conn.commit()
+        invalider_profils_fournisseurs()
+        return True
     except Exception as e:
-        print(f"Erreur BDD (recherche) : {e}")
-        return []
+        print(f"Erreur BDD (ajout) : {e}")
+        return False
     finally:
         if conn:
-            conn.close()
+            rendre_connexion(conn)
 
-def ajouter_fournisseur_db(nom_fournisseur, fournisseur_associe, mode, comptes_regles, db_url):
+def update_regles_fournisseur(nom_fournisseur: str, comptes_regles: list, db_url: str):
     """
-    Ajoute un nouveau fournisseur et ses règles dans la BDD.
-    comptes_regles est une liste de tuples [(compte, regle), ...]
+    Met à jour les règles (comptes) pour un fournisseur existant.
+    Écrase les anciennes règles (une seule instruction SQL).
     """
     conn = None
     try:
         conn = get_db_connection(db_url)
         cursor = conn.cursor()
         
-        # Préparation des colonnes dynamiques (jusqu'à 6 comptes)
-        colonnes = ["fournisseur", "fournisseur_associe", "mode"]
-        valeurs = [nom_fournisseur, fournisseur_associe, mode]
-        placeholders = ["%s", "%s", "%s"]
-        
-        for i, (compte, regle) in enumerate(comptes_regles):
-            if i >= 6: break # Limite de 6 comptes
-            colonnes.extend([f"compte{i+1}", f"regle{i+1}"])
-            valeurs.extend([compte, regle])
-            placeholders.extend(["%s", "%s"])
+        _remplacer_regles(cursor, "UPPER(fournisseur) = %s", normaliser_nom_fournisseur(nom_fournisseur), comptes_regles)
             
-        # Construction sécurisée de la requête
-        query = sql.SQL("INSERT INTO fournisseurs_comptes_associes ({}) VALUES ({})").format(
-            sql.SQL(', ').join(map(sql.Identifier, colonnes)),
-            sql.SQL(', ').join(map(sql.Literal, valeurs)) # Note: psycopg2 handles quoting, but placeholders are better for values. 
-        )
-        # Correction: Using standard placeholders for values is safer and cleaner with psycopg2
-        # Let's rewrite using standard string formatting for columns and %s for values
-        
-        col_names = ", ".join(colonnes)
-        val_placeholders = ", ".join(placeholders)
-        
-        sql_query = f"INSERT INTO fournisseurs_comptes_associes ({col_names}) VALUES ({val_placeholders})"
-        
-        cursor.execute(sql_query, valeurs)
         conn.commit()
+        invalider_profils_fournisseurs()
         return True
     except Exception as e:
-        print(f"Erreur BDD (ajout) : {e}")
+        print(f"Erreur BDD (update) : {e}")
         return False
     finally:
         if conn:
-            conn.close()
+            rendre_connexion(conn)
 
-def update_regles_fournisseur(nom_fournisseur: str, comptes_regles: list, db_url: str):
+def importer_fournisseurs_db(fournisseurs: list, db_url: str):
     """
-    Met à jour les règles (comptes) pour un fournisseur existant.
-    Écrase les anciennes règles.
+    Crée ou met à jour un ensemble de fournisseurs et remplace leurs règles, en une seule transaction
+    (une requête pour les fournisseurs, une pour supprimer leurs anciennes règles, une pour les nouvelles).
+
+    Un fournisseur déjà en base sous une autre casse garde son nom existant.
+
+    :param fournisseurs: Liste de dictionnaires {fournisseur, fournisseur_associe, mode, associations},
+                         un seul par fournisseur.
+    :return: Nombre de fournisseurs écrits, ou None en cas d'erreur (rien n'est modifié).
     """
+    if not fournisseurs:
+        return 0
+
     conn = None
     try:
         conn = get_db_connection(db_url)
         cursor = conn.cursor()
-        
-        # On remet à NULL tous les comptes/règles d'abord
-        reset_sql = """
-        UPDATE fournisseurs_comptes_associes
-        SET compte1=NULL, regle1=NULL, compte2=NULL, regle2=NULL,
-            compte3=NULL, regle3=NULL, compte4=NULL, regle4=NULL,
-            compte5=NULL, regle5=NULL, compte6=NULL, regle6=NULL
-        WHERE UPPER(fournisseur) = UPPER(%s)
+
+        cursor.execute("SELECT fournisseur FROM fournisseurs_comptes_associes")
+        noms_existants = {normaliser_nom_fournisseur(row[0]): row[0] for row in cursor.fetchall()}
+        valeurs = [
+            (noms_existants.get(normaliser_nom_fournisseur(f["fournisseur"]), f["fournisseur"].strip()),
+             f.get("fournisseur_associe") or None, f.get("mode"))
+            for f in fournisseurs
+        ]
+
+        sql_fournisseurs = """
+        INSERT INTO fournisseurs_comptes_associes (fournisseur, fournisseur_associe, mode)
+        VALUES %s
+        ON CONFLICT (fournisseur) DO UPDATE
+        SET fournisseur_associe = EXCLUDED.fournisseur_associe, mode = EXCLUDED.mode
+        RETURNING fournisseur, id
         """
-        cursor.execute(reset_sql, (nom_fournisseur,))
-        
-        # Construction de la requête de mise à jour dynamique
-        set_clauses = []
-        valeurs = []
-        
-        for i, (compte, regle) in enumerate(comptes_regles):
-            if i >= 6: break
-            set_clauses.append(f"compte{i+1} = %s")
-            set_clauses.append(f"regle{i+1} = %s")
-            valeurs.extend([compte, regle])
-            
-        if set_clauses:
-            update_sql = f"""
-            UPDATE fournisseurs_comptes_associes
-            SET {', '.join(set_clauses)}
-            WHERE UPPER(fournisseur) = UPPER(%s)
-            """
-            valeurs.append(nom_fournisseur)
-            cursor.execute(update_sql, valeurs)
-            
+        if dialecte(conn) == DIALECTE_SQLITE:
+            lignes = [cursor.execute(sql_fournisseurs % "(%s, %s, %s)", valeur).fetchone() for valeur in valeurs]
+        else:
+            lignes = execute_values(cursor, sql_fournisseurs, valeurs, page_size=1000, fetch=True)
+        ids_par_nom = dict(lignes)
+        ids = [ids_par_nom[valeur[0]] for valeur in valeurs]
+
+        regles = [
+            (fournisseur_id, position, compte.strip(), regle or "")
+            for fournisseur_id, f in zip(ids, fournisseurs)
+            for position, (compte, regle) in enumerate(
+                [(c, r) for c, r in f.get("associations", []) if c and c.strip()], start=1
+            )
+        ]
+        if dialecte(conn) == DIALECTE_SQLITE:
+            cursor.executemany("DELETE FROM regles_imputation WHERE fournisseur_id = %s", [(i,) for i in ids])
+            cursor.executemany(
+                "INSERT INTO regles_imputation (fournisseur_id, position, compte, regle) VALUES (%s, %s, %s, %s)", regles
+            )
+        else:
+            cursor.execute("DELETE FROM regles_imputation WHERE fournisseur_id = ANY(%s)", (ids,))
+            execute_values(
+                cursor, "INSERT INTO regles_imputation (fournisseur_id, position, compte, regle) VALUES %s",
+                regles, page_size=1000
+            )
+
         conn.commit()
-        return True
+        invalider_profils_fournisseurs()
+        return len(ids)
     except Exception as e:
-        print(f"Erreur BDD (update) : {e}")
-        return False
+        if conn:
+            conn.rollback()
+        print(f"Erreur BDD (import fournisseurs) : {e}")
+        return None
     finally:
         if conn:
-            conn.close()
+            rendre_connexion(conn)
 
 def get_tous_les_fournisseurs(db_url: str):
     """
@@ -297,22 +548,16 @@ def get_tous_les_fournisseurs(db_url: str):
         conn = get_db_connection(db_url)
         cursor = conn.cursor()
         
-        sql_query = """
-        SELECT id, fournisseur, fournisseur_associe, mode,
-               compte1, regle1, compte2, regle2, compte3, regle3,
-               compte4, regle4, compte5, regle5, compte6, regle6
-        FROM fournisseurs_comptes_associes
-        ORDER BY fournisseur ASC
+        sql_query = f"""
+        SELECT {colonnes_profil(conn)}
+        FROM fournisseurs_comptes_associes f
+        ORDER BY f.fournisseur ASC
         """
         cursor.execute(sql_query)
         rows = cursor.fetchall()
         
         # On peut retourner une liste de dictionnaires pour plus de facilité
-        fournisseurs = []
-        colonnes = [desc[0] for desc in cursor.description]
-        
-        for row in rows:
-            fournisseurs.append(dict(zip(colonnes, row)))
+        fournisseurs = [_lire_profil(cursor, row) for row in rows]
             
         return fournisseurs
     except Exception as e:
@@ -320,46 +565,104 @@ def get_tous_les_fournisseurs(db_url: str):
         return []
     finally:
         if conn:
-            conn.close()
+            rendre_connexion(conn)
+
+# Score minimal de similarité (0 à 1) pour proposer un fournisseur
+SEUIL_SIMILARITE_DEFAUT = 0.3
+
+
+def rechercher_fournisseurs(terme: str, db_url: str, limite: int = 10, seuil: float = SEUIL_SIMILARITE_DEFAUT):
+    """
+    Recherche approchée d'un fournisseur par son nom ou son fournisseur associé
+    (similarité par trigrammes, tolérante aux fautes et à l'ordre des mots).
+
+    :return: Liste des profils trouvés (comme get_profil_fournisseur) avec leur `score`,
+             du plus proche au plus lointain.
+    """
+    if not terme or not terme.strip():
+        return []
+
+    terme = terme.strip().lower()
+    conn = None
+    try:
+        conn = get_db_connection(db_url)
+        cursor = conn.cursor()
+
+        if dialecte(conn) == DIALECTE_SQLITE:
+            # Base locale : similarity() est fournie par la connexion, le score est calculé pour chaque fournisseur
+            sql_query = rf"""
+            SELECT {colonnes_profil(conn)},
+                   MAX(similarity(lower(f.fournisseur), %s),
+                       similarity(lower(COALESCE(f.fournisseur_associe, '')), %s)) AS score
+            FROM fournisseurs_comptes_associes f
+            WHERE score >= %s OR lower(f.fournisseur) LIKE %s ESCAPE '\'
+            ORDER BY score DESC, f.fournisseur ASC
+            LIMIT %s
+            """
+            cursor.execute(sql_query, (terme, terme, seuil, motif_contient(terme), limite))
+            return [_lire_profil(cursor, row) for row in cursor.fetchall()]
+
+        # Seuil de l'opérateur %% (utilisé par les index GIN), pour cette transaction seulement
+        cursor.execute("SELECT set_config('pg_trgm.similarity_threshold', %s, true)", (str(seuil),))
+
+        sql_query = f"""
+        SELECT {colonnes_profil(conn)},
+               GREATEST(similarity(lower(f.fournisseur), %s),
+                        similarity(lower(COALESCE(f.fournisseur_associe, '')), %s)) AS score
+        FROM fournisseurs_comptes_associes f
+        WHERE lower(f.fournisseur) %% %s
+           OR lower(COALESCE(f.fournisseur_associe, '')) %% %s
+           OR lower(f.fournisseur) LIKE %s
+        ORDER BY score DESC, f.fournisseur ASC
+        LIMIT %s
+        """
+        cursor.execute(sql_query, (terme, terme, terme, terme, motif_contient(terme), limite))
+        return [_lire_profil(cursor, row) for row in cursor.fetchall()]
+    except Exception as e:
+        print(f"Erreur BDD (recherche fournisseurs) : {e}")
+        return []
+    finally:
+        if conn:
+            rendre_connexion(conn)
 
 def update_fournisseur_full(old_nom_fournisseur: str, new_data: dict, db_url: str):
     """
-    Met à jour toutes les informations d'un fournisseur.
+    Met à jour toutes les informations d'un fournisseur (une seule transaction).
     Gère aussi le changement de nom (clé unique).
+
+    :param new_data: Dictionnaire {fournisseur, fournisseur_associe, mode, associations},
+                     `associations` étant la liste complète des couples (compte, regle).
     """
     conn = None
     try:
         conn = get_db_connection(db_url)
         cursor = conn.cursor()
         
-        # Liste des champs à mettre à jour
-        fields = [
-            "fournisseur", "fournisseur_associe", "mode",
-            "compte1", "regle1", "compte2", "regle2", "compte3", "regle3",
-            "compte4", "regle4", "compte5", "regle5", "compte6", "regle6"
-        ]
-        
-        set_clauses = [f"{field} = %s" for field in fields]
-        values = [new_data.get(field) for field in fields]
-        
-        # Ajout de l'ancien nom pour le WHERE
-        values.append(old_nom_fournisseur)
-        
-        sql_query = f"""
+        sql_query = """
         UPDATE fournisseurs_comptes_associes
-        SET {', '.join(set_clauses)}
+        SET fournisseur = %s, fournisseur_associe = %s, mode = %s
         WHERE fournisseur = %s
+        RETURNING id
         """
-        
-        cursor.execute(sql_query, values)
+        cursor.execute(sql_query, (
+            new_data.get("fournisseur"), new_data.get("fournisseur_associe"), new_data.get("mode"),
+            old_nom_fournisseur
+        ))
+        row = cursor.fetchone()
+        if row is None:
+            print(f"Erreur BDD (update full) : fournisseur {old_nom_fournisseur} introuvable")
+            return False
+
+        _remplacer_regles(cursor, "id = %s", row[0], new_data.get("associations", []))
         conn.commit()
+        invalider_profils_fournisseurs()
         return True
     except Exception as e:
         print(f"Erreur BDD (update full) : {e}")
         return False
     finally:
         if conn:
-            conn.close()
+            rendre_connexion(conn)
 
 def ajouter_ecriture_comptable(compte, date_facture, fournisseur, montant, nom_fichier, db_url):
     """
@@ -373,7 +676,7 @@ def ajouter_ecriture_comptable(compte, date_facture, fournisseur, montant, nom_f
         # On force l'insertion de la date d'ajout
         sql_query = """
         INSERT INTO ecritures_comptables (compte, date_facture, fournisseur, montant, nom_fichier, date_ajout)
-        VALUES (%s, %s, %s, %s, %s, NOW())
+        VALUES (%s, %s, %s, %s, %s, CURRENT_TIMESTAMP)
         """
         
         cursor.execute(sql_query, (compte, date_facture, fournisseur, montant, nom_fichier))
@@ -384,7 +687,74 @@ def ajouter_ecriture_comptable(compte, date_facture, fournisseur, montant, nom_f
         return False
     finally:
         if conn:
-            conn.close()
+            rendre_connexion(conn)
+
+SQL_EMPREINTE_FACTURE = """
+INSERT INTO empreintes_factures
+    (empreinte_pdf, cle_facture, fournisseur, numero_facture, date_facture, montant_total, nom_fichier, nb_factures_fichier)
+VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+ON CONFLICT DO NOTHING
+"""
+
+
+def ajouter_ecritures_comptables(ecritures: list, db_url: str, empreintes: list = None):
+    """
+    Ajoute plusieurs écritures comptables (une facture ou un lot) en une seule requête
+    et une seule transaction : soit toutes sont enregistrées, soit aucune.
+
+    Une écriture dont la `cle_idempotence` (facultative) est déjà en base n'est pas ajoutée
+    une seconde fois : un envoi répété après une erreur réseau ne crée pas de doublon.
+
+    :param ecritures: Liste de dictionnaires {compte, date_facture, fournisseur, montant, nom_fichier[, cle_idempotence]}.
+    :param empreintes: Empreintes des factures correspondantes (table empreintes_factures), enregistrées
+                       dans la même transaction : dictionnaires {empreinte_pdf, cle_facture, fournisseur,
+                       numero_facture, date_facture, montant_total, nom_fichier, nb_factures_fichier}. Une facture dont la clé
+                       est déjà connue n'est pas enregistrée une seconde fois.
+    :return: Liste des identifiants créés (écritures déjà présentes exclues), ou None en cas d'erreur.
+    """
+    if not ecritures and not empreintes:
+        return []
+
+    conn = None
+    try:
+        conn = get_db_connection(db_url)
+        cursor = conn.cursor()
+
+        sql_query = """
+        INSERT INTO ecritures_comptables (compte, date_facture, fournisseur, montant, nom_fichier, cle_idempotence, date_ajout)
+        VALUES %s
+        ON CONFLICT (cle_idempotence) DO NOTHING
+        RETURNING id
+        """
+        valeurs = [
+            (e["compte"], e["date_facture"], e["fournisseur"], e["montant"], e["nom_fichier"], e.get("cle_idempotence"))
+            for e in ecritures
+        ]
+        modele = "(%s, %s, %s, %s, %s, %s, CURRENT_TIMESTAMP)"
+        if not valeurs:
+            lignes = []
+        elif dialecte(conn) == DIALECTE_SQLITE:
+            # Base locale : une instruction par écriture, dans la même transaction
+            lignes = [cursor.execute(sql_query % modele, valeur).fetchone() for valeur in valeurs]
+        else:
+            lignes = execute_values(cursor, sql_query, valeurs, template=modele, fetch=True)
+
+        if empreintes:
+            cursor.executemany(SQL_EMPREINTE_FACTURE, [
+                (e["empreinte_pdf"], e.get("cle_facture"), e.get("fournisseur"), e.get("numero_facture"),
+                 e.get("date_facture"), e.get("montant_total"), e.get("nom_fichier"), e.get("nb_factures_fichier", 1))
+                for e in empreintes
+            ])
+        conn.commit()
+        return [ligne[0] for ligne in lignes if ligne]
+    except Exception as e:
+        if conn:
+            conn.rollback()
+        print(f"Erreur BDD (ajout des écritures) : {e}")
+        return None
+    finally:
+        if conn:
+            rendre_connexion(conn)
 
 def get_toutes_ecritures(db_url):
     """
@@ -416,7 +786,172 @@ def get_toutes_ecritures(db_url):
         return []
     finally:
         if conn:
-            conn.close()
+            rendre_connexion(conn)
+
+def echapper_like(texte: str) -> str:
+    """Échappe les caractères spéciaux de LIKE (à utiliser avec ESCAPE '\\')."""
+    return texte.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def motif_contient(texte: str) -> str:
+    """Motif LIKE "contient ce texte" (en minuscules, caractères spéciaux échappés)."""
+    return f"%{echapper_like(texte.lower())}%"
+
+
+def motif_commence(texte: str) -> str:
+    """Motif LIKE "commence par ce texte" (caractères spéciaux échappés)."""
+    return f"{echapper_like(texte)}%"
+
+
+# Options de tri du journal : clé -> (expression SQL indexée, sens)
+# L'id départage les égalités, dans le même sens, pour la pagination par curseur.
+TRIS_ECRITURES = {
+    "date_desc": ("COALESCE(date_facture, DATE '0001-01-01')", "DESC"),
+    "date_asc": ("COALESCE(date_facture, DATE '0001-01-01')", "ASC"),
+    "montant_desc": ("COALESCE(montant, 0)", "DESC"),
+    "montant_asc": ("COALESCE(montant, 0)", "ASC"),
+    "fournisseur_asc": ("LOWER(COALESCE(fournisseur, ''))", "ASC"),
+    "compte_asc": ("normaliser_compte(compte)", "ASC"),
+    "compte_desc": ("normaliser_compte(compte)", "DESC"),
+}
+# SQLite : les dates sont stockées en texte AAAA-MM-JJ
+TRIS_ECRITURES_SQLITE = dict(
+    TRIS_ECRITURES,
+    date_desc=("COALESCE(date_facture, '0001-01-01')", "DESC"),
+    date_asc=("COALESCE(date_facture, '0001-01-01')", "ASC"),
+)
+# Tri par pertinence de la recherche (score de 1 pour le texte exact, sinon similarité par mots),
+# arrondi pour que le curseur de pagination retrouve exactement la même valeur.
+# Sans texte recherché, il se replie sur TRI_PERTINENCE_REPLI.
+TRI_PERTINENCE = "pertinence"
+TRI_PERTINENCE_REPLI = "date_desc"
+TEXTE_RECHERCHE_ECRITURE = "texte_recherche_ecriture(fournisseur, compte, nom_fichier, date_facture)"
+SCORE_ECRITURE = f"round((CASE WHEN {TEXTE_RECHERCHE_ECRITURE} LIKE %s THEN 1 ELSE word_similarity(%s, {TEXTE_RECHERCHE_ECRITURE}) END)::numeric, 4)"
+SCORE_ECRITURE_SQLITE = rf"round(CASE WHEN {TEXTE_RECHERCHE_ECRITURE} LIKE %s ESCAPE '\' THEN 1 ELSE word_similarity(%s, {TEXTE_RECHERCHE_ECRITURE}) END, 4)"
+TAILLE_PAGE_DEFAUT = 50
+
+
+def requete_recherche_ecritures(recherche: str = None, date_min=None, date_max=None,
+                                montant_min=None, montant_max=None, tri: str = "date_desc",
+                                apres: tuple = None, limite: int = TAILLE_PAGE_DEFAUT,
+                                dialecte_sql: str = None):
+    """
+    Construit la requête (SQL, paramètres) de `rechercher_ecritures`.
+    Lève ValueError si l'option de tri est inconnue.
+    """
+    tris = TRIS_ECRITURES_SQLITE if dialecte_sql == DIALECTE_SQLITE else TRIS_ECRITURES
+    terme = (recherche or "").strip().lower()
+    if tri == TRI_PERTINENCE and not terme:
+        tri = TRI_PERTINENCE_REPLI
+    if tri != TRI_PERTINENCE and tri not in tris:
+        raise ValueError(f"Tri inconnu : {tri}")
+
+    if tri == TRI_PERTINENCE:
+        expression = SCORE_ECRITURE_SQLITE if dialecte_sql == DIALECTE_SQLITE else SCORE_ECRITURE
+        sens = "DESC"
+        parametres_tri = [motif_contient(terme), terme]
+    else:
+        expression, sens = tris[tri]
+        parametres_tri = []
+
+    conditions = []
+    parametres = []
+
+    if terme and dialecte_sql == DIALECTE_SQLITE:
+        # Index plein texte par trigrammes (ecritures_recherche), utilisé seulement par un LIKE
+        # sans ESCAPE : la clause n'est ajoutée que si le motif contient un caractère échappé.
+        # Les fautes de frappe sont rattrapées par word_similarity(), calculée sur chaque écriture.
+        motif = motif_contient(terme)
+        echappement = r" ESCAPE '\'" if "\\" in motif else ""
+        conditions.append(
+            f"(id IN (SELECT rowid FROM ecritures_recherche WHERE texte LIKE %s{echappement})"
+            f" OR word_similarity(%s, {TEXTE_RECHERCHE_ECRITURE}) >= %s)"
+        )
+        parametres.extend([motif, terme, SEUIL_SIMILARITE_DEFAUT])
+    elif terme:
+        # Fournisseur, compte, fichier ou date JJ/MM/AAAA : une seule expression, indexée par
+        # trigrammes (idx_ecritures_recherche_trgm) pour le LIKE comme pour l'opérateur <%
+        # (similarité par mots, seuil pg_trgm.word_similarity_threshold : voir rechercher_ecritures)
+        conditions.append(f"({TEXTE_RECHERCHE_ECRITURE} LIKE %s OR %s <%% {TEXTE_RECHERCHE_ECRITURE})")
+        parametres.extend([motif_contient(terme), terme])
+    if date_min:
+        conditions.append("date_facture >= %s")
+        parametres.append(date_min)
+    if date_max:
+        conditions.append("date_facture <= %s")
+        parametres.append(date_max)
+    if montant_min is not None:
+        conditions.append("montant >= %s")
+        parametres.append(montant_min)
+    if montant_max is not None:
+        conditions.append("montant <= %s")
+        parametres.append(montant_max)
+
+    # Pagination par curseur : on reprend après la dernière ligne affichée (valeur de tri, id)
+    if apres:
+        comparaison = "<" if sens == "DESC" else ">"
+        conditions.append(f"({expression}, id) {comparaison} (%s, %s)")
+        parametres.extend(parametres_tri)
+        parametres.extend(apres)
+
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    sql_query = f"""
+    SELECT id, date_facture, fournisseur, compte, montant, nom_fichier, date_ajout,
+           {expression} AS cle_tri
+    FROM ecritures_comptables
+    {where}
+    ORDER BY {expression} {sens}, id {sens}
+    LIMIT %s
+    """
+    # Paramètres dans l'ordre du texte : SELECT, WHERE, ORDER BY, LIMIT
+    parametres = parametres_tri + parametres + parametres_tri
+    parametres.append(limite + 1) # Une ligne de plus pour savoir s'il reste une page
+    return sql_query, parametres
+
+
+def rechercher_ecritures(db_url: str, recherche: str = None, date_min=None, date_max=None,
+                         montant_min=None, montant_max=None, tri: str = "date_desc",
+                         apres: tuple = None, limite: int = TAILLE_PAGE_DEFAUT):
+    """
+    Recherche, filtre, trie et pagine les écritures comptables directement en SQL.
+
+    :param recherche: Texte cherché dans le fournisseur, le compte, le fichier ou la date (JJ/MM/AAAA),
+                      tolérant aux fautes de frappe (similarité par trigrammes).
+    :param tri: Une des clés de TRIS_ECRITURES, ou TRI_PERTINENCE (les plus proches du texte recherché d'abord).
+    :param apres: Curseur renvoyé par l'appel précédent pour obtenir la page suivante.
+    :return: Tuple (liste d'écritures, curseur de la page suivante ou None s'il n'y en a pas).
+    """
+    conn = None
+    try:
+        sql_query, parametres = requete_recherche_ecritures(
+            recherche, date_min, date_max, montant_min, montant_max, tri, apres, limite,
+            dialecte_url(db_url)
+        )
+        conn = get_db_connection(db_url)
+        cursor = conn.cursor()
+        if recherche and dialecte(conn) != DIALECTE_SQLITE:
+            # Seuil de l'opérateur <% (utilisé par l'index GIN), pour cette transaction seulement
+            cursor.execute("SELECT set_config('pg_trgm.word_similarity_threshold', %s, true)", (str(SEUIL_SIMILARITE_DEFAUT),))
+        cursor.execute(sql_query, parametres)
+        rows = cursor.fetchall()
+
+        colonnes = [desc[0] for desc in cursor.description]
+        ecritures = [dict(zip(colonnes, row)) for row in rows[:limite]]
+
+        curseur_suivant = None
+        if len(rows) > limite:
+            derniere = ecritures[-1]
+            curseur_suivant = (derniere["cle_tri"], derniere["id"])
+        for ecriture in ecritures:
+            del ecriture["cle_tri"]
+
+        return ecritures, curseur_suivant
+    except Exception as e:
+        print(f"Erreur BDD (recherche écritures) : {e}")
+        return [], None
+    finally:
+        if conn:
+            rendre_connexion(conn)
 
 def update_ecriture(id_ecriture, data, db_url):
     """
@@ -458,7 +993,7 @@ def update_ecriture(id_ecriture, data, db_url):
         return False
     finally:
         if conn:
-            conn.close()
+            rendre_connexion(conn)
 
 def delete_ecriture(id_ecriture, db_url):
     """
@@ -478,4 +1013,173 @@ def delete_ecriture(id_ecriture, db_url):
         return False
     finally:
         if conn:
-            conn.close()
+            rendre_connexion(conn)
+
+# Axes de la synthèse : clé -> colonne de synthese_ecritures
+AXES_SYNTHESE = {
+    "mois": "mois",
+    "compte": "compte",
+    "fournisseur": "fournisseur",
+}
+# Mois des écritures sans date dans synthese_ecritures
+MOIS_SANS_DATE = date(1, 1, 1)
+
+
+def get_synthese_ecritures(db_url: str, axe: str = "mois", date_min=None, date_max=None):
+    """
+    Totaux des écritures par mois, par compte ou par fournisseur, lus dans la table
+    synthese_ecritures (tenue à jour par des déclencheurs) au lieu de parcourir le journal.
+
+    Les bornes de dates sont appliquées au mois près ; une écriture sans date n'est
+    comptée que si aucune borne n'est donnée.
+
+    :param axe: Une des clés de AXES_SYNTHESE.
+    :return: Liste de dictionnaires {cle, nb_ecritures, total} (cle à None pour une valeur absente),
+             par mois croissant, sinon par total décroissant.
+    """
+    if axe not in AXES_SYNTHESE:
+        print(f"Erreur BDD (synthèse) : axe inconnu {axe}")
+        return []
+    colonne = AXES_SYNTHESE[axe]
+
+    conditions = []
+    parametres = []
+    if date_min:
+        conditions.append("mois >= %s")
+        parametres.append(date_min.replace(day=1))
+    if date_max:
+        conditions.append("mois <= %s")
+        parametres.append(date_max)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    ordre = "cle ASC" if axe == "mois" else "total DESC, cle ASC"
+
+    conn = None
+    try:
+        conn = get_db_connection(db_url)
+        cursor = conn.cursor()
+
+        sql_query = f"""
+        SELECT {colonne} AS cle, SUM(nb_ecritures) AS nb_ecritures, SUM(total) AS total
+        FROM synthese_ecritures
+        {where}
+        GROUP BY {colonne}
+        ORDER BY {ordre}
+        """
+        cursor.execute(sql_query, parametres)
+        synthese = []
+        for cle, nb_ecritures, total in cursor.fetchall():
+            if axe == "mois" and isinstance(cle, str):
+                cle = date.fromisoformat(cle) # SQLite : pas de type pour une colonne calculée
+            if cle in ("", MOIS_SANS_DATE):
+                cle = None
+            synthese.append({"cle": cle, "nb_ecritures": nb_ecritures, "total": total})
+        return synthese
+    except Exception as e:
+        print(f"Erreur BDD (synthèse) : {e}")
+        return []
+    finally:
+        if conn:
+            rendre_connexion(conn)
+
+def trouver_factures_traitees(empreintes: list, cles_factures: list, db_url: str):
+    """
+    Factures déjà validées dont l'empreinte du fichier déposé ou la clé
+    (fournisseur, numéro, date, total) figure dans les listes données, en une requête.
+
+    :return: Liste de dictionnaires {empreinte_pdf, cle_facture, fournisseur, numero_facture,
+             date_facture, montant_total, nom_fichier, nb_factures_fichier, date_ajout}, [] en cas d'erreur.
+    """
+    empreintes = [e for e in empreintes if e]
+    cles_factures = [c for c in cles_factures if c]
+    if not empreintes and not cles_factures:
+        return []
+
+    conditions = []
+    parametres = []
+    # IN (%s, ...) plutôt que = ANY(%s) : même requête pour PostgreSQL et SQLite
+    if empreintes:
+        conditions.append(f"empreinte_pdf IN ({', '.join(['%s'] * len(empreintes))})")
+        parametres.extend(empreintes)
+    if cles_factures:
+        conditions.append(f"cle_facture IN ({', '.join(['%s'] * len(cles_factures))})")
+        parametres.extend(cles_factures)
+
+    conn = None
+    try:
+        conn = get_db_connection(db_url)
+        cursor = conn.cursor()
+
+        sql_query = f"""
+        SELECT empreinte_pdf, cle_facture, fournisseur, numero_facture, date_facture,
+               montant_total, nom_fichier, nb_factures_fichier, date_ajout
+        FROM empreintes_factures
+        WHERE {' OR '.join(conditions)}
+        ORDER BY date_ajout, id
+        """
+        cursor.execute(sql_query, parametres)
+        colonnes = [desc[0] for desc in cursor.description]
+        return [dict(zip(colonnes, row)) for row in cursor.fetchall()]
+    except Exception as e:
+        print(f"Erreur BDD (trouver_factures_traitees) : {e}")
+        return []
+    finally:
+        if conn:
+            rendre_connexion(conn)
+
+def get_modele_extraction(nom_fournisseur: str, db_url: str):
+    """
+    Récupère le modèle d'extraction appris pour un fournisseur.
+    Retourne un dictionnaire {modele, nb_confirmations} ou None.
+    """
+    if not nom_fournisseur:
+        return None
+
+    conn = None
+    try:
+        conn = get_db_connection(db_url)
+        cursor = conn.cursor()
+        
+        sql_query = """
+        SELECT modele, nb_confirmations
+        FROM modeles_extraction
+        WHERE fournisseur = %s
+        """
+        cursor.execute(sql_query, (normaliser_nom_fournisseur(nom_fournisseur),))
+        row = cursor.fetchone()
+        
+        if row:
+            return {"modele": json.loads(row[0]), "nb_confirmations": row[1]}
+        return None
+    except Exception as e:
+        print(f"Erreur BDD (get_modele) : {e}")
+        return None
+    finally:
+        if conn:
+            rendre_connexion(conn)
+
+def enregistrer_modele_extraction(nom_fournisseur: str, modele: dict, nb_confirmations: int, db_url: str):
+    """
+    Crée ou remplace le modèle d'extraction d'un fournisseur.
+    """
+    conn = None
+    try:
+        conn = get_db_connection(db_url)
+        cursor = conn.cursor()
+        
+        sql_query = """
+        INSERT INTO modeles_extraction (fournisseur, modele, nb_confirmations, date_maj)
+        VALUES (%s, %s, %s, CURRENT_TIMESTAMP)
+        ON CONFLICT (fournisseur) DO UPDATE
+        SET modele = EXCLUDED.modele,
+            nb_confirmations = EXCLUDED.nb_confirmations,
+            date_maj = EXCLUDED.date_maj
+        """
+        cursor.execute(sql_query, (normaliser_nom_fournisseur(nom_fournisseur), json.dumps(modele), nb_confirmations))
+        conn.commit()
+        return True
+    except Exception as e:
+        print(f"Erreur BDD (enregistrer_modele) : {e}")
+        return False
+    finally:
+        if conn:
+            rendre_connexion(conn)
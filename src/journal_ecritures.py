@@ -0,0 +1,384 @@
+import os
+import json
+import time
+import uuid
+import shutil
+import sqlite3
+import threading
+from datetime import date, datetime
+from decimal import Decimal
+from src.gestion_bdd import ajouter_ecritures_comptables, bdd_est_disponible
+from src.modeles_fournisseurs import enregistrer_validation
+
+
+# Constantes
+CHEMIN_JOURNAL_DEFAUT = os.path.join("data", "journal", "journal_ecritures.sqlite3")
+INTERVALLE_DEFAUT = 2.0        # secondes entre deux envois vers la base
+DELAI_MAX_DEFAUT = 300.0       # attente maximale entre deux essais quand la base est injoignable
+TAILLE_LOT_DEFAUT = 50         # factures envoyées par transaction
+TENTATIVES_MAX_DEFAUT = 5      # refus par une base joignable avant de mettre la facture de côté
+
+ERREUR_INJOIGNABLE = "Base de données injoignable"
+ERREUR_REFUS = "Refusée par la base de données (détail dans la console du serveur)"
+
+
+def _serialiser(valeur):
+    if isinstance(valeur, (date, datetime)):
+        return valeur.isoformat()
+    if isinstance(valeur, Decimal):
+        return str(valeur) # Sans arrondi binaire
+    raise TypeError(f"Valeur non sérialisable : {valeur!r}")
+
+
+def _deserialiser(ecriture: dict) -> dict:
+    if ecriture.get("date_facture"):
+        ecriture["date_facture"] = date.fromisoformat(ecriture["date_facture"][:10])
+    if ecriture.get("montant") is not None:
+        ecriture["montant"] = Decimal(str(ecriture["montant"]))
+    return ecriture
+
+
+class JournalEcritures:
+    """
+    Journal local (SQLite, écrit sur disque avant de rendre la main) des écritures validées.
+
+    - `ajouter()` enregistre les écritures d'une facture en quelques millisecondes ;
+    - un thread en arrière-plan les envoie à la base par lots, et ne les retire du journal
+      qu'une fois la transaction validée ;
+    - chaque écriture porte une clé d'idempotence : un lot renvoyé après une coupure
+      (transaction validée mais réponse perdue) ne crée pas de doublon ;
+    - tant que la base est injoignable, l'attente entre deux essais double (jusqu'à `delai_max`) ;
+    - une facture refusée `tentatives_max` fois par une base joignable est mise de côté
+      (`factures_rejetees()`) jusqu'à ce que l'utilisateur la relance ou l'abandonne ;
+    - le modèle d'extraction du fournisseur est mis à jour par le même thread, une fois
+      les écritures en base (le PDF est copié dans le journal en attendant).
+    """
+
+    def __init__(self, chemin: str = CHEMIN_JOURNAL_DEFAUT, intervalle: float = INTERVALLE_DEFAUT,
+                 delai_max: float = DELAI_MAX_DEFAUT, taille_lot: int = TAILLE_LOT_DEFAUT,
+                 tentatives_max: int = TENTATIVES_MAX_DEFAUT,
+                 enregistrer=ajouter_ecritures_comptables, disponible=bdd_est_disponible,
+                 apprendre=enregistrer_validation):
+        self.chemin = chemin
+        self.intervalle = intervalle
+        self.delai_max = delai_max
+        self.taille_lot = taille_lot
+        self.tentatives_max = tentatives_max
+        self._enregistrer = enregistrer
+        self._disponible = disponible
+        self._apprendre = apprendre
+        self.dossier_pdf = os.path.join(os.path.dirname(chemin), "pdf")
+        self._verrou = threading.Lock()
+        self._envoi = threading.Lock()
+        self._reveil = threading.Event()
+        self._thread = None
+        self._initialiser()
+
+    def _connexion(self):
+        conn = sqlite3.connect(self.chemin, timeout=5)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=FULL") # fsync à chaque validation
+        return conn
+
+    def _initialiser(self):
+        os.makedirs(self.dossier_pdf, exist_ok=True)
+        conn = self._connexion()
+        try:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS ecritures_en_attente (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    cle_idempotence TEXT UNIQUE NOT NULL,
+                    db_url TEXT NOT NULL,
+                    ecritures TEXT NOT NULL,
+                    date_creation REAL NOT NULL,
+                    tentatives INTEGER NOT NULL DEFAULT 0,
+                    derniere_erreur TEXT,
+                    complements TEXT
+                )
+            """)
+            # Journal créé par une version précédente
+            colonnes = {row[1] for row in conn.execute("PRAGMA table_info(ecritures_en_attente)")}
+            if "complements" not in colonnes:
+                conn.execute("ALTER TABLE ecritures_en_attente ADD COLUMN complements TEXT")
+            conn.commit()
+        finally:
+            conn.close()
+
+    def ajouter(self, ecritures: list, db_url: str, apprentissage: dict = None, empreinte: dict = None):
+        """
+        Inscrit au journal les écritures d'une facture (toutes envoyées ensemble à la base).
+        Retourne la clé d'idempotence de la facture, ou None si le journal est inaccessible.
+
+        :param apprentissage: Facultatif, {fournisseur, pdf, valeurs, regles} : modèle du fournisseur à mettre
+                              à jour (voir enregistrer_validation) une fois les écritures en base.
+        :param empreinte: Facultatif, empreintes de la facture (détection des doublons), enregistrées
+                          dans la même transaction que ses écritures.
+        """
+        cle = uuid.uuid4().hex
+        complements = {"empreinte": empreinte} if empreinte else {}
+        if apprentissage:
+            copie = os.path.join(self.dossier_pdf, f"{cle}.pdf")
+            try:
+                shutil.copyfile(apprentissage["pdf"], copie)
+                complements["apprentissage"] = {**apprentissage, "pdf": copie}
+            except OSError as e:
+                print(f"⚠️ Copie du PDF pour l'apprentissage impossible : {e}")
+
+        with self._verrou:
+            try:
+                conn = self._connexion()
+                try:
+                    conn.execute(
+                        """
+                        INSERT INTO ecritures_en_attente (cle_idempotence, db_url, ecritures, date_creation, complements)
+                        VALUES (?, ?, ?, ?, ?)
+                        """,
+                        (cle, db_url, json.dumps(ecritures, default=_serialiser, ensure_ascii=False), time.time(),
+                         json.dumps(complements, default=_serialiser, ensure_ascii=False))
+                    )
+                    conn.commit()
+                finally:
+                    conn.close()
+            except Exception as e:
+                print(f"❌ Journal des écritures inaccessible : {e}")
+                self._supprimer_copie(complements)
+                return None
+        self._reveil.set()
+        return cle
+
+    def etat(self) -> dict:
+        """
+        Factures du journal : en attente d'envoi (`en_attente`), dont celles dont un envoi
+        a déjà échoué (`en_echec`), et factures mises de côté après trop de refus (`rejetees`).
+        """
+        with self._verrou:
+            try:
+                conn = self._connexion()
+                try:
+                    en_attente, en_echec, rejetees = conn.execute(
+                        """
+                        SELECT COALESCE(SUM(tentatives < ?), 0),
+                               COALESCE(SUM(tentatives < ? AND derniere_erreur IS NOT NULL), 0),
+                               COALESCE(SUM(tentatives >= ?), 0)
+                        FROM ecritures_en_attente
+                        """,
+                        (self.tentatives_max,) * 3
+                    ).fetchone()
+                    return {"en_attente": en_attente, "en_echec": en_echec, "rejetees": rejetees}
+                finally:
+                    conn.close()
+            except Exception as e:
+                print(f"⚠️ Journal des écritures illisible : {e}")
+                return {"en_attente": 0, "en_echec": 0, "rejetees": 0}
+
+    def factures_rejetees(self) -> list:
+        """
+        Factures refusées `tentatives_max` fois par la base, qui ne sont plus renvoyées.
+        Retourne une liste de dictionnaires {id, fournisseur, date_facture, nom_fichier, montant, erreur}.
+        """
+        with self._verrou:
+            conn = self._connexion()
+            try:
+                rows = conn.execute(
+                    "SELECT id, ecritures, derniere_erreur FROM ecritures_en_attente WHERE tentatives >= ? ORDER BY id",
+                    (self.tentatives_max,)
+                ).fetchall()
+            finally:
+                conn.close()
+        factures = []
+        for id_entree, texte, erreur in rows:
+            ecritures = [_deserialiser(e) for e in json.loads(texte)]
+            premiere = ecritures[0] if ecritures else {}
+            factures.append({
+                "id": id_entree,
+                "fournisseur": premiere.get("fournisseur"),
+                "date_facture": premiere.get("date_facture"),
+                "nom_fichier": premiere.get("nom_fichier"),
+                "montant": sum((e["montant"] for e in ecritures if e.get("montant") is not None), Decimal(0)),
+                "erreur": erreur,
+            })
+        return factures
+
+    def relancer(self, id_entree: int):
+        """Remet une facture rejetée dans la file d'envoi (après correction de la base, par exemple)."""
+        with self._verrou:
+            conn = self._connexion()
+            try:
+                conn.execute("UPDATE ecritures_en_attente SET tentatives = 0 WHERE id = ?", (id_entree,))
+                conn.commit()
+            finally:
+                conn.close()
+        self._reveil.set()
+
+    def abandonner(self, id_entree: int):
+        """Retire définitivement une facture du journal (ses écritures ne seront pas enregistrées)."""
+        with self._verrou:
+            conn = self._connexion()
+            try:
+                row = conn.execute("SELECT complements FROM ecritures_en_attente WHERE id = ?", (id_entree,)).fetchone()
+            finally:
+                conn.close()
+        self._retirer([id_entree])
+        if row:
+            self._supprimer_copie(json.loads(row[0] or "{}"))
+
+    def _supprimer_copie(self, complements: dict):
+        apprentissage = complements.get("apprentissage")
+        if apprentissage and os.path.exists(apprentissage["pdf"]):
+            os.remove(apprentissage["pdf"])
+
+    def _lire_lot(self):
+        # Les factures déjà refusées passent après les autres ; les factures rejetées ne sont plus lues
+        with self._verrou:
+            conn = self._connexion()
+            try:
+                return conn.execute(
+                    """
+                    SELECT id, cle_idempotence, db_url, ecritures, complements FROM ecritures_en_attente
+                    WHERE tentatives < ?
+                    ORDER BY tentatives, id LIMIT ?
+                    """,
+                    (self.tentatives_max, self.taille_lot)
+                ).fetchall()
+            finally:
+                conn.close()
+
+    def _retirer(self, ids: list):
+        with self._verrou:
+            conn = self._connexion()
+            try:
+                conn.executemany("DELETE FROM ecritures_en_attente WHERE id = ?", [(i,) for i in ids])
+                conn.commit()
+            finally:
+                conn.close()
+
+    def _noter_echec(self, ids: list, erreur: str, refus: bool):
+        # Seuls les refus d'une base joignable comptent comme tentatives
+        with self._verrou:
+            conn = self._connexion()
+            try:
+                conn.executemany(
+                    "UPDATE ecritures_en_attente SET tentatives = tentatives + ?, derniere_erreur = ? WHERE id = ?",
+                    [(int(refus), erreur, i) for i in ids]
+                )
+                conn.commit()
+            finally:
+                conn.close()
+
+    def _envoyer(self, entrees: list, db_url: str) -> bool:
+        """Envoie les écritures (et les empreintes) de plusieurs factures en une transaction."""
+        lignes = []
+        empreintes = []
+        for _, cle, _, texte, complements in entrees:
+            for numero, ecriture in enumerate(json.loads(texte)):
+                ecriture = _deserialiser(ecriture)
+                ecriture["cle_idempotence"] = f"{cle}-{numero}"
+                lignes.append(ecriture)
+            empreinte = json.loads(complements or "{}").get("empreinte")
+            if empreinte:
+                empreintes.append(empreinte)
+        return self._enregistrer(lignes, db_url, empreintes=empreintes) is not None
+
+    def _terminer(self, entrees: list, db_url: str):
+        """Retire du journal des factures enregistrées en base, puis met à jour les modèles des fournisseurs."""
+        self._retirer([entree[0] for entree in entrees])
+        for entree in entrees:
+            complements = json.loads(entree[4] or "{}")
+            apprentissage = complements.get("apprentissage")
+            if not apprentissage:
+                continue
+            try:
+                self._apprendre(apprentissage["fournisseur"], apprentissage["pdf"],
+                                [tuple(valeur) for valeur in apprentissage["valeurs"]],
+                                [tuple(regle) for regle in apprentissage.get("regles", [])], db_url)
+            except Exception as e:
+                print(f"⚠️ Apprentissage du modèle impossible : {e}")
+            finally:
+                self._supprimer_copie(complements)
+
+    def vider(self) -> int:
+        """
+        Envoie à la base tout ce qui est en attente (lot par lot).
+        Retourne le nombre de factures restées dans le journal après un échec.
+
+        Si un lot échoue alors que la base répond, les factures sont renvoyées une par une :
+        seules celles refusées voient leur nombre de tentatives augmenter.
+        """
+        with self._envoi:
+            while True:
+                entrees = self._lire_lot()
+                if not entrees:
+                    return 0
+
+                par_base = {}
+                for entree in entrees:
+                    par_base.setdefault(entree[2], []).append(entree)
+
+                echecs = []
+                for db_url, groupe in par_base.items():
+                    if self._envoyer(groupe, db_url):
+                        self._terminer(groupe, db_url)
+                        continue
+                    if not self._disponible(db_url):
+                        self._noter_echec([entree[0] for entree in groupe], ERREUR_INJOIGNABLE, refus=False)
+                        echecs.extend(entree[0] for entree in groupe)
+                        continue
+                    # Base joignable mais lot refusé : facture par facture, pour isoler celles en erreur
+                    refusees = []
+                    for entree in groupe:
+                        if len(groupe) > 1 and self._envoyer([entree], db_url):
+                            self._terminer([entree], db_url)
+                        else:
+                            refusees.append(entree[0])
+                    if refusees:
+                        self._noter_echec(refusees, ERREUR_REFUS, refus=True)
+                        echecs.extend(refusees)
+
+                if echecs:
+                    return len(echecs)
+
+    def _boucle(self):
+        attente = self.intervalle
+        while True:
+            self._reveil.wait(attente)
+            self._reveil.clear()
+            try:
+                echecs = self.vider()
+            except Exception as e:
+                print(f"⚠️ Envoi du journal des écritures impossible : {e}")
+                echecs = 1
+            attente = min(attente * 2, self.delai_max) if echecs else self.intervalle
+
+    def demarrer(self):
+        """Lance l'envoi en arrière-plan (y compris des écritures restées d'une session précédente)."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._boucle, daemon=True)
+            self._thread.start()
+            self._reveil.set()
+
+
+_journal = None
+_verrou_journal = threading.Lock()
+
+
+def get_journal() -> JournalEcritures:
+    """
+    Retourne le journal des écritures du processus (créé et démarré au premier appel).
+    Variables d'environnement :
+    - JOURNAL_ECRITURES_CHEMIN : chemin du fichier SQLite.
+    - JOURNAL_ECRITURES_INTERVALLE : secondes entre deux envois.
+    - JOURNAL_ECRITURES_DELAI_MAX : attente maximale entre deux essais si la base est injoignable.
+    - JOURNAL_ECRITURES_TENTATIVES_MAX : refus par la base avant de mettre une facture de côté.
+    """
+    global _journal
+    with _verrou_journal:
+        if _journal is None:
+            journal = JournalEcritures(
+                chemin=os.getenv("JOURNAL_ECRITURES_CHEMIN", CHEMIN_JOURNAL_DEFAUT),
+                intervalle=float(os.getenv("JOURNAL_ECRITURES_INTERVALLE", INTERVALLE_DEFAUT)),
+                delai_max=float(os.getenv("JOURNAL_ECRITURES_DELAI_MAX", DELAI_MAX_DEFAUT)),
+                tentatives_max=int(os.getenv("JOURNAL_ECRITURES_TENTATIVES_MAX", TENTATIVES_MAX_DEFAUT)),
+            )
+            journal.demarrer()
+            _journal = journal
+        return _journal
@@ -0,0 +1,502 @@
+"""
+Migrations du schéma de la base (PostgreSQL ou SQLite).
+
+Chaque migration a un numéro de version ; les versions déjà appliquées sont
+enregistrées dans la table `schema_version`. Pour faire évoluer le schéma,
+ajouter une migration à la fin de MIGRATIONS et son équivalent, sous le même numéro,
+à la fin de MIGRATIONS_SQLITE (ne jamais modifier une migration existante).
+"""
+
+from src.backends_bdd import dialecte, DIALECTE_SQLITE
+
+# Verrou consultatif partagé par tous les processus qui migrent la même base
+CLE_VERROU_MIGRATIONS = 7242025
+
+# (version, description, liste d'instructions SQL)
+MIGRATIONS = [
+    (1, "Tables des fournisseurs et des écritures", [
+        """
+        CREATE TABLE IF NOT EXISTS fournisseurs_comptes_associes (
+            id SERIAL PRIMARY KEY,
+            fournisseur TEXT UNIQUE NOT NULL,
+            fournisseur_associe TEXT,
+            mode TEXT,
+            compte1 TEXT, regle1 TEXT,
+            compte2 TEXT, regle2 TEXT,
+            compte3 TEXT, regle3 TEXT,
+            compte4 TEXT, regle4 TEXT,
+            compte5 TEXT, regle5 TEXT,
+            compte6 TEXT, regle6 TEXT
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS ecritures_comptables (
+            id SERIAL PRIMARY KEY,
+            compte TEXT,
+            date_facture DATE,
+            fournisseur TEXT,
+            montant NUMERIC,
+            nom_fichier TEXT
+        )
+        """,
+    ]),
+    (2, "Date d'ajout des écritures", [
+        "ALTER TABLE ecritures_comptables ADD COLUMN IF NOT EXISTS date_ajout TIMESTAMP DEFAULT CURRENT_TIMESTAMP",
+    ]),
+    (3, "Modèles d'extraction appris par fournisseur", [
+        """
+        CREATE TABLE IF NOT EXISTS modeles_extraction (
+            fournisseur TEXT PRIMARY KEY,
+            modele TEXT NOT NULL,
+            nb_confirmations INTEGER NOT NULL DEFAULT 1,
+            date_maj TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        """,
+    ]),
+    (4, "Index des recherches fournisseurs et du journal", [
+        # Recherche insensible à la casse (même expression que les requêtes)
+        "CREATE INDEX IF NOT EXISTS idx_fournisseurs_nom_upper ON fournisseurs_comptes_associes (UPPER(fournisseur))",
+        # Tri du journal des écritures et filtres par compte / fournisseur
+        "CREATE INDEX IF NOT EXISTS idx_ecritures_date_id ON ecritures_comptables (date_facture DESC, id DESC)",
+        "CREATE INDEX IF NOT EXISTS idx_ecritures_compte ON ecritures_comptables (compte)",
+        "CREATE INDEX IF NOT EXISTS idx_ecritures_fournisseur ON ecritures_comptables (fournisseur)",
+    ]),
+    (5, "Tri et pagination du journal côté serveur", [
+        # Numéro de compte "X/Y" normalisé en "XX/00Y" pour un tri alphanumérique correct
+        # ("1/25" -> "01/025" < "1/144" -> "01/144")
+        r"""
+        CREATE OR REPLACE FUNCTION normaliser_compte(compte TEXT) RETURNS TEXT
+        LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $$
+            SELECT CASE
+                WHEN compte IS NULL THEN ''
+                WHEN parties.p1 IS NULL THEN compte
+                ELSE CASE WHEN length(parties.p1) < 2 THEN lpad(parties.p1, 2, '0') ELSE parties.p1 END
+                     || '/' ||
+                     CASE WHEN length(parties.p2) < 3 THEN lpad(parties.p2, 3, '0') ELSE parties.p2 END
+            END
+            FROM (
+                SELECT
+                    CASE WHEN compte ~ '^\s*[0-9]+\s*/\s*[0-9]+\s*$'
+                         THEN trim(split_part(compte, '/', 1))::numeric::text END AS p1,
+                    CASE WHEN compte ~ '^\s*[0-9]+\s*/\s*[0-9]+\s*$'
+                         THEN trim(split_part(compte, '/', 2))::numeric::text END AS p2
+            ) AS parties
+        $$
+        """,
+        # Un index par clé de tri, avec l'id pour départager (pagination par curseur)
+        "DROP INDEX IF EXISTS idx_ecritures_date_id",
+        "CREATE INDEX IF NOT EXISTS idx_ecritures_tri_date ON ecritures_comptables ((COALESCE(date_facture, DATE '0001-01-01')), id)",
+        "CREATE INDEX IF NOT EXISTS idx_ecritures_tri_montant ON ecritures_comptables ((COALESCE(montant, 0)), id)",
+        "CREATE INDEX IF NOT EXISTS idx_ecritures_tri_fournisseur ON ecritures_comptables ((LOWER(COALESCE(fournisseur, ''))), id)",
+        "CREATE INDEX IF NOT EXISTS idx_ecritures_tri_compte ON ecritures_comptables ((normaliser_compte(compte)), id)",
+    ]),
+    (6, "Recherche par trigrammes", [
+        "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+        # Texte cherché par la page du journal : fournisseur, compte, fichier et date JJ/MM/AAAA, en minuscules
+        # (date formatée avec extract, immuable contrairement à to_char)
+        """
+        CREATE OR REPLACE FUNCTION texte_recherche_ecriture(fournisseur TEXT, compte TEXT, nom_fichier TEXT, date_facture DATE)
+        RETURNS TEXT LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $$
+            SELECT lower(concat_ws(' ',
+                fournisseur, compte, nom_fichier,
+                lpad(extract(day FROM date_facture)::int::text, 2, '0') || '/' ||
+                lpad(extract(month FROM date_facture)::int::text, 2, '0') || '/' ||
+                extract(year FROM date_facture)::int::text
+            ))
+        $$
+        """,
+        """
+        CREATE INDEX IF NOT EXISTS idx_ecritures_recherche_trgm ON ecritures_comptables
+        USING gin (texte_recherche_ecriture(fournisseur, compte, nom_fichier, date_facture) gin_trgm_ops)
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_fournisseurs_nom_trgm ON fournisseurs_comptes_associes USING gin (lower(fournisseur) gin_trgm_ops)",
+        "CREATE INDEX IF NOT EXISTS idx_fournisseurs_associe_trgm ON fournisseurs_comptes_associes USING gin (lower(COALESCE(fournisseur_associe, '')) gin_trgm_ops)",
+    ]),
+    (7, "Règles d'imputation dans une table dédiée (nombre illimité)", [
+        """
+        CREATE TABLE IF NOT EXISTS regles_imputation (
+            fournisseur_id INTEGER NOT NULL REFERENCES fournisseurs_comptes_associes (id) ON DELETE CASCADE,
+            position INTEGER NOT NULL,
+            compte TEXT NOT NULL,
+            regle TEXT,
+            PRIMARY KEY (fournisseur_id, position)
+        )
+        """,
+        # Reprise des colonnes compte1..6 / regle1..6 (comptes vides ignorés, ordre conservé)
+        """
+        INSERT INTO regles_imputation (fournisseur_id, position, compte, regle)
+        SELECT f.id, ROW_NUMBER() OVER (PARTITION BY f.id ORDER BY r.num), r.compte, r.regle
+        FROM fournisseurs_comptes_associes f
+        CROSS JOIN LATERAL (VALUES
+            (1, f.compte1, f.regle1), (2, f.compte2, f.regle2), (3, f.compte3, f.regle3),
+            (4, f.compte4, f.regle4), (5, f.compte5, f.regle5), (6, f.compte6, f.regle6)
+        ) AS r (num, compte, regle)
+        WHERE COALESCE(r.compte, '') <> ''
+        ON CONFLICT (fournisseur_id, position) DO NOTHING
+        """,
+        """
+        ALTER TABLE fournisseurs_comptes_associes
+            DROP COLUMN IF EXISTS compte1, DROP COLUMN IF EXISTS regle1,
+            DROP COLUMN IF EXISTS compte2, DROP COLUMN IF EXISTS regle2,
+            DROP COLUMN IF EXISTS compte3, DROP COLUMN IF EXISTS regle3,
+            DROP COLUMN IF EXISTS compte4, DROP COLUMN IF EXISTS regle4,
+            DROP COLUMN IF EXISTS compte5, DROP COLUMN IF EXISTS regle5,
+            DROP COLUMN IF EXISTS compte6, DROP COLUMN IF EXISTS regle6
+        """,
+    ]),
+    (8, "Synthèse des écritures par mois, compte et fournisseur", [
+        # Écritures sans date, compte ou fournisseur regroupées sous 0001-01-01 / ''
+        """
+        CREATE TABLE IF NOT EXISTS synthese_ecritures (
+            mois DATE NOT NULL,
+            compte TEXT NOT NULL,
+            fournisseur TEXT NOT NULL,
+            nb_ecritures INTEGER NOT NULL,
+            total NUMERIC NOT NULL,
+            PRIMARY KEY (mois, compte, fournisseur)
+        )
+        """,
+        # Tenue à jour par instruction (un lot d'écritures = une seule mise à jour par groupe)
+        """
+        CREATE OR REPLACE FUNCTION maj_synthese_ecritures() RETURNS trigger
+        LANGUAGE plpgsql AS $$
+        BEGIN
+            IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                UPDATE synthese_ecritures s
+                SET nb_ecritures = s.nb_ecritures - r.nb_ecritures, total = s.total - r.total
+                FROM (
+                    SELECT COALESCE(date_trunc('month', date_facture)::date, DATE '0001-01-01') AS mois,
+                           COALESCE(compte, '') AS compte, COALESCE(fournisseur, '') AS fournisseur,
+                           COUNT(*) AS nb_ecritures, COALESCE(SUM(montant), 0) AS total
+                    FROM anciennes
+                    GROUP BY 1, 2, 3
+                ) r
+                WHERE s.mois = r.mois AND s.compte = r.compte AND s.fournisseur = r.fournisseur;
+
+                DELETE FROM synthese_ecritures s
+                USING anciennes a
+                WHERE s.nb_ecritures <= 0
+                  AND s.mois = COALESCE(date_trunc('month', a.date_facture)::date, DATE '0001-01-01')
+                  AND s.compte = COALESCE(a.compte, '') AND s.fournisseur = COALESCE(a.fournisseur, '');
+            END IF;
+
+            IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                INSERT INTO synthese_ecritures (mois, compte, fournisseur, nb_ecritures, total)
+                SELECT COALESCE(date_trunc('month', date_facture)::date, DATE '0001-01-01'),
+                       COALESCE(compte, ''), COALESCE(fournisseur, ''),
+                       COUNT(*), COALESCE(SUM(montant), 0)
+                FROM nouvelles
+                GROUP BY 1, 2, 3
+                ON CONFLICT (mois, compte, fournisseur) DO UPDATE
+                SET nb_ecritures = synthese_ecritures.nb_ecritures + EXCLUDED.nb_ecritures,
+                    total = synthese_ecritures.total + EXCLUDED.total;
+            END IF;
+            RETURN NULL;
+        END
+        $$
+        """,
+        "DROP TRIGGER IF EXISTS synthese_ecritures_ajout ON ecritures_comptables",
+        """
+        CREATE TRIGGER synthese_ecritures_ajout AFTER INSERT ON ecritures_comptables
+        REFERENCING NEW TABLE AS nouvelles
+        FOR EACH STATEMENT EXECUTE FUNCTION maj_synthese_ecritures()
+        """,
+        "DROP TRIGGER IF EXISTS synthese_ecritures_modification ON ecritures_comptables",
+        """
+        CREATE TRIGGER synthese_ecritures_modification AFTER UPDATE ON ecritures_comptables
+        REFERENCING OLD TABLE AS anciennes NEW TABLE AS nouvelles
+        FOR EACH STATEMENT EXECUTE FUNCTION maj_synthese_ecritures()
+        """,
+        "DROP TRIGGER IF EXISTS synthese_ecritures_suppression ON ecritures_comptables",
+        """
+        CREATE TRIGGER synthese_ecritures_suppression AFTER DELETE ON ecritures_comptables
+        REFERENCING OLD TABLE AS anciennes
+        FOR EACH STATEMENT EXECUTE FUNCTION maj_synthese_ecritures()
+        """,
+        # Reprise des écritures existantes
+        """
+        INSERT INTO synthese_ecritures (mois, compte, fournisseur, nb_ecritures, total)
+        SELECT COALESCE(date_trunc('month', date_facture)::date, DATE '0001-01-01'),
+               COALESCE(compte, ''), COALESCE(fournisseur, ''),
+               COUNT(*), COALESCE(SUM(montant), 0)
+        FROM ecritures_comptables
+        GROUP BY 1, 2, 3
+        ON CONFLICT (mois, compte, fournisseur) DO NOTHING
+        """,
+    ]),
+    (9, "Clé d'idempotence des écritures (journal local)", [
+        "ALTER TABLE ecritures_comptables ADD COLUMN IF NOT EXISTS cle_idempotence TEXT",
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_ecritures_cle_idempotence ON ecritures_comptables (cle_idempotence)",
+    ]),
+    (10, "Empreintes des factures déjà traitées (détection des doublons)", [
+        """
+        CREATE TABLE IF NOT EXISTS empreintes_factures (
+            id SERIAL PRIMARY KEY,
+            empreinte_pdf TEXT NOT NULL,
+            cle_facture TEXT,
+            fournisseur TEXT,
+            numero_facture TEXT,
+            date_facture TEXT,
+            montant_total TEXT,
+            nom_fichier TEXT,
+            date_ajout TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        """,
+        # Un fichier peut contenir plusieurs factures : seule la clé (fournisseur, numéro, date, total) est unique
+        "CREATE INDEX IF NOT EXISTS idx_empreintes_pdf ON empreintes_factures (empreinte_pdf)",
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_empreintes_cle_facture ON empreintes_factures (cle_facture)",
+    ]),
+    (11, "Nombre de factures du fichier déposé (doublons)", [
+        "ALTER TABLE empreintes_factures ADD COLUMN IF NOT EXISTS nb_factures_fichier INTEGER NOT NULL DEFAULT 1",
+    ]),
+]
+
+
+# Base SQLite locale : le schéma des versions 1 à 7 est créé d'un coup, puis les versions
+# suivantes reprennent les numéros de MIGRATIONS.
+MIGRATIONS_SQLITE = [
+    (7, "Schéma initial (équivalent des versions PostgreSQL 1 à 7)", [
+        """
+        CREATE TABLE IF NOT EXISTS fournisseurs_comptes_associes (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            fournisseur TEXT UNIQUE NOT NULL,
+            fournisseur_associe TEXT,
+            mode TEXT
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS regles_imputation (
+            fournisseur_id INTEGER NOT NULL REFERENCES fournisseurs_comptes_associes (id) ON DELETE CASCADE,
+            position INTEGER NOT NULL,
+            compte TEXT NOT NULL,
+            regle TEXT,
+            PRIMARY KEY (fournisseur_id, position)
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS ecritures_comptables (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            compte TEXT,
+            date_facture DATE,
+            fournisseur TEXT,
+            montant NUMERIC,
+            nom_fichier TEXT,
+            date_ajout TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS modeles_extraction (
+            fournisseur TEXT PRIMARY KEY,
+            modele TEXT NOT NULL,
+            nb_confirmations INTEGER NOT NULL DEFAULT 1,
+            date_maj TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_fournisseurs_nom_upper ON fournisseurs_comptes_associes (UPPER(fournisseur))",
+        "CREATE INDEX IF NOT EXISTS idx_ecritures_compte ON ecritures_comptables (compte)",
+        "CREATE INDEX IF NOT EXISTS idx_ecritures_fournisseur ON ecritures_comptables (fournisseur)",
+        # Dates stockées en texte AAAA-MM-JJ
+        "CREATE INDEX IF NOT EXISTS idx_ecritures_tri_date ON ecritures_comptables (COALESCE(date_facture, '0001-01-01'), id)",
+        "CREATE INDEX IF NOT EXISTS idx_ecritures_tri_montant ON ecritures_comptables (COALESCE(montant, 0), id)",
+        "CREATE INDEX IF NOT EXISTS idx_ecritures_tri_fournisseur ON ecritures_comptables (LOWER(COALESCE(fournisseur, '')), id)",
+        "CREATE INDEX IF NOT EXISTS idx_ecritures_tri_compte ON ecritures_comptables (normaliser_compte(compte), id)",
+        # Recherche du journal : index plein texte par trigrammes (rowid = id de l'écriture),
+        # tenu à jour par des déclencheurs
+        "CREATE VIRTUAL TABLE IF NOT EXISTS ecritures_recherche USING fts5(texte, tokenize = 'trigram')",
+        """
+        CREATE TRIGGER IF NOT EXISTS ecritures_recherche_ajout AFTER INSERT ON ecritures_comptables BEGIN
+            INSERT INTO ecritures_recherche (rowid, texte)
+            VALUES (NEW.id, texte_recherche_ecriture(NEW.fournisseur, NEW.compte, NEW.nom_fichier, NEW.date_facture));
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS ecritures_recherche_modification AFTER UPDATE ON ecritures_comptables BEGIN
+            DELETE FROM ecritures_recherche WHERE rowid = OLD.id;
+            INSERT INTO ecritures_recherche (rowid, texte)
+            VALUES (NEW.id, texte_recherche_ecriture(NEW.fournisseur, NEW.compte, NEW.nom_fichier, NEW.date_facture));
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS ecritures_recherche_suppression AFTER DELETE ON ecritures_comptables BEGIN
+            DELETE FROM ecritures_recherche WHERE rowid = OLD.id;
+        END
+        """,
+    ]),
+    (8, "Synthèse des écritures par mois, compte et fournisseur", [
+        """
+        CREATE TABLE IF NOT EXISTS synthese_ecritures (
+            mois DATE NOT NULL,
+            compte TEXT NOT NULL,
+            fournisseur TEXT NOT NULL,
+            nb_ecritures INTEGER NOT NULL,
+            total NUMERIC NOT NULL,
+            PRIMARY KEY (mois, compte, fournisseur)
+        )
+        """,
+        # Déclencheurs par ligne (SQLite n'a pas de déclencheurs par instruction)
+        """
+        CREATE TRIGGER IF NOT EXISTS synthese_ecritures_ajout AFTER INSERT ON ecritures_comptables BEGIN
+            INSERT INTO synthese_ecritures (mois, compte, fournisseur, nb_ecritures, total)
+            VALUES (COALESCE(strftime('%Y-%m-01', NEW.date_facture), '0001-01-01'),
+                    COALESCE(NEW.compte, ''), COALESCE(NEW.fournisseur, ''), 1, COALESCE(NEW.montant, 0))
+            ON CONFLICT (mois, compte, fournisseur) DO UPDATE
+            SET nb_ecritures = nb_ecritures + 1, total = total + excluded.total;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS synthese_ecritures_retrait AFTER DELETE ON ecritures_comptables BEGIN
+            UPDATE synthese_ecritures
+            SET nb_ecritures = nb_ecritures - 1, total = total - COALESCE(OLD.montant, 0)
+            WHERE mois = COALESCE(strftime('%Y-%m-01', OLD.date_facture), '0001-01-01')
+              AND compte = COALESCE(OLD.compte, '') AND fournisseur = COALESCE(OLD.fournisseur, '');
+            DELETE FROM synthese_ecritures
+            WHERE nb_ecritures <= 0
+              AND mois = COALESCE(strftime('%Y-%m-01', OLD.date_facture), '0001-01-01')
+              AND compte = COALESCE(OLD.compte, '') AND fournisseur = COALESCE(OLD.fournisseur, '');
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS synthese_ecritures_modification AFTER UPDATE ON ecritures_comptables BEGIN
+            UPDATE synthese_ecritures
+            SET nb_ecritures = nb_ecritures - 1, total = total - COALESCE(OLD.montant, 0)
+            WHERE mois = COALESCE(strftime('%Y-%m-01', OLD.date_facture), '0001-01-01')
+              AND compte = COALESCE(OLD.compte, '') AND fournisseur = COALESCE(OLD.fournisseur, '');
+            DELETE FROM synthese_ecritures
+            WHERE nb_ecritures <= 0
+              AND mois = COALESCE(strftime('%Y-%m-01', OLD.date_facture), '0001-01-01')
+              AND compte = COALESCE(OLD.compte, '') AND fournisseur = COALESCE(OLD.fournisseur, '');
+            INSERT INTO synthese_ecritures (mois, compte, fournisseur, nb_ecritures, total)
+            VALUES (COALESCE(strftime('%Y-%m-01', NEW.date_facture), '0001-01-01'),
+                    COALESCE(NEW.compte, ''), COALESCE(NEW.fournisseur, ''), 1, COALESCE(NEW.montant, 0))
+            ON CONFLICT (mois, compte, fournisseur) DO UPDATE
+            SET nb_ecritures = nb_ecritures + 1, total = total + excluded.total;
+        END
+        """,
+        """
+        INSERT INTO synthese_ecritures (mois, compte, fournisseur, nb_ecritures, total)
+        SELECT COALESCE(strftime('%Y-%m-01', date_facture), '0001-01-01'),
+               COALESCE(compte, ''), COALESCE(fournisseur, ''),
+               COUNT(*), COALESCE(SUM(montant), 0)
+        FROM ecritures_comptables
+        GROUP BY 1, 2, 3
+        """,
+    ]),
+    (9, "Clé d'idempotence des écritures (journal local)", [
+        "ALTER TABLE ecritures_comptables ADD COLUMN cle_idempotence TEXT",
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_ecritures_cle_idempotence ON ecritures_comptables (cle_idempotence)",
+    ]),
+    (10, "Empreintes des factures déjà traitées (détection des doublons)", [
+        """
+        CREATE TABLE IF NOT EXISTS empreintes_factures (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            empreinte_pdf TEXT NOT NULL,
+            cle_facture TEXT,
+            fournisseur TEXT,
+            numero_facture TEXT,
+            date_facture TEXT,
+            montant_total TEXT,
+            nom_fichier TEXT,
+            date_ajout TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_empreintes_pdf ON empreintes_factures (empreinte_pdf)",
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_empreintes_cle_facture ON empreintes_factures (cle_facture)",
+    ]),
+    (11, "Nombre de factures du fichier déposé (doublons)", [
+        "ALTER TABLE empreintes_factures ADD COLUMN nb_factures_fichier INTEGER NOT NULL DEFAULT 1",
+    ]),
+]
+
+
+def version_cible() -> int:
+    """Numéro de la dernière migration connue."""
+    return MIGRATIONS[-1][0] if MIGRATIONS else 0
+
+
+def appliquer_migrations(conn) -> int:
+    """
+    Applique, dans l'ordre, les migrations pas encore passées sur cette base.
+
+    Un verrou consultatif empêche deux processus de migrer en même temps ;
+    chaque migration est appliquée dans sa propre transaction avec son numéro de version.
+
+    :return: La version du schéma après migration.
+    """
+    if dialecte(conn) == DIALECTE_SQLITE:
+        return _appliquer_migrations_sqlite(conn)
+
+    cursor = conn.cursor()
+    cursor.execute("SELECT pg_advisory_lock(%s)", (CLE_VERROU_MIGRATIONS,))
+    try:
+        cursor.execute("""
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            description TEXT,
+            date_application TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        """)
+        cursor.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version")
+        version_actuelle = cursor.fetchone()[0]
+        conn.commit()
+
+        for version, description, instructions in MIGRATIONS:
+            if version <= version_actuelle:
+                continue
+            try:
+                for instruction in instructions:
+                    cursor.execute(instruction)
+                cursor.execute(
+                    "INSERT INTO schema_version (version, description) VALUES (%s, %s)",
+                    (version, description)
+                )
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            version_actuelle = version
+            print(f"🛠️ Migration {version} appliquée : {description}")
+
+        return version_actuelle
+    finally:
+        cursor.execute("SELECT pg_advisory_unlock(%s)", (CLE_VERROU_MIGRATIONS,))
+        conn.commit()
+
+
+def _appliquer_migrations_sqlite(conn) -> int:
+    """
+    Variante SQLite : toutes les migrations en attente sont appliquées dans une seule
+    transaction IMMEDIATE, qui empêche un autre processus d'écrire (et donc de migrer) en même temps.
+    """
+    cursor = conn.cursor()
+    try:
+        cursor.execute("BEGIN IMMEDIATE")
+        cursor.execute("""
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            description TEXT,
+            date_application TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        """)
+        cursor.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version")
+        version_actuelle = cursor.fetchone()[0]
+
+        appliquees = []
+        for version, description, instructions in MIGRATIONS_SQLITE:
+            if version <= version_actuelle:
+                continue
+            for instruction in instructions:
+                cursor.execute(instruction)
+            cursor.execute(
+                "INSERT INTO schema_version (version, description) VALUES (%s, %s)",
+                (version, description)
+            )
+            version_actuelle = version
+            appliquees.append((version, description))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+    for version, description in appliquees:
+        print(f"🛠️ Migration {version} appliquée : {description}")
+    return version_actuelle
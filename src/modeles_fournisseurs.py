@@ -0,0 +1,251 @@
+import re
+import math
+from decimal import Decimal, InvalidOperation
+from src.gestion_bdd import get_modele_extraction, enregistrer_modele_extraction
+
+
+# Nombre de validations concordantes avant d'utiliser un modèle à la place de Gemini
+CONFIRMATIONS_MIN = 2
+# Écart maximal (en points PDF) entre la position attendue et la position trouvée
+TOLERANCE_POINTS = 8.0
+
+MOTIF_MONTANT = re.compile(r"^-?\d{1,3}(?:[ .\u00a0\u202f]?\d{3})*[.,]\d{2}€?$")
+MOTIF_MILLIERS = re.compile(r"^\d{1,3}$")
+
+
+def convertir_montant(texte):
+    """
+    Convertit un montant saisi ou lu sur une facture ("1 234,56 €", "26.42", "-2,48") en Decimal.
+    Retourne None si le texte n'est pas un montant.
+    """
+    if texte is None:
+        return None
+    propre = re.sub(r"[\s€]", "", str(texte))
+    if not propre:
+        return None
+    # Le dernier séparateur rencontré est le séparateur décimal
+    if "," in propre and "." in propre:
+        if propre.rfind(",") > propre.rfind("."):
+            propre = propre.replace(".", "").replace(",", ".")
+        else:
+            propre = propre.replace(",", "")
+    else:
+        propre = propre.replace(",", ".")
+    try:
+        return Decimal(propre)
+    except InvalidOperation:
+        return None
+
+
+def _centre(x0, y0, x1, y1):
+    return ((x0 + x1) / 2, (y0 + y1) / 2)
+
+
+def _lire_pages(pdf_bytes: bytes):
+    """
+    Retourne, pour chaque page, la liste des mots (texte, x, y) et la liste des montants
+    (valeur, x, y, texte). Les montants coupés en plusieurs mots ("1" "234,56") sont recollés.
+    """
+    import fitz  # PyMuPDF
+
+    pages = []
+    doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+    try:
+        for page in doc:
+            mots = page.get_text("words", sort=True)
+            liste_mots, montants = [], []
+            for i, (x0, y0, x1, y1, texte, bloc, ligne, _) in enumerate(mots):
+                liste_mots.append((texte, *_centre(x0, y0, x1, y1)))
+
+                if not MOTIF_MONTANT.match(texte):
+                    continue
+                # Recollage des milliers écrits avec un espace
+                debut = i
+                while debut > 0:
+                    precedent = mots[debut - 1]
+                    if precedent[5] == bloc and precedent[6] == ligne and MOTIF_MILLIERS.match(precedent[4]) \
+                            and x0 - precedent[2] < 6:
+                        debut -= 1
+                        x0 = precedent[0]
+                    else:
+                        break
+                texte_complet = " ".join(m[4] for m in mots[debut:i + 1])
+                valeur = convertir_montant(texte_complet)
+                if valeur is not None:
+                    montants.append((valeur, *_centre(x0, y0, x1, y1), texte_complet))
+            pages.append({"mots": liste_mots, "montants": montants})
+    finally:
+        doc.close()
+    return pages
+
+
+def _ancres_uniques(mots: list) -> dict:
+    """Mots contenant au moins 3 lettres et présents une seule fois sur la page."""
+    occurrences = {}
+    for texte, x, y in mots:
+        if sum(c.isalpha() for c in texte) < 3:
+            continue
+        occurrences.setdefault(texte.upper(), []).append((x, y))
+    return {texte: positions[0] for texte, positions in occurrences.items() if len(positions) == 1}
+
+
+def apprendre_modele(pdf_bytes: bytes, valeurs_validees: list):
+    """
+    Construit un modèle d'extraction à partir d'une facture validée.
+
+    :param valeurs_validees: Liste de tuples (compte, montant) validés par l'utilisateur.
+    :return: Dictionnaire {compte: extracteur} ou None si un montant est introuvable dans le PDF.
+
+    Chaque extracteur mémorise la page, le mot "ancre" unique le plus proche du montant
+    (ex. "TTC") et le décalage entre les deux, ce qui reste valable si le bloc
+    des totaux se déplace d'une facture à l'autre.
+    """
+    pages = _lire_pages(pdf_bytes)
+    modele = {}
+
+    for compte, montant in valeurs_validees:
+        valeur = convertir_montant(montant)
+        if valeur is None:
+            return None
+
+        meilleur = None
+        for num_page, page in enumerate(pages):
+            ancres = _ancres_uniques(page["mots"])
+            for valeur_lue, x, y, _ in page["montants"]:
+                if valeur_lue != valeur:
+                    continue
+                for ancre, (ax, ay) in ancres.items():
+                    distance = math.hypot(x - ax, y - ay)
+                    if meilleur is None or distance < meilleur[0]:
+                        # Page comptée depuis la fin si elle est dans la seconde moitié du document
+                        page_ref = num_page if num_page < len(pages) / 2 else num_page - len(pages)
+                        meilleur = (distance, {"page": page_ref, "ancre": ancre, "dx": x - ax, "dy": y - ay})
+
+        if meilleur is None:
+            return None
+        modele[compte] = meilleur[1]
+
+    return modele
+
+
+def appliquer_modele(modele: dict, pdf_bytes: bytes):
+    """
+    Applique un modèle d'extraction en local.
+
+    :return: Dictionnaire {compte: montant} (montants sous forme de texte "1234.56"),
+             ou None si un extracteur n'est pas sûr de lui (ancre absente ou ambiguë,
+             aucun montant ou plusieurs montants à l'emplacement attendu).
+    """
+    try:
+        pages = _lire_pages(pdf_bytes)
+    except Exception as e:
+        print(f"⚠️ Lecture du PDF impossible pour le modèle : {e}")
+        return None
+
+    resultats = {}
+    for compte, extracteur in modele.items():
+        try:
+            page = pages[extracteur["page"]]
+        except IndexError:
+            return None
+
+        ancre = _ancres_uniques(page["mots"]).get(extracteur["ancre"])
+        if ancre is None:
+            return None
+
+        attendu_x, attendu_y = ancre[0] + extracteur["dx"], ancre[1] + extracteur["dy"]
+        candidats = [
+            valeur for valeur, x, y, _ in page["montants"]
+            if math.hypot(x - attendu_x, y - attendu_y) <= TOLERANCE_POINTS
+        ]
+        if len(candidats) != 1:
+            return None
+        resultats[compte] = str(candidats[0])
+
+    return resultats
+
+
+def _extracteurs_a_jour(modele: dict, regles_imputation: list):
+    """
+    Extracteurs du modèle pour ces règles (compte, regle) : None si un compte n'a pas d'extracteur
+    ou si sa règle a changé depuis l'apprentissage (l'extracteur lit alors un autre montant).
+    """
+    extracteurs = {}
+    for compte, regle in regles_imputation:
+        extracteur = modele.get(compte)
+        if extracteur is None or extracteur.get("regle") != regle:
+            return None
+        extracteurs[compte] = extracteur
+    return extracteurs
+
+
+def imputations_par_modele(nom_fournisseur: str, pdf_path: str, regles_imputation: list, db_url: str):
+    """
+    Tente de calculer les imputations d'une facture sans appeler Gemini,
+    à partir du modèle appris pour ce fournisseur.
+
+    :param regles_imputation: Liste de tuples (compte, regle), dans l'ordre attendu.
+    :return: Tuple de montants (même ordre que les règles) ou None si le modèle
+             n'existe pas, n'est pas encore confirmé, ou échoue sur cette facture.
+    """
+    enregistrement = get_modele_extraction(nom_fournisseur, db_url)
+    if not enregistrement or enregistrement["nb_confirmations"] < CONFIRMATIONS_MIN:
+        return None
+
+    extracteurs = _extracteurs_a_jour(enregistrement["modele"], regles_imputation)
+    if extracteurs is None:
+        return None
+    comptes = [regle[0] for regle in regles_imputation]
+
+    try:
+        with open(pdf_path, "rb") as f:
+            resultats = appliquer_modele(extracteurs, f.read())
+    except Exception as e:
+        print(f"⚠️ Modèle de {nom_fournisseur} inutilisable : {e}")
+        return None
+    if resultats is None:
+        print(f"ℹ️ Modèle de {nom_fournisseur} non applicable sur cette facture, appel à Gemini.")
+        return None
+
+    print(f"⚡ Imputations de {nom_fournisseur} extraites par le modèle local.")
+    return tuple(resultats[compte] for compte in comptes)
+
+
+def enregistrer_validation(nom_fournisseur: str, pdf_path: str, valeurs_validees: list,
+                           regles_imputation: list, db_url: str):
+    """
+    Met à jour le modèle d'un fournisseur après validation d'une facture.
+
+    Si le modèle existant retrouve exactement les montants validés, il gagne une confirmation ;
+    sinon il est remplacé par un modèle appris sur cette facture. Chaque extracteur garde la règle
+    du compte (`regles_imputation` : tuples (compte, regle)) : un modèle appris avec une autre
+    règle n'est plus utilisé et repart de zéro.
+    """
+    valeurs_validees = [(compte, montant) for compte, montant in valeurs_validees if convertir_montant(montant) is not None]
+    if not nom_fournisseur or not valeurs_validees:
+        return False
+
+    try:
+        with open(pdf_path, "rb") as f:
+            pdf_bytes = f.read()
+
+        regles = dict(regles_imputation or [])
+        enregistrement = get_modele_extraction(nom_fournisseur, db_url)
+        if enregistrement:
+            modele = enregistrement["modele"]
+            extracteurs = _extracteurs_a_jour(modele, [(compte, regles.get(compte)) for compte, _ in valeurs_validees])
+            if extracteurs is not None:
+                resultats = appliquer_modele(extracteurs, pdf_bytes)
+                if resultats and all(convertir_montant(resultats[c]) == convertir_montant(m) for c, m in valeurs_validees):
+                    return enregistrer_modele_extraction(nom_fournisseur, modele, enregistrement["nb_confirmations"] + 1, db_url)
+
+        nouveau_modele = apprendre_modele(pdf_bytes, valeurs_validees)
+        if nouveau_modele is None:
+            return False
+        for compte, extracteur in nouveau_modele.items():
+            extracteur["regle"] = regles.get(compte)
+        return enregistrer_modele_extraction(nom_fournisseur, nouveau_modele, 1, db_url)
+
+    except Exception as e:
+        print(f"⚠️ Apprentissage du modèle impossible pour {nom_fournisseur} : {e}")
+        return False
@@ -68,6 +68,41 @@ def extraire_factures_pdf(chemin_pdf_source: str, resultats_factures: list, doss
         return []
 
 
+def extraire_pages_pdf(pdf_bytes: bytes, pages: list) -> bytes:
+    """
+    Construit en mémoire un PDF ne contenant que les pages demandées
+    (ex. première page pour l'identification, dernière page pour les totaux).
+
+    :param pdf_bytes: Le contenu du PDF d'origine.
+    :param pages: Numéros de pages en base 1 ; un numéro négatif compte depuis la fin (-1 = dernière page).
+    :return: Le PDF réduit, ou le PDF d'origine si toutes les pages sont demandées,
+             si aucune page demandée n'existe, ou en cas d'erreur.
+    """
+    try:
+        reader = PdfReader(BytesIO(pdf_bytes))
+        nombre_pages = len(reader.pages)
+
+        index = sorted({
+            page - 1 if page > 0 else nombre_pages + page
+            for page in pages
+            if page != 0 and -nombre_pages <= page <= nombre_pages
+        })
+        if not index or len(index) == nombre_pages:
+            return pdf_bytes
+
+        writer = PdfWriter()
+        for i in index:
+            writer.add_page(reader.pages[i])
+
+        sortie = BytesIO()
+        writer.write(sortie)
+        return sortie.getvalue()
+
+    except Exception as e:
+        print(f"⚠️ Sélection des pages impossible, envoi du document complet : {e}")
+        return pdf_bytes
+
+
 def creation_texte_rouge(fournisseur: str, comptes: list, chiffres: list):
     texte_rouge = " " + fournisseur.upper() + "\n"
     for compte, chiffre in zip(comptes, chiffres):
@@ -0,0 +1,193 @@
+import os
+import queue
+import itertools
+import threading
+from src.appels_ia import get_infos_facture, application_regle_imputation_V2, extraire_valeurs_regles
+from src.gestion_bdd import trouver_associations_fournisseur
+from src.resolution_fournisseurs import reconnaitre_fournisseur
+from src.modeles_fournisseurs import imputations_par_modele
+from src.client_gemini import get_disjoncteur
+
+
+# Nombre de factures analysées à l'avance derrière celle affichée
+PROFONDEUR_DEFAUT = 3
+# Nombre d'analyses Gemini menées en parallèle
+NB_WORKERS_DEFAUT = 2
+# Attente maximale (secondes) de l'analyse de la facture affichée, avant de l'analyser sans le préchargeur
+ATTENTE_ECRAN_DEFAUT = 60.0
+
+PRIORITE_ECRAN = 0
+PRIORITE_AVANCE = 1
+
+
+def analyser_facture(pdf_path: str, client, db_url: str, infos: dict = None) -> dict:
+    """
+    Identification puis imputation d'une facture, sans interaction utilisateur.
+
+    :param infos: Résultat de l'extraction combinée pour ce fichier (optionnel).
+    :return: Dictionnaire {fournisseur, fournisseur_lu, date_str, associations, imputations}.
+             `fournisseur` est le fournisseur connu reconnu d'après le nom lu (`fournisseur_lu`,
+             None si le nom lu est retenu tel quel) ; `imputations` vaut None s'il n'a pas de règles.
+    """
+    if infos:
+        nom_fournisseur = infos.get("nom_fournisseur")
+        date_str = infos.get("date_facture")
+    else:
+        nom_fournisseur, date_str = get_infos_facture(pdf_path, client)
+
+    fournisseur_lu = None
+    if not nom_fournisseur:
+        nom_fournisseur = "Inconnu"
+    else:
+        nom_fournisseur, fournisseur_lu = reconnaitre_fournisseur(nom_fournisseur, db_url)
+
+    associations = trouver_associations_fournisseur(nom_fournisseur, db_url)
+    regles_pour_ia = [assoc for assoc in associations if len(assoc) > 1 and assoc[1]]
+
+    imputations = None
+    if regles_pour_ia:
+        # Fournisseur récurrent : le modèle appris suffit, sans appel à Gemini
+        imputations = imputations_par_modele(nom_fournisseur, pdf_path, regles_pour_ia, db_url)
+    if regles_pour_ia and imputations is None:
+        if infos:
+            imputations = extraire_valeurs_regles(
+                infos["source"], client, regles_pour_ia, infos.get("page_debut"), infos.get("page_fin")
+            )
+        else:
+            imputations = application_regle_imputation_V2(pdf_path, client, regles_pour_ia)
+
+    return {
+        "fournisseur": nom_fournisseur,
+        "fournisseur_lu": fournisseur_lu,
+        "date_str": date_str,
+        "associations": associations,
+        "imputations": imputations,
+    }
+
+
+class PrechargeurFactures:
+    """
+    File d'analyses en arrière-plan (pool de threads borné).
+
+    Les résultats sont conservés ici, hors de `st.session_state`, pour survivre aux reruns.
+    La facture affichée passe toujours devant les analyses anticipées.
+    """
+
+    def __init__(self, nb_workers: int = NB_WORKERS_DEFAUT):
+        self.nb_workers = nb_workers
+        self._file = queue.PriorityQueue()
+        self._sequence = itertools.count()
+        self._verrou = threading.Lock()
+        self._taches = {}      # chemin -> fonction à exécuter
+        self._demarrees = set()
+        self._resultats = {}   # chemin -> résultat
+        self._termines = {}    # chemin -> threading.Event
+        self._generation = 0   # incrémentée à chaque vidage pour ignorer les analyses obsolètes
+        self._workers = []
+
+    def _demarrer_workers(self):
+        while len(self._workers) < self.nb_workers:
+            worker = threading.Thread(target=self._boucle, daemon=True)
+            worker.start()
+            self._workers.append(worker)
+
+    def planifier(self, chemin: str, tache, prioritaire: bool = False):
+        """
+        Ajoute l'analyse d'un fichier à la file (sans effet si elle est déjà faite ou en cours).
+        `tache` est une fonction sans argument qui retourne le résultat.
+        """
+        priorite = PRIORITE_ECRAN if prioritaire else PRIORITE_AVANCE
+        with self._verrou:
+            if chemin in self._demarrees:
+                return
+            deja_planifiee = chemin in self._taches
+            self._taches[chemin] = tache
+            if chemin not in self._termines:
+                self._termines[chemin] = threading.Event()
+            # Une tâche déjà en file peut être remontée en tête si elle devient prioritaire
+            if not deja_planifiee or prioritaire:
+                self._file.put((priorite, next(self._sequence), chemin, self._generation))
+            self._demarrer_workers()
+
+    def _boucle(self):
+        while True:
+            _, _, chemin, generation = self._file.get()
+            with self._verrou:
+                if generation != self._generation or chemin in self._demarrees or chemin not in self._taches:
+                    continue
+                self._demarrees.add(chemin)
+                tache = self._taches[chemin]
+                evenement = self._termines[chemin]
+
+            # Quota Gemini atteint : la file attend la fin de la pause au lieu d'enchaîner les échecs
+            get_disjoncteur().attendre_fermeture()
+
+            try:
+                resultat = tache()
+            except Exception as e:
+                print(f"⚠️ Analyse anticipée échouée pour {chemin} : {e}")
+                resultat = None
+
+            with self._verrou:
+                if generation == self._generation:
+                    self._resultats[chemin] = resultat
+            evenement.set()
+
+    def obtenir(self, chemin: str, timeout: float = None):
+        """
+        Attend (si besoin) et retourne le résultat de l'analyse d'un fichier.
+        Retourne None si le fichier n'a jamais été planifié ou si l'analyse a échoué.
+        """
+        with self._verrou:
+            evenement = self._termines.get(chemin)
+        if evenement is None or not evenement.wait(timeout):
+            return None
+        with self._verrou:
+            return self._resultats.get(chemin)
+
+    def vider(self):
+        """Abandonne toutes les analyses (nouvelle série de factures)."""
+        with self._verrou:
+            self._generation += 1
+            self._taches.clear()
+            self._demarrees.clear()
+            self._resultats.clear()
+            for evenement in self._termines.values():
+                evenement.set() # Débloque un éventuel appel à obtenir()
+            self._termines.clear()
+
+
+_prechargeur = None
+_verrou_prechargeur = threading.Lock()
+
+
+def get_prechargeur() -> PrechargeurFactures:
+    """
+    Retourne le préchargeur partagé par le processus.
+    Variable d'environnement : PRECHARGEMENT_WORKERS.
+    """
+    global _prechargeur
+    with _verrou_prechargeur:
+        if _prechargeur is None:
+            _prechargeur = PrechargeurFactures(int(os.getenv("PRECHARGEMENT_WORKERS", NB_WORKERS_DEFAUT)))
+        return _prechargeur
+
+
+def planifier_analyses(prechargeur: PrechargeurFactures, files_to_process: list, current_index: int,
+                       client, db_url: str, infos_factures: dict = None, profondeur: int = None):
+    """
+    Planifie l'analyse de la facture affichée (en priorité) puis des `profondeur` suivantes.
+    Variable d'environnement : PRECHARGEMENT_PROFONDEUR.
+    """
+    if profondeur is None:
+        profondeur = int(os.getenv("PRECHARGEMENT_PROFONDEUR", PROFONDEUR_DEFAUT))
+    infos_factures = infos_factures or {}
+
+    for i in range(current_index, min(current_index + 1 + profondeur, len(files_to_process))):
+        chemin = files_to_process[i]
+        infos = infos_factures.get(chemin)
+        prechargeur.planifier(
+            chemin,
+            lambda chemin=chemin, infos=infos: analyser_facture(chemin, client, db_url, infos),
+            prioritaire=(i == current_index)
+        )
@@ -0,0 +1,182 @@
+import os
+import re
+import time
+import threading
+import unicodedata
+from collections import defaultdict
+from src.gestion_bdd import get_tous_les_fournisseurs, get_profil_fournisseur, version_fournisseurs
+
+# Score minimal (0 à 1) pour reconnaître automatiquement un fournisseur existant
+SEUIL_RESOLUTION_DEFAUT = 0.85
+# Écart minimal avec le deuxième candidat pour que la reconnaissance soit sans ambiguïté
+ECART_RESOLUTION = 0.05
+# Durée de vie de l'index (secondes) : prend en compte les modifications faites par d'autres processus
+DUREE_VIE_INDEX_DEFAUT = 300.0
+
+# Formes juridiques et mots sans valeur pour distinguer deux fournisseurs
+MOTS_IGNORES = {
+    "SA", "SAS", "SASU", "SARL", "EURL", "SNC", "SCI", "SCP", "SCOP", "SE", "GIE", "EI",
+    "STE", "SOCIETE", "ETS", "ETABLISSEMENTS", "CIE", "ET", "DE", "DES", "DU", "LA", "LE", "LES",
+}
+
+
+def normaliser_nom(nom: str) -> str:
+    """
+    Forme comparable d'un nom de fournisseur : sans accents ni ponctuation, en majuscules,
+    sans forme juridique ("Sté Bruneau S.A.R.L." -> "BRUNEAU").
+    """
+    if not nom:
+        return ""
+    texte = unicodedata.normalize("NFKD", nom)
+    texte = "".join(c for c in texte if not unicodedata.combining(c)).upper()
+    texte = re.sub(r"(?<=\b[A-Z])\.", "", texte)  # S.A.R.L. -> SARL
+    mots = re.findall(r"[A-Z0-9]+", texte)
+    utiles = [mot for mot in mots if mot not in MOTS_IGNORES]
+    return " ".join(utiles or mots)
+
+
+def trigrammes(nom_normalise: str) -> set:
+    """Trigrammes du nom normalisé, chaque mot encadré d'espaces (comme pg_trgm)."""
+    resultat = set()
+    for mot in nom_normalise.split():
+        mot = f"  {mot} "
+        resultat.update(mot[i:i + 3] for i in range(len(mot) - 2))
+    return resultat
+
+
+class IndexFournisseurs:
+    """
+    Index inversé en mémoire : trigramme -> noms (fournisseurs et fournisseurs associés).
+
+    Le score d'un candidat est le coefficient de Dice entre les trigrammes du nom cherché
+    et ceux du nom connu ; seuls les noms partageant au moins un trigramme sont comparés.
+    """
+
+    def __init__(self, fournisseurs: list):
+        self._noms = []  # (fournisseur, trigrammes d'un de ses noms)
+        self._exacts = {}  # nom normalisé -> fournisseur
+        self._index = defaultdict(list)
+        for fournisseur in fournisseurs:
+            nom = fournisseur.get("fournisseur")
+            if not nom:
+                continue
+            for alias in (nom, fournisseur.get("fournisseur_associe")):
+                normalise = normaliser_nom(alias)
+                if not normalise:
+                    continue
+                self._exacts.setdefault(normalise, nom)
+                position = len(self._noms)
+                grammes = trigrammes(normalise)
+                self._noms.append((nom, grammes))
+                for gramme in grammes:
+                    self._index[gramme].append(position)
+
+    def __len__(self):
+        return len(self._noms)
+
+    def rechercher(self, nom: str, limite: int = 5) -> list:
+        """
+        Fournisseurs les plus proches de `nom`, du meilleur au moins bon.
+        Retourne une liste de tuples (fournisseur, score entre 0 et 1).
+        """
+        normalise = normaliser_nom(nom)
+        if not normalise:
+            return []
+        if normalise in self._exacts:
+            return [(self._exacts[normalise], 1.0)]
+
+        grammes = trigrammes(normalise)
+        communs = defaultdict(int)
+        for gramme in grammes:
+            for position in self._index.get(gramme, ()):
+                communs[position] += 1
+
+        scores = {}
+        for position, nb_communs in communs.items():
+            fournisseur, grammes_connus = self._noms[position]
+            score = 2 * nb_communs / (len(grammes) + len(grammes_connus))
+            # Un fournisseur peut être trouvé par son nom ou par son fournisseur associé
+            scores[fournisseur] = max(score, scores.get(fournisseur, 0.0))
+
+        classement = sorted(scores.items(), key=lambda candidat: (-candidat[1], candidat[0]))
+        return [(fournisseur, round(score, 3)) for fournisseur, score in classement[:limite]]
+
+
+class ResolveurFournisseurs:
+    """
+    Index des fournisseurs d'une base, chargé une fois puis reconstruit
+    après toute modification d'un fournisseur (ou à expiration).
+    """
+
+    def __init__(self, db_url: str, duree_vie: float = DUREE_VIE_INDEX_DEFAUT):
+        self.db_url = db_url
+        self.duree_vie = duree_vie
+        self._index = None
+        self._version = None
+        self._expiration = 0.0
+        self._verrou = threading.Lock()
+
+    def index(self) -> IndexFournisseurs:
+        with self._verrou:
+            version = version_fournisseurs()
+            if self._index is None or version != self._version or time.monotonic() > self._expiration:
+                self._index = IndexFournisseurs(get_tous_les_fournisseurs(self.db_url))
+                self._version = version
+                self._expiration = time.monotonic() + self.duree_vie
+            return self._index
+
+    def candidats(self, nom: str, limite: int = 5) -> list:
+        """Fournisseurs connus les plus proches de `nom`, avec leur score."""
+        return self.index().rechercher(nom, limite)
+
+    def resoudre(self, nom: str, seuil: float = SEUIL_RESOLUTION_DEFAUT):
+        """
+        Fournisseur connu correspondant à `nom` si la correspondance est sûre
+        (score au-dessus du seuil et nettement devant le suivant), sinon None.
+        """
+        candidats = self.candidats(nom, limite=2)
+        if not candidats or candidats[0][1] < seuil:
+            return None
+        if len(candidats) > 1 and candidats[0][1] - candidats[1][1] < ECART_RESOLUTION:
+            return None
+        return candidats[0][0]
+
+
+_resolveurs = {}
+_verrou_resolveurs = threading.Lock()
+
+
+def get_resolveur(db_url: str) -> ResolveurFournisseurs:
+    """
+    Retourne le résolveur partagé pour cette base (créé au premier appel).
+    Variable d'environnement : RESOLUTION_TTL (durée de vie de l'index, en secondes).
+    """
+    with _verrou_resolveurs:
+        if db_url not in _resolveurs:
+            _resolveurs[db_url] = ResolveurFournisseurs(
+                db_url, float(os.getenv("RESOLUTION_TTL", DUREE_VIE_INDEX_DEFAUT))
+            )
+        return _resolveurs[db_url]
+
+
+def seuil_resolution() -> float:
+    """Seuil de reconnaissance automatique (variable d'environnement RESOLUTION_SEUIL)."""
+    try:
+        return float(os.getenv("RESOLUTION_SEUIL", SEUIL_RESOLUTION_DEFAUT))
+    except ValueError:
+        return SEUIL_RESOLUTION_DEFAUT
+
+
+def reconnaitre_fournisseur(nom: str, db_url: str):
+    """
+    Fournisseur à retenir pour un nom lu sur une facture : le nom lui-même s'il est connu,
+    sinon le fournisseur connu reconnu par le résolveur (accents, forme juridique...).
+
+    :return: Tuple (fournisseur retenu, nom lu si un autre fournisseur a été reconnu, sinon None).
+    """
+    if not nom or not db_url or get_profil_fournisseur(nom, db_url) is not None:
+        return nom, None
+    nom_reconnu = get_resolveur(db_url).resoudre(nom, seuil_resolution())
+    if nom_reconnu:
+        return nom_reconnu, nom
+    return nom, None
@@ -0,0 +1,92 @@
+import os
+import time
+import threading
+from dotenv import load_dotenv
+from src.gestion_bdd import initialiser_bdd, bdd_est_disponible
+from src.appels_ia import initialisation_client_gemini
+
+
+# Intervalle entre deux vérifications de la base en arrière-plan (secondes)
+INTERVALLE_SANTE_DEFAUT = 30.0
+
+
+class Ressources:
+    """
+    Ressources partagées par toutes les sessions Streamlit du processus :
+    base initialisée une seule fois, client Gemini unique, état de santé de la base.
+
+    Un rerun ne fait plus aucun aller-retour réseau pour afficher la barre latérale :
+    la disponibilité de la base est vérifiée par un thread en arrière-plan.
+    """
+
+    def __init__(self, db_url: str, intervalle_sante: float = INTERVALLE_SANTE_DEFAUT):
+        self.db_url = db_url
+        self.intervalle_sante = intervalle_sante
+        self.bdd_initialisee = False
+        self.bdd_disponible = False
+        self.derniere_verification = None
+        self._client = None
+        self._verrou = threading.Lock()
+        self._surveillance = None
+
+    def _verifier_bdd(self):
+        """Vérifie la base (et l'initialise si ce n'est pas encore fait)."""
+        if not self.db_url:
+            return
+        if not self.bdd_initialisee:
+            self.bdd_initialisee = bool(initialiser_bdd(self.db_url))
+        disponible = self.bdd_initialisee and bdd_est_disponible(self.db_url)
+        with self._verrou:
+            self.bdd_disponible = disponible
+            self.derniere_verification = time.time()
+
+    def _boucle_surveillance(self):
+        while True:
+            time.sleep(self.intervalle_sante)
+            try:
+                self._verifier_bdd()
+            except Exception as e:
+                print(f"⚠️ Vérification de la base impossible : {e}")
+                with self._verrou:
+                    self.bdd_disponible = False
+
+    def demarrer(self):
+        """Première vérification (bloquante), puis surveillance en arrière-plan."""
+        self._verifier_bdd()
+        if self._surveillance is None and self.db_url:
+            self._surveillance = threading.Thread(target=self._boucle_surveillance, daemon=True)
+            self._surveillance.start()
+
+    def base_disponible(self) -> bool:
+        """Dernier état connu de la base (sans appel réseau)."""
+        with self._verrou:
+            return self.bdd_disponible
+
+    def client_gemini(self):
+        """Client Gemini partagé (créé au premier appel). Retourne None en cas d'échec."""
+        with self._verrou:
+            if self._client is None:
+                self._client = initialisation_client_gemini()
+            return self._client
+
+
+_ressources = None
+_verrou_ressources = threading.Lock()
+
+
+def get_ressources() -> Ressources:
+    """
+    Retourne les ressources partagées par le processus (créées au premier appel).
+    Variables d'environnement : DATABASE_URL, RESSOURCES_INTERVALLE_SANTE.
+    """
+    global _ressources
+    with _verrou_ressources:
+        if _ressources is None:
+            load_dotenv()
+            ressources = Ressources(
+                os.getenv("DATABASE_URL"),
+                float(os.getenv("RESSOURCES_INTERVALLE_SANTE", INTERVALLE_SANTE_DEFAUT)),
+            )
+            ressources.demarrer()
+            _ressources = ressources
+        return _ressources
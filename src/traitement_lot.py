@@ -0,0 +1,210 @@
+import os
+import uuid
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pypdf import PdfReader
+from google.genai import types
+from src.appels_ia import (
+    MODELE_GEMINI, obtenir_document, extraire_facture_complete,
+    prompt_extraction, config_extraction, lire_factures_extraites,
+)
+from src.cache_ia import get_cache_ia, calculer_cle_cache
+
+
+# Nombre de fichiers à partir duquel le mode lot est proposé
+SEUIL_MODE_LOT_DEFAUT = 20
+# Taille maximale d'un lot envoyé en ligne à l'API Batch de Gemini (octets)
+TAILLE_MAX_LOT_INLINE = 18 * 1024 * 1024
+# Parallélisme du traitement local quand l'API Batch n'est pas utilisable
+NB_WORKERS_LOCAL = 4
+
+ETATS_REUSSIS = {"JOB_STATE_SUCCEEDED", "JOB_STATE_PARTIALLY_SUCCEEDED"}
+ETATS_ECHOUES = {"JOB_STATE_FAILED", "JOB_STATE_CANCELLED", "JOB_STATE_EXPIRED"}
+
+# Lots traités en local : nom du lot -> {chemin: Future}
+_lots_locaux = {}
+_executeur_local = None
+_verrou_lots = threading.Lock()
+
+
+def seuil_mode_lot() -> int:
+    """Nombre de fichiers à partir duquel le mode lot est proposé (MODE_LOT_SEUIL)."""
+    return int(os.getenv("MODE_LOT_SEUIL", SEUIL_MODE_LOT_DEFAUT))
+
+
+def _lire_cache(cle: str):
+    cache = get_cache_ia()
+    return cache.lire(cle) if cache else None
+
+
+def _ecrire_cache(cle: str, resultat):
+    cache = get_cache_ia()
+    if cache:
+        cache.ecrire(cle, resultat)
+
+
+def _soumettre_local(chemins: list, client, nom_modele: str) -> str:
+    """Remplace l'API Batch par un pool de threads local (mêmes appels que le mode interactif)."""
+    global _executeur_local
+    nom = f"local-{uuid.uuid4().hex[:8]}"
+    with _verrou_lots:
+        if _executeur_local is None:
+            _executeur_local = ThreadPoolExecutor(max_workers=NB_WORKERS_LOCAL, thread_name_prefix="lot_local")
+        _lots_locaux[nom] = {
+            chemin: _executeur_local.submit(extraire_facture_complete, chemin, client, None, nom_modele)
+            for chemin in chemins
+        }
+    return nom
+
+
+def soumettre_lot(chemins: list, client, nom_modele: str = MODELE_GEMINI) -> dict:
+    """
+    Regroupe l'extraction combinée de tous les fichiers en un seul travail Gemini (API Batch).
+
+    Les fichiers déjà présents dans le cache IA ne sont pas renvoyés.
+    Si l'API Batch refuse le lot (taille, compte non éligible...), les extractions
+    sont lancées en local sur un pool de threads.
+
+    :return: Dictionnaire de suivi à passer à `etat_lot` et `recuperer_resultats_lot`.
+    """
+    suivi = {"nom": None, "mode": "cache", "modele": nom_modele, "chemins": [], "cles": {}, "resultats": {}}
+    requetes = []
+    taille_totale = 0
+
+    for chemin in chemins:
+        try:
+            nombre_pages = len(PdfReader(chemin).pages)
+            document = obtenir_document(chemin, client)
+            prompt = prompt_extraction(nombre_pages)
+            cle = calculer_cle_cache(document.pdf_bytes, prompt, None, nom_modele)
+
+            resultat = _lire_cache(cle)
+            if resultat is not None:
+                suivi["resultats"][chemin] = resultat
+                continue
+
+            partie = document.partie()
+            taille_totale += len(partie.inline_data.data) if partie.inline_data else len(partie.text or "")
+            requetes.append(types.InlinedRequest(
+                contents=[types.Content(role="user", parts=[types.Part.from_text(text=prompt), partie])],
+                config=config_extraction(False),
+                metadata={"fichier": os.path.basename(chemin)},
+            ))
+            suivi["chemins"].append(chemin)
+            suivi["cles"][chemin] = cle
+        except Exception as e:
+            # Le fichier sera analysé en mode interactif
+            print(f"⚠️ {chemin} exclu du lot : {e}")
+
+    if not requetes:
+        return suivi
+
+    if taille_totale <= TAILLE_MAX_LOT_INLINE:
+        try:
+            travail = client.batches.create(
+                model=nom_modele,
+                src=requetes,
+                config={"display_name": f"factures-{uuid.uuid4().hex[:8]}"},
+            )
+            suivi["nom"] = travail.name
+            suivi["mode"] = "gemini"
+            print(f"📦 Lot Gemini soumis : {travail.name} ({len(requetes)} fichiers)")
+            return suivi
+        except Exception as e:
+            print(f"⚠️ API Batch indisponible ({e}), traitement local du lot.")
+    else:
+        print(f"ℹ️ Lot trop volumineux pour l'API Batch ({taille_totale} octets), traitement local.")
+
+    suivi["nom"] = _soumettre_local(suivi["chemins"], client, nom_modele)
+    suivi["mode"] = "local"
+    return suivi
+
+
+def etat_lot(suivi: dict, client) -> str:
+    """
+    Retourne l'état du lot : "en_cours", "termine" ou "echec".
+    """
+    if suivi["mode"] == "cache":
+        return "termine"
+
+    if suivi["mode"] == "local":
+        with _verrou_lots:
+            futures = _lots_locaux.get(suivi["nom"], {})
+        return "termine" if all(f.done() for f in futures.values()) else "en_cours"
+
+    try:
+        travail = client.batches.get(name=suivi["nom"])
+    except Exception as e:
+        print(f"⚠️ Suivi du lot impossible : {e}")
+        return "en_cours"
+
+    etat = getattr(travail.state, "name", str(travail.state))
+    if etat in ETATS_REUSSIS:
+        return "termine"
+    if etat in ETATS_ECHOUES:
+        print(f"❌ Lot {suivi['nom']} terminé en échec : {etat}")
+        return "echec"
+    return "en_cours"
+
+
+def avancement_lot(suivi: dict, client) -> tuple:
+    """Retourne (nb_fichiers_traites, nb_fichiers_total) pour l'affichage."""
+    total = len(suivi["chemins"]) + len(suivi["resultats"])
+    if suivi["mode"] == "local":
+        with _verrou_lots:
+            futures = _lots_locaux.get(suivi["nom"], {})
+        return len(suivi["resultats"]) + sum(1 for f in futures.values() if f.done()), total
+    if suivi["mode"] == "gemini":
+        try:
+            stats = client.batches.get(name=suivi["nom"]).completion_stats
+            if stats is not None:
+                termines = (stats.successful_count or 0) + (stats.failed_count or 0)
+                return len(suivi["resultats"]) + termines, total
+        except Exception:
+            pass
+    return len(suivi["resultats"]), total
+
+
+def recuperer_resultats_lot(suivi: dict, client) -> dict:
+    """
+    Récupère les résultats d'un lot terminé.
+
+    :return: Dictionnaire {chemin: liste des factures extraites}. Les fichiers
+             absents (erreur, lot échoué) sont à traiter en mode interactif.
+             Les résultats sont aussi mémorisés dans le cache IA.
+    """
+    resultats = dict(suivi["resultats"])
+
+    if suivi["mode"] == "local":
+        with _verrou_lots:
+            futures = _lots_locaux.pop(suivi["nom"], {})
+        for chemin, future in futures.items():
+            try:
+                factures = future.result()
+                if factures is not None:
+                    resultats[chemin] = factures
+            except Exception as e:
+                print(f"⚠️ Extraction locale échouée pour {chemin} : {e}")
+
+    elif suivi["mode"] == "gemini":
+        try:
+            travail = client.batches.get(name=suivi["nom"])
+            reponses = (travail.dest.inlined_responses or []) if travail.dest else []
+        except Exception as e:
+            print(f"❌ Résultats du lot illisibles : {e}")
+            reponses = []
+
+        # Les réponses sont dans l'ordre des requêtes
+        for chemin, reponse in zip(suivi["chemins"], reponses):
+            if reponse.error or not reponse.response:
+                print(f"⚠️ Pas de résultat pour {chemin} : {reponse.error}")
+                continue
+            try:
+                factures = lire_factures_extraites(reponse.response.text)
+            except Exception as e:
+                print(f"⚠️ Réponse invalide pour {chemin} : {e}")
+                continue
+            resultats[chemin] = factures
+            _ecrire_cache(suivi["cles"][chemin], factures)
+
+    return resultats
@@ -0,0 +1,76 @@
+from datetime import date
+import pytest
+import src.gestion_bdd as gestion_bdd
+from src.gestion_bdd import (
+    initialiser_bdd, ajouter_fournisseur_db, get_profil_fournisseur, update_fournisseur_full,
+    ajouter_ecritures_comptables, rechercher_ecritures, rechercher_fournisseurs, update_ecriture,
+    CacheProfils,
+)
+from src.migrations import version_cible
+
+
+@pytest.fixture
+def db_url(tmp_path, monkeypatch):
+    monkeypatch.setattr(gestion_bdd, "_cache_profils", CacheProfils())
+    db_url = f"sqlite:///{tmp_path / 'comptabilite.db'}"
+    assert initialiser_bdd(db_url)
+    return db_url
+
+# ----------------------------
+# Test de la base SQLite locale
+# ----------------------------
+def test_schema_a_jour(db_url):
+    conn = gestion_bdd.get_db_connection(db_url)
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT MAX(version) FROM schema_version")
+        assert cursor.fetchone()[0] == version_cible()
+        cursor.execute("PRAGMA journal_mode")
+        assert cursor.fetchone()[0] == "wal"
+    finally:
+        gestion_bdd.rendre_connexion(conn)
+
+def test_fournisseur_et_regles(db_url):
+    assert ajouter_fournisseur_db("Électricité Lyon", "EDF", "A", [("606100", "Total TTC"), ("445660", "TVA")], db_url)
+
+    profil = get_profil_fournisseur("électricité lyon", db_url)
+    assert profil["associations"] == [("606100", "Total TTC"), ("445660", "TVA")]
+
+    assert update_fournisseur_full("Électricité Lyon", {
+        "fournisseur": "Électricité Lyon", "fournisseur_associe": "EDF", "mode": "M",
+        "associations": [("606100", "Total HT")],
+    }, db_url)
+    profil = get_profil_fournisseur("Électricité Lyon", db_url)
+    assert profil["mode"] == "M"
+    assert profil["associations"] == [("606100", "Total HT")]
+
+    trouve = rechercher_fournisseurs("electricite lyom", db_url)[0]
+    assert trouve["fournisseur"] == "Électricité Lyon"
+    assert trouve["associations"] == [("606100", "Total HT")]
+
+def test_journal_recherche_et_pagination(db_url):
+    ids = ajouter_ecritures_comptables([
+        {"compte": "1/25", "date_facture": date(2025, 9, 29), "fournisseur": "BRUNEAU", "montant": 26.42, "nom_fichier": "a.pdf"},
+        {"compte": "1/144", "date_facture": date(2025, 10, 1), "fournisseur": "LYRECO", "montant": 80, "nom_fichier": "b.pdf"},
+        {"compte": "1/25", "date_facture": None, "fournisseur": "BRUNEAU", "montant": 10, "nom_fichier": "c_50%.pdf"},
+    ], db_url)
+    assert len(ids) == 3
+
+    page, curseur = rechercher_ecritures(db_url, tri="compte_asc", limite=2)
+    assert [e["id"] for e in page] == [ids[0], ids[2]]
+    page, curseur = rechercher_ecritures(db_url, tri="compte_asc", apres=curseur, limite=2)
+    assert [e["id"] for e in page] == [ids[1]] and curseur is None
+
+    # Texte exact en tête, puis les écritures approchantes
+    assert rechercher_ecritures(db_url, recherche="29/09/2025", tri="pertinence")[0][0]["id"] == ids[0]
+    assert rechercher_ecritures(db_url, recherche="50%", tri="pertinence")[0][0]["id"] == ids[2]
+    # Faute de frappe : retrouvée par similarité
+    assert {e["id"] for e in rechercher_ecritures(db_url, recherche="bruneua")[0]} == {ids[0], ids[2]}
+    premiere, curseur = rechercher_ecritures(db_url, recherche="bruneua", tri="pertinence", limite=1)
+    suivante, curseur = rechercher_ecritures(db_url, recherche="bruneua", tri="pertinence", apres=curseur, limite=1)
+    assert {premiere[0]["id"], suivante[0]["id"]} == {ids[0], ids[2]} and curseur is None
+    assert rechercher_ecritures(db_url, tri="date_desc")[0][0]["date_facture"] == date(2025, 10, 1)
+
+    # L'index de recherche suit les modifications
+    assert update_ecriture(ids[1], {"fournisseur": "OFFICE DEPOT"}, db_url)
+    assert [e["id"] for e in rechercher_ecritures(db_url, recherche="depot")[0]] == [ids[1]]
@@ -0,0 +1,56 @@
+import os
+import tempfile
+from src.cache_ia import CacheIA, calculer_cle_cache
+
+# ----------------------------
+# Test de calculer_cle_cache
+# ----------------------------
+def test_cle_cache_depend_du_contenu_et_de_la_demande():
+    cle = calculer_cle_cache(b"%PDF-1", "prompt", [["606", "total HT"]], "gemini-2.5-flash")
+
+    # Mêmes entrées -> même clé
+    assert cle == calculer_cle_cache(b"%PDF-1", "prompt", [["606", "total HT"]], "gemini-2.5-flash")
+
+    # Chaque composant change la clé
+    assert cle != calculer_cle_cache(b"%PDF-2", "prompt", [["606", "total HT"]], "gemini-2.5-flash")
+    assert cle != calculer_cle_cache(b"%PDF-1", "autre", [["606", "total HT"]], "gemini-2.5-flash")
+    assert cle != calculer_cle_cache(b"%PDF-1", "prompt", [["607", "total HT"]], "gemini-2.5-flash")
+    assert cle != calculer_cle_cache(b"%PDF-1", "prompt", [["606", "total HT"]], "gemini-2.5-pro")
+
+# ----------------------------
+# Test de CacheIA
+# ----------------------------
+def test_cache_lecture_ecriture_et_compteurs():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        cache = CacheIA(chemin=os.path.join(tmpdir, "cache.sqlite3"))
+
+        assert cache.lire("absente") is None
+
+        # Les tuples et listes de dictionnaires sont restitués à l'identique
+        cache.ecrire("tuple", ("BRUNEAU", "29/09/2025"))
+        cache.ecrire("liste", [{"nom_fournisseur": "BRUNEAU", "page_debut": 1}])
+        assert cache.lire("tuple") == ("BRUNEAU", "29/09/2025")
+        assert cache.lire("liste") == [{"nom_fournisseur": "BRUNEAU", "page_debut": 1}]
+
+        stats = cache.statistiques()
+        assert stats["hits"] == 2
+        assert stats["misses"] == 1
+        assert stats["entrees"] == 2
+
+def test_cache_eviction_par_age():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        cache = CacheIA(chemin=os.path.join(tmpdir, "cache.sqlite3"), duree_max_secondes=-1)
+        cache.ecrire("cle", ("A", "B"))
+
+        # Une entrée trop vieille n'est jamais restituée
+        assert cache.lire("cle") is None
+
+def test_cache_eviction_par_taille():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        cache = CacheIA(chemin=os.path.join(tmpdir, "cache.sqlite3"), taille_max_octets=50)
+        cache.ecrire("ancienne", "x" * 30)
+        cache.ecrire("recente", "y" * 30)
+
+        # La plus ancienne est supprimée pour respecter la taille maximale
+        assert cache.lire("ancienne") is None
+        assert cache.lire("recente") == "y" * 30
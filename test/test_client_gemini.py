@@ -0,0 +1,122 @@
+import io
+import pytest
+from types import SimpleNamespace
+from google.genai.errors import APIError
+import src.client_gemini as client_gemini
+from src.client_gemini import ClientGeminiFiable, Disjoncteur, DisjoncteurOuvert, SeauJetons
+
+
+class FauxModeles:
+    """Simule `client.models` : lève les erreurs données, puis répond."""
+    def __init__(self, erreurs):
+        self.erreurs = list(erreurs)
+        self.appels = 0
+
+    def generate_content(self, **kwargs):
+        self.appels += 1
+        if self.erreurs:
+            raise self.erreurs.pop(0)
+        return SimpleNamespace(text="ok", usage_metadata=None)
+
+
+class FauxFichiers:
+    """Simule `client.files` : le téléversement lit le fichier, lève les erreurs données, puis répond."""
+    def __init__(self, erreurs):
+        self.erreurs = list(erreurs)
+        self.lus = []
+
+    def upload(self, file, config=None):
+        self.lus.append(file.read())
+        if self.erreurs:
+            raise self.erreurs.pop(0)
+        return SimpleNamespace(name="files/1", state="ACTIVE")
+
+
+def faux_client(erreurs, disjoncteur=None, erreurs_fichiers=()):
+    modeles = FauxModeles(erreurs)
+    fichiers = FauxFichiers(erreurs_fichiers)
+    client = ClientGeminiFiable(SimpleNamespace(models=modeles, files=fichiers, version="v1"), rpm=1000, tpm=1_000_000,
+                                max_tentatives=3, disjoncteur=disjoncteur or Disjoncteur(seuil_echecs=10))
+    return client, modeles
+
+
+@pytest.fixture(autouse=True)
+def sans_attente(monkeypatch):
+    monkeypatch.setattr(client_gemini.time, "sleep", lambda _: None)
+
+# ----------------------------
+# Test des nouvelles tentatives
+# ----------------------------
+def test_nouvelle_tentative_sur_quota():
+    client, modeles = faux_client([APIError(429, {}), APIError(503, {})])
+
+    assert client.models.generate_content(model="m", contents=["prompt"]).text == "ok"
+    assert modeles.appels == 3
+
+def test_pas_de_nouvelle_tentative_sur_erreur_client():
+    client, modeles = faux_client([APIError(400, {})])
+
+    with pytest.raises(APIError):
+        client.models.generate_content(model="m", contents=["prompt"])
+    assert modeles.appels == 1
+
+def test_televersement_protege():
+    client, _ = faux_client([], erreurs_fichiers=[APIError(429, {})])
+
+    # Nouvelle tentative sur quota, fichier relu depuis le début
+    assert client.files.upload(file=io.BytesIO(b"%PDF"), config={}).name == "files/1"
+    assert client.client.files.lus == [b"%PDF", b"%PDF"]
+
+    # Les échecs du téléversement comptent pour le disjoncteur
+    disjoncteur = Disjoncteur(seuil_echecs=1, duree_ouverture=60)
+    client, _ = faux_client([], disjoncteur=disjoncteur, erreurs_fichiers=[APIError(503, {})])
+    with pytest.raises(DisjoncteurOuvert):
+        client.files.upload(file=io.BytesIO(b"%PDF"))
+    assert disjoncteur.est_ouvert()
+
+def test_acces_direct_au_client_d_origine():
+    client, _ = faux_client([])
+    assert client.version == "v1"
+
+# ----------------------------
+# Test du disjoncteur
+# ----------------------------
+def test_disjoncteur_suspend_les_appels():
+    disjoncteur = Disjoncteur(seuil_echecs=2, duree_ouverture=60)
+    client, modeles = faux_client([APIError(429, {})] * 3, disjoncteur=disjoncteur)
+
+    # Deux échecs consécutifs ouvrent le circuit : la 3e tentative n'est pas envoyée
+    with pytest.raises(DisjoncteurOuvert):
+        client.models.generate_content(model="m", contents=["prompt"])
+    assert modeles.appels == 2
+    assert disjoncteur.est_ouvert()
+
+# ----------------------------
+# Test du seau de jetons
+# ----------------------------
+def test_seau_de_jetons_attend_la_recharge(monkeypatch):
+    attentes = []
+    monkeypatch.setattr(client_gemini.time, "sleep", lambda s: attentes.append(s))
+    seau = SeauJetons(capacite=60) # 1 jeton par seconde
+
+    seau.acquerir(60)
+    seau._derniere_maj -= 1 # Une seconde s'est écoulée : 1 jeton rechargé
+    seau.acquerir(1)
+    assert attentes == []
+
+def test_disjoncteur_un_seul_appel_d_essai():
+    disjoncteur = Disjoncteur(seuil_echecs=1, duree_ouverture=60)
+    disjoncteur.signaler_echec()
+    disjoncteur._ouvert_jusqua = 0.0 # Fin de la pause
+
+    disjoncteur.autoriser() # Appel d'essai
+    with pytest.raises(DisjoncteurOuvert):
+        disjoncteur.autoriser() # Les autres attendent son résultat
+    disjoncteur.signaler_echec()
+    assert disjoncteur.est_ouvert() # Essai en échec : nouvelle pause
+
+    disjoncteur._ouvert_jusqua = 0.0
+    disjoncteur.autoriser()
+    disjoncteur.signaler_succes()
+    disjoncteur.autoriser()
+    disjoncteur.autoriser() # Circuit refermé
@@ -0,0 +1,61 @@
+import pytest
+from datetime import date
+from src.gestion_bdd import initialiser_bdd, ajouter_ecritures_comptables
+from src.cache_ia import calculer_empreinte
+from src.doublons_factures import cle_facture, fichiers_deja_traites, factures_deja_traitees, empreinte_facture
+
+ECRITURE = {"compte": "606100", "date_facture": date(2025, 9, 29), "fournisseur": "BRUNEAU", "montant": 1234.5, "nom_fichier": "BRUNEAU_29-09-2025.pdf"}
+INFOS = {"nom_fournisseur": "Bruneau S.A.S.", "numero_facture": "FA 2025-118", "date_facture": "29/09/2025", "montant_total": "1 234,50 €"}
+
+
+@pytest.fixture
+def db_url(tmp_path):
+    db_url = f"sqlite:///{tmp_path / 'comptabilite.db'}"
+    assert initialiser_bdd(db_url)
+    return db_url
+
+# ----------------------------
+# Test de la détection des factures déjà traitées
+# ----------------------------
+def test_cle_facture():
+    assert cle_facture(INFOS) == "BRUNEAU|FA2025118|2025-09-29|1234.50"
+    # Même facture relue autrement (casse, ponctuation, format du montant)
+    assert cle_facture({**INFOS, "nom_fournisseur": "BRUNEAU", "numero_facture": "fa2025-118", "montant_total": "1234.5 EUR"}) == cle_facture(INFOS)
+    assert cle_facture({**INFOS, "numero_facture": ""}) is None
+
+def test_fichier_et_facture_deja_traites(db_url, tmp_path):
+    fichier = tmp_path / "upload_facture.pdf"
+    fichier.write_bytes(b"%PDF-1.4 facture")
+    assert fichiers_deja_traites([calculer_empreinte(b"%PDF-1.4 facture")], db_url) == {}
+
+    # Écriture refusée : l'empreinte, dans la même transaction, n'est pas enregistrée non plus
+    empreinte = empreinte_facture(str(fichier), INFOS, "BRUNEAU_29-09-2025.pdf")
+    assert ajouter_ecritures_comptables([dict(ECRITURE, montant=object())], db_url, [empreinte]) is None
+    assert ajouter_ecritures_comptables([ECRITURE], db_url, [empreinte])
+
+    # Même fichier redéposé : reconnu avant toute analyse
+    deja_traites = fichiers_deja_traites([calculer_empreinte(b"%PDF-1.4 facture"), calculer_empreinte(b"autre")], db_url)
+    assert list(deja_traites) == [calculer_empreinte(b"%PDF-1.4 facture")]
+    assert deja_traites[calculer_empreinte(b"%PDF-1.4 facture")][0]["nom_fichier"] == "BRUNEAU_29-09-2025.pdf"
+
+    # Facture rescannée (autre fichier) : reconnue par ses valeurs extraites
+    autre_facture = {**INFOS, "numero_facture": "FA 2025-119"}
+    assert list(factures_deja_traitees([autre_facture, {**INFOS, "nom_fournisseur": "Bruneau"}], db_url)) == [1]
+
+    # La clé est unique : une seconde validation ne crée pas de doublon
+    assert ajouter_ecritures_comptables([], db_url, [empreinte]) == []
+    assert len(fichiers_deja_traites([calculer_empreinte(b"%PDF-1.4 facture")], db_url)[calculer_empreinte(b"%PDF-1.4 facture")]) == 1
+
+def test_fichier_partiellement_traite(db_url, tmp_path):
+    fichier = tmp_path / "upload_lot.pdf"
+    fichier.write_bytes(b"%PDF-1.4 deux factures")
+    empreinte = calculer_empreinte(b"%PDF-1.4 deux factures")
+    factures = [{**INFOS, "nb_factures_source": 2}, {**INFOS, "numero_facture": "FA 2025-119", "nb_factures_source": 2}]
+
+    # Une seule des deux factures validée : le fichier est analysé à nouveau, seule la facture connue est écartée
+    assert ajouter_ecritures_comptables([ECRITURE], db_url, [empreinte_facture(str(fichier), factures[0], "a.pdf")])
+    assert fichiers_deja_traites([empreinte], db_url) == {}
+    assert list(factures_deja_traitees(factures, db_url)) == [0]
+
+    assert ajouter_ecritures_comptables([ECRITURE], db_url, [empreinte_facture(str(fichier), factures[1], "b.pdf")])
+    assert len(fichiers_deja_traites([empreinte], db_url)[empreinte]) == 2
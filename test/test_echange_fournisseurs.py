@@ -0,0 +1,55 @@
+import pytest
+import src.gestion_bdd as gestion_bdd
+from src.gestion_bdd import initialiser_bdd, ajouter_fournisseur_db, importer_fournisseurs_db, get_profil_fournisseur, CacheProfils
+from src.echange_fournisseurs import (
+    lire_fichier_fournisseurs, valider_fournisseurs, comparer_fournisseurs, exporter_fournisseurs,
+)
+
+CSV_IMPORT = """fournisseur;fournisseur_associe;mode;compte;regle
+bruneau;;A;606400;Total HT
+bruneau;;A;445660;TVA
+LYRECO;;M;;
+""".encode("utf-8")
+
+
+@pytest.fixture
+def db_url(tmp_path, monkeypatch):
+    monkeypatch.setattr(gestion_bdd, "_cache_profils", CacheProfils())
+    db_url = f"sqlite:///{tmp_path / 'comptabilite.db'}"
+    assert initialiser_bdd(db_url)
+    assert ajouter_fournisseur_db("BRUNEAU", None, "A", [("606400", "Total HT")], db_url)
+    return db_url
+
+# ----------------------------
+# Test de l'import / export des fournisseurs
+# ----------------------------
+def test_validation():
+    lignes = lire_fichier_fournisseurs(CSV_IMPORT + b"EDF;;X;606100;\n;;A;606100;\nBruneau;;M;606100;\n", "f.csv")
+    fournisseurs, erreurs = valider_fournisseurs(lignes)
+
+    assert [f["fournisseur"] for f in fournisseurs] == ["bruneau", "LYRECO"]
+    assert fournisseurs[0]["associations"] == [("606400", "Total HT"), ("445660", "TVA")]
+    assert erreurs == [
+        "Ligne 5 : mode « X » invalide pour EDF (A ou M attendu)",
+        "Ligne 6 : nom du fournisseur manquant",
+        "Ligne 7 : fournisseur associé ou mode différent des lignes précédentes pour Bruneau",
+    ]
+
+def test_simulation_puis_import(db_url):
+    fournisseurs, _ = valider_fournisseurs(lire_fichier_fournisseurs(CSV_IMPORT, "f.csv"))
+
+    differences = comparer_fournisseurs(fournisseurs, db_url)
+    assert differences["crees"] == ["LYRECO"]
+    assert [d["fournisseur"] for d in differences["modifies"]] == ["BRUNEAU"]
+    assert get_profil_fournisseur("LYRECO", db_url) is None # Rien n'est écrit par la simulation
+
+    assert importer_fournisseurs_db(fournisseurs, db_url) == 2
+    # Nom existant conservé malgré la casse du fichier
+    assert get_profil_fournisseur("BRUNEAU", db_url)["associations"] == [("606400", "Total HT"), ("445660", "TVA")]
+    assert get_profil_fournisseur("LYRECO", db_url)["mode"] == "M"
+
+    # L'export relu donne les mêmes fournisseurs
+    for format_export in ("csv", "xlsx"):
+        relus, erreurs = valider_fournisseurs(lire_fichier_fournisseurs(exporter_fournisseurs(db_url, format_export), f"f.{format_export}"))
+        assert not erreurs
+        assert comparer_fournisseurs(relus, db_url)["inchanges"] == ["BRUNEAU", "LYRECO"]
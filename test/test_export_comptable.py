@@ -0,0 +1,64 @@
+import io
+import os
+from datetime import date
+import pytest
+from openpyxl import load_workbook
+from src.gestion_bdd import initialiser_bdd, ajouter_ecritures_comptables
+from src.export_comptable import exporter_ecritures, preparer_export, COLONNES_FEC
+
+
+@pytest.fixture
+def db_url(tmp_path):
+    db_url = f"sqlite:///{tmp_path / 'comptabilite.db'}"
+    assert initialiser_bdd(db_url)
+    ajouter_ecritures_comptables([
+        {"compte": "606100", "date_facture": date(2025, 9, 29), "fournisseur": "BRUNEAU", "montant": 20.5, "nom_fichier": "a.pdf"},
+        {"compte": "445660", "date_facture": date(2025, 9, 29), "fournisseur": "BRUNEAU", "montant": 4.1, "nom_fichier": "a.pdf"},
+        {"compte": "606400", "date_facture": date(2025, 10, 2), "fournisseur": "LYRECO", "montant": 80, "nom_fichier": "b.pdf"},
+    ], db_url)
+    return db_url
+
+# ----------------------------
+# Test de l'export comptable
+# ----------------------------
+def test_fec_equilibre_par_facture(db_url):
+    destination = io.BytesIO()
+    assert exporter_ecritures(db_url, "fec", destination) == 3
+
+    lignes = [ligne.split("\t") for ligne in destination.getvalue().decode("utf-8").splitlines()]
+    assert lignes[0] == COLONNES_FEC
+    facture = [l for l in lignes[1:] if l[2] == "1"]
+    assert [(l[4], l[11], l[12]) for l in facture] == [
+        ("606100", "20,50", "0,00"), ("445660", "4,10", "0,00"), ("401000", "0,00", "24,60"),
+    ]
+    assert facture[0][3] == "20250929"
+    assert len(lignes) == 1 + 3 + 2
+
+def test_filtres_csv_et_xlsx(db_url):
+    destination = io.BytesIO()
+    assert exporter_ecritures(db_url, "csv", destination, comptes=["606"]) == 2
+    texte = destination.getvalue().decode("utf-8-sig")
+    assert texte.splitlines()[1].startswith("29/09/2025;BRUNEAU;606100;20,50;a.pdf")
+    # Préfixe saisi : _ et % ne sont pas des jokers
+    assert exporter_ecritures(db_url, "csv", io.BytesIO(), comptes=["60_", "%"]) == 0
+
+    destination = io.BytesIO()
+    assert exporter_ecritures(db_url, "xlsx", destination, date_min=date(2025, 10, 1)) == 1
+    feuille = load_workbook(destination).active
+    assert [cellule.value for cellule in feuille[2]][1:4] == ["LYRECO", "606400", 80]
+
+def test_export_ecrit_sur_disque(db_url, tmp_path):
+    dossier = tmp_path / "exports"
+    ancien = preparer_export(db_url, "csv", "ancien.csv", dossier=dossier)
+    os.utime(dossier / ancien.split("/")[-2], (0, 0)) # Export périmé
+
+    url = preparer_export(db_url, "fec", "ecritures.txt", dossier=dossier)
+    assert url.startswith("app/static/exports/") and url.endswith("/ecritures.txt")
+    jeton = url.split("/")[-2]
+    assert (dossier / jeton / "ecritures.txt").read_text(encoding="utf-8").startswith("JournalCode")
+    # Les exports de plus de DUREE_VIE_EXPORT secondes sont supprimés
+    assert [p.name for p in dossier.iterdir()] == [jeton]
+
+    # Erreur : pas d'adresse, et rien ne reste sur disque
+    assert preparer_export(db_url, "pdf", "ecritures.pdf", dossier=dossier) is None
+    assert [p.name for p in dossier.iterdir()] == [jeton]
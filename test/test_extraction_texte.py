@@ -0,0 +1,45 @@
+import fitz  # PyMuPDF
+from pathlib import Path
+from src.extraction_texte import extraire_couche_texte, couche_texte_exploitable
+
+DOSSIER_TEST = Path(__file__).resolve().parent.parent / "data" / "fichiers_test"
+
+# ----------------------------
+# Test de extraire_couche_texte
+# ----------------------------
+def test_pdf_numerique_donne_du_texte():
+    pdf_bytes = (DOSSIER_TEST / "bruneau.pdf").read_bytes()
+    texte = extraire_couche_texte(pdf_bytes, avec_positions=False)
+
+    assert texte is not None
+    assert texte.startswith("--- Page 1 ---")
+    assert "26,42" in texte
+
+    # Le texte envoyé est bien plus léger que le PDF
+    assert len(texte.encode("utf-8")) < len(pdf_bytes)
+
+def test_pdf_numerique_avec_positions():
+    pdf_bytes = (DOSSIER_TEST / "bruneau.pdf").read_bytes()
+    texte = extraire_couche_texte(pdf_bytes, avec_positions=True)
+
+    assert texte is not None
+    # Chaque bloc est précédé de ses coordonnées [x,y]
+    assert texte.splitlines()[1].startswith("[")
+
+def test_pdf_sans_texte_renvoie_none():
+    # Une page blanche se comporte comme un scan : pas de couche texte
+    doc = fitz.open()
+    doc.new_page()
+    pdf_bytes = doc.tobytes()
+    doc.close()
+
+    assert extraire_couche_texte(pdf_bytes) is None
+
+# ----------------------------
+# Test de couche_texte_exploitable
+# ----------------------------
+def test_couche_texte_illisible():
+    assert not couche_texte_exploitable([])
+    assert not couche_texte_exploitable(["trop court"])
+    assert not couche_texte_exploitable(["�" * 100])
+    assert couche_texte_exploitable(["FACTURE N° 26.471.063 DU 29 septembre 2025, total TTC 26,42"])
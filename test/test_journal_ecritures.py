@@ -0,0 +1,104 @@
+from datetime import date
+from decimal import Decimal
+from src.gestion_bdd import initialiser_bdd, ajouter_ecritures_comptables, rechercher_ecritures
+from src.journal_ecritures import JournalEcritures
+
+ECRITURES = [
+    {"compte": "606100", "date_facture": date(2025, 9, 29), "fournisseur": "BRUNEAU", "montant": 20.0, "nom_fichier": "a.pdf"},
+    {"compte": "445660", "date_facture": date(2025, 9, 29), "fournisseur": "BRUNEAU", "montant": 4.0, "nom_fichier": "a.pdf"},
+]
+
+
+class FausseBase:
+    """
+    Remplace ajouter_ecritures_comptables : indisponible tant que `disponible` est faux,
+    et refuse les lots contenant une écriture du fournisseur `refuse`.
+    """
+    def __init__(self):
+        self.disponible = False
+        self.refuse = None
+        self.lignes = []
+
+    def enregistrer(self, ecritures, db_url, empreintes=None):
+        if not self.disponible or any(e["fournisseur"] == self.refuse for e in ecritures):
+            return None
+        self.lignes.extend(ecritures)
+        return list(range(len(ecritures)))
+
+    def est_disponible(self, db_url):
+        return self.disponible
+
+# ----------------------------
+# Test du journal des écritures
+# ----------------------------
+def test_ecritures_conservees_tant_que_la_base_est_injoignable(tmp_path):
+    base = FausseBase()
+    journal = JournalEcritures(str(tmp_path / "journal.sqlite3"), tentatives_max=2,
+                               enregistrer=base.enregistrer, disponible=base.est_disponible)
+
+    cle = journal.ajouter(ECRITURES, "db")
+    for _ in range(3):
+        assert journal.vider() == 1
+    # Base injoignable : la facture n'est jamais mise de côté
+    assert journal.etat() == {"en_attente": 1, "en_echec": 1, "rejetees": 0}
+
+    base.disponible = True
+    assert journal.vider() == 0
+    assert journal.etat()["en_attente"] == 0
+    assert [e["cle_idempotence"] for e in base.lignes] == [f"{cle}-0", f"{cle}-1"]
+    assert base.lignes[0]["date_facture"] == date(2025, 9, 29)
+    assert base.lignes[0]["montant"] == Decimal("20.0")
+
+def test_facture_refusee_mise_de_cote(tmp_path):
+    base = FausseBase()
+    base.disponible, base.refuse = True, "REFUSE"
+    journal = JournalEcritures(str(tmp_path / "journal.sqlite3"), tentatives_max=2,
+                               enregistrer=base.enregistrer, disponible=base.est_disponible)
+
+    journal.ajouter([dict(ECRITURES[0], fournisseur="REFUSE")], "db")
+    journal.ajouter(ECRITURES, "db")
+    assert journal.vider() == 1 # Lot refusé : la facture valide passe seule
+    assert len(base.lignes) == 2
+    assert journal.vider() == 1
+    assert journal.vider() == 0 # Deux refus : plus de nouvel essai automatique
+    assert journal.etat() == {"en_attente": 0, "en_echec": 0, "rejetees": 1}
+
+    rejetee = journal.factures_rejetees()[0]
+    assert (rejetee["fournisseur"], rejetee["montant"]) == ("REFUSE", Decimal("20.0"))
+
+    base.refuse = None
+    journal.relancer(rejetee["id"])
+    assert journal.vider() == 0
+    assert journal.etat()["rejetees"] == 0 and len(base.lignes) == 3
+
+def test_apprentissage_apres_envoi(tmp_path):
+    base = FausseBase()
+    appris = []
+    def apprendre(fournisseur, pdf, valeurs, regles, db_url):
+        with open(pdf, "rb") as f:
+            appris.append((fournisseur, f.read(), valeurs, regles))
+    journal = JournalEcritures(str(tmp_path / "journal" / "journal.sqlite3"), enregistrer=base.enregistrer,
+                               disponible=base.est_disponible, apprendre=apprendre)
+    facture = tmp_path / "facture.pdf"
+    facture.write_bytes(b"%PDF")
+
+    journal.ajouter(ECRITURES, "db", apprentissage={"fournisseur": "BRUNEAU", "pdf": str(facture), "valeurs": [("606100", Decimal("20.00"))],
+                                               "regles": [("606100", "Total HT")]})
+    facture.unlink() # Fichier temporaire supprimé avant l'envoi : la copie du journal suffit
+    journal.vider()
+    assert appris == [] # Rien n'est appris tant que les écritures ne sont pas en base
+
+    base.disponible = True
+    journal.vider()
+    assert appris == [("BRUNEAU", b"%PDF", [("606100", "20.00")], [("606100", "Total HT")])]
+    assert not list((tmp_path / "journal" / "pdf").iterdir())
+
+def test_renvoi_sans_doublon(tmp_path):
+    db_url = f"sqlite:///{tmp_path / 'comptabilite.db'}"
+    assert initialiser_bdd(db_url)
+    ecritures = [dict(e, cle_idempotence=f"facture-{i}") for i, e in enumerate(ECRITURES)]
+
+    assert len(ajouter_ecritures_comptables(ecritures, db_url)) == 2
+    # Réponse perdue puis lot renvoyé : rien n'est ajouté
+    assert ajouter_ecritures_comptables(ecritures, db_url) == []
+    assert len(rechercher_ecritures(db_url)[0]) == 2
@@ -0,0 +1,54 @@
+import src.migrations as migrations
+from src.migrations import appliquer_migrations, version_cible
+
+
+class FausseBase:
+    """Connexion simulée : enregistre les instructions, mémorise les versions insérées."""
+    def __init__(self, version_actuelle=0):
+        self.version_actuelle = version_actuelle
+        self.instructions = []
+        self.commits = 0
+
+    def cursor(self):
+        return self
+
+    def execute(self, requete, parametres=None):
+        self.instructions.append(" ".join(requete.split()))
+        if requete.startswith("INSERT INTO schema_version"):
+            self.version_actuelle = parametres[0]
+
+    def fetchone(self):
+        return (self.version_actuelle,)
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        pass
+
+# ----------------------------
+# Test des migrations
+# ----------------------------
+def test_base_vide_migree_jusqua_la_derniere_version():
+    base = FausseBase()
+
+    assert appliquer_migrations(base) == version_cible()
+    assert base.instructions[0].startswith("SELECT pg_advisory_lock")
+    assert base.instructions[-1].startswith("SELECT pg_advisory_unlock")
+
+def test_seules_les_nouvelles_migrations_sont_appliquees(monkeypatch):
+    monkeypatch.setattr(migrations, "MIGRATIONS", [
+        (1, "ancienne", ["CREATE TABLE a (x INT)"]),
+        (2, "nouvelle", ["CREATE TABLE b (x INT)"]),
+    ])
+    base = FausseBase(version_actuelle=1)
+
+    assert appliquer_migrations(base) == 2
+    assert "CREATE TABLE a (x INT)" not in base.instructions
+    assert "CREATE TABLE b (x INT)" in base.instructions
+
+def test_base_a_jour_sans_ddl():
+    base = FausseBase(version_actuelle=version_cible())
+    appliquer_migrations(base)
+
+    assert not any(i.startswith(("ALTER", "CREATE INDEX")) for i in base.instructions)
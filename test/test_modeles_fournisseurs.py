@@ -0,0 +1,71 @@
+from decimal import Decimal
+from pathlib import Path
+from src.gestion_bdd import initialiser_bdd, get_modele_extraction
+from src.modeles_fournisseurs import (
+    convertir_montant, apprendre_modele, appliquer_modele, imputations_par_modele, enregistrer_validation,
+)
+
+DOSSIER_TEST = Path(__file__).resolve().parent.parent / "data" / "fichiers_test"
+
+# ----------------------------
+# Test de convertir_montant
+# ----------------------------
+def test_convertir_montant_formats_courants():
+    assert convertir_montant("26,42") == Decimal("26.42")
+    assert convertir_montant("26.42") == Decimal("26.42")
+    assert convertir_montant("1 234,56 €") == Decimal("1234.56")
+    assert convertir_montant("1.234,56") == Decimal("1234.56")
+    assert convertir_montant("1,234.56") == Decimal("1234.56")
+    assert convertir_montant("-2,48") == Decimal("-2.48")
+    assert convertir_montant("") is None
+    assert convertir_montant("Erreur") is None
+
+# ----------------------------
+# Test de apprendre_modele / appliquer_modele
+# ----------------------------
+def test_modele_appris_retrouve_les_montants():
+    pdf_bytes = (DOSSIER_TEST / "bruneau.pdf").read_bytes()
+
+    # Montants validés par l'utilisateur sur la facture Bruneau
+    modele = apprendre_modele(pdf_bytes, [("606", "26,42"), ("445", "4.40")])
+    assert modele is not None
+    assert set(modele) == {"606", "445"}
+
+    # Appliqué sur la même mise en page, le modèle retrouve les montants sans IA
+    resultats = appliquer_modele(modele, pdf_bytes)
+    assert convertir_montant(resultats["606"]) == Decimal("26.42")
+    assert convertir_montant(resultats["445"]) == Decimal("4.40")
+
+def test_modele_montant_introuvable():
+    pdf_bytes = (DOSSIER_TEST / "bruneau.pdf").read_bytes()
+    assert apprendre_modele(pdf_bytes, [("606", "999,99")]) is None
+
+def test_modele_autre_mise_en_page():
+    modele = apprendre_modele((DOSSIER_TEST / "bruneau.pdf").read_bytes(), [("606", "26,42")])
+
+    # Sur une facture d'un autre fournisseur, le contrôle de confiance échoue
+    assert appliquer_modele(modele, (DOSSIER_TEST / "recre.pdf").read_bytes()) is None
+
+# ----------------------------
+# Test du modèle appris en base
+# ----------------------------
+def test_modele_ignore_apres_changement_de_regle(tmp_path):
+    db_url = f"sqlite:///{tmp_path / 'comptabilite.db'}"
+    assert initialiser_bdd(db_url)
+    pdf = str(DOSSIER_TEST / "bruneau.pdf")
+    regles = [("606", "Total HT")]
+
+    # Deux validations concordantes : le modèle remplace Gemini pour cette règle
+    assert enregistrer_validation("BRUNEAU", pdf, [("606", "26,42")], regles, db_url)
+    assert enregistrer_validation("BRUNEAU", pdf, [("606", "26,42")], regles, db_url)
+    assert imputations_par_modele("BRUNEAU", pdf, regles, db_url) == ("26.42",)
+
+    # Règle modifiée : le modèle ne lit plus le bon montant, il n'est plus utilisé
+    nouvelles_regles = [("606", "Montant TVA")]
+    assert imputations_par_modele("BRUNEAU", pdf, nouvelles_regles, db_url) is None
+
+    # La validation suivante réapprend le modèle avec la nouvelle règle
+    assert enregistrer_validation("BRUNEAU", pdf, [("606", "4,40")], nouvelles_regles, db_url)
+    enregistrement = get_modele_extraction("BRUNEAU", db_url)
+    assert enregistrement["nb_confirmations"] == 1
+    assert enregistrement["modele"]["606"]["regle"] == "Montant TVA"
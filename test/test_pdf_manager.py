@@ -0,0 +1,53 @@
+import fitz  # PyMuPDF
+from io import BytesIO
+from pypdf import PdfReader
+from src.pdf_manager import extraire_pages_pdf
+from src.appels_ia import analyser_regle, pages_des_regles, pages_facture
+
+
+def pdf_de_test(nombre_pages: int) -> bytes:
+    doc = fitz.open()
+    for num in range(1, nombre_pages + 1):
+        doc.new_page().insert_text((72, 72), f"Page {num}")
+    pdf_bytes = doc.tobytes()
+    doc.close()
+    return pdf_bytes
+
+
+def textes_pages(pdf_bytes: bytes) -> list:
+    return [page.extract_text().strip() for page in PdfReader(BytesIO(pdf_bytes)).pages]
+
+# ----------------------------
+# Test de extraire_pages_pdf
+# ----------------------------
+def test_premiere_et_derniere_page():
+    pdf_bytes = pdf_de_test(5)
+
+    assert textes_pages(extraire_pages_pdf(pdf_bytes, [1])) == ["Page 1"]
+    assert textes_pages(extraire_pages_pdf(pdf_bytes, [-1, 1])) == ["Page 1", "Page 5"]
+
+def test_document_complet_inchange():
+    pdf_bytes = pdf_de_test(2)
+
+    # Toutes les pages, ou aucune page existante : le PDF d'origine est renvoyé tel quel
+    assert extraire_pages_pdf(pdf_bytes, [1, 2]) is pdf_bytes
+    assert extraire_pages_pdf(pdf_bytes, [7]) is pdf_bytes
+
+# ----------------------------
+# Test de la déclaration de pages des règles
+# ----------------------------
+def test_pages_des_regles():
+    assert analyser_regle("[page:-1] Montant TTC") == ([-1], "Montant TTC")
+    assert analyser_regle("Montant TTC") == (None, "Montant TTC")
+
+    assert pages_des_regles([("606", "[page:1] Total HT"), ("445", "[pages:1,-1] TVA")]) == [-1, 1]
+    # Une règle sans déclaration impose le document complet
+    assert pages_des_regles([("606", "[page:1] Total HT"), ("445", "TVA")]) is None
+
+def test_pages_facture():
+    # Facture des pages 3 à 5 d'un document source : pages déclarées comptées dans la facture
+    assert pages_facture([("606", "[page:1] Total HT"), ("445", "[page:-1] TVA")], 3, 5) == [3, 5]
+    assert pages_facture([("606", "Total HT")], 3, 5) == [3, 4, 5]
+    assert pages_facture([("606", "[page:4] Total HT")], 3, 5) == [3, 4, 5] # Page hors de la facture
+    # Document d'une seule facture
+    assert pages_facture([("606", "[page:-1] Total HT")]) == [-1]
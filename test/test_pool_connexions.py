@@ -0,0 +1,72 @@
+import pytest
+import src.gestion_bdd as gestion_bdd
+from src.gestion_bdd import PoolConnexions
+
+
+class FausseConnexion:
+    def __init__(self, coupee=False):
+        self.closed = 0
+        self.coupee = coupee
+        self.rollbacks = 0
+
+    def cursor(self):
+        return self
+
+    def execute(self, requete):
+        if self.coupee:
+            raise ConnectionError("server closed the connection unexpectedly")
+
+    def rollback(self):
+        self.rollbacks += 1
+
+    def close(self):
+        self.closed = 1
+
+
+class FauxPool:
+    """Simule ThreadedConnectionPool : prête les connexions libres, en crée sinon."""
+    def __init__(self, minconn, maxconn, dsn):
+        self.libres = []
+        self.creees = 0
+
+    def getconn(self):
+        if self.libres:
+            return self.libres.pop()
+        self.creees += 1
+        return FausseConnexion()
+
+    def putconn(self, conn, close=False):
+        if close:
+            conn.close()
+        else:
+            self.libres.append(conn)
+
+
+@pytest.fixture(autouse=True)
+def faux_pool(monkeypatch):
+    monkeypatch.setattr(gestion_bdd, "ThreadedConnectionPool", FauxPool)
+
+# ----------------------------
+# Test du pool de connexions
+# ----------------------------
+def test_connexion_reutilisee():
+    pool = PoolConnexions("postgresql://test", 1, 2)
+    conn = pool.prendre()
+    pool.rendre(conn)
+
+    assert pool.prendre() is conn
+    assert conn.rollbacks == 1 # Transaction éventuelle annulée au retour
+    assert pool._pool.creees == 1
+
+def test_connexion_coupee_remplacee(monkeypatch):
+    pool = PoolConnexions("postgresql://test", 1, 2, delai_verification=10)
+    conn = pool.prendre()
+    pool.rendre(conn)
+
+    # Base mise en veille : la connexion inactive ne répond plus
+    conn.coupee = True
+    monkeypatch.setattr(gestion_bdd.time, "monotonic", lambda: 1e9)
+
+    nouvelle = pool.prendre()
+    assert nouvelle is not conn
+    assert conn.closed
@@ -0,0 +1,74 @@
+import threading
+import src.prechargement as prechargement
+from src.gestion_bdd import initialiser_bdd, ajouter_fournisseur_db, get_profil_fournisseur
+from src.prechargement import PrechargeurFactures, analyser_facture
+
+
+def tache_bloquee(debut: threading.Event, fin: threading.Event, resultat):
+    def tache():
+        debut.set()
+        fin.wait(5)
+        return resultat
+    return tache
+
+# ----------------------------
+# Test du préchargeur
+# ----------------------------
+def test_facture_affichee_prioritaire():
+    prechargeur = PrechargeurFactures(nb_workers=1)
+    ordre = []
+    debut, fin = threading.Event(), threading.Event()
+    prechargeur.planifier("occupe", tache_bloquee(debut, fin, "occupe"))
+    assert debut.wait(5) # Le seul worker est occupé : les tâches suivantes restent en file
+
+    for chemin in ("a", "b"):
+        prechargeur.planifier(chemin, lambda chemin=chemin: ordre.append(chemin) or chemin)
+    prechargeur.planifier("c", lambda: ordre.append("c") or "c", prioritaire=True)
+    prechargeur.planifier("b", lambda: ordre.append("b") or "b", prioritaire=True) # Remontée en tête
+    fin.set()
+
+    assert prechargeur.obtenir("a", timeout=5) == "a"
+    assert ordre == ["c", "b", "a"]
+
+def test_obtenir_attente_bornee():
+    prechargeur = PrechargeurFactures(nb_workers=1)
+    debut, fin = threading.Event(), threading.Event()
+    prechargeur.planifier("lent", tache_bloquee(debut, fin, "fini"))
+
+    assert prechargeur.obtenir("lent", timeout=0.05) is None
+    assert prechargeur.obtenir("jamais_planifie", timeout=0.05) is None
+    fin.set()
+    assert prechargeur.obtenir("lent", timeout=5) == "fini"
+
+def test_vider_ignore_les_analyses_obsoletes():
+    prechargeur = PrechargeurFactures(nb_workers=1)
+    debut, fin = threading.Event(), threading.Event()
+    prechargeur.planifier("facture", tache_bloquee(debut, fin, "ancienne serie"))
+    assert debut.wait(5)
+
+    # Nouvelle série pendant l'analyse : l'attente est débloquée et le résultat n'est pas gardé
+    prechargeur.vider()
+    assert prechargeur.obtenir("facture", timeout=0) is None
+    prechargeur.planifier("facture", lambda: "nouvelle serie")
+    fin.set()
+    assert prechargeur.obtenir("facture", timeout=5) == "nouvelle serie"
+
+def test_nom_approche_reconnu_en_arriere_plan(tmp_path, monkeypatch):
+    db_url = f"sqlite:///{tmp_path / 'comptabilite.db'}"
+    assert initialiser_bdd(db_url)
+    assert ajouter_fournisseur_db("BRUNEAU", None, "A", [("606100", "Total HT")], db_url)
+    regles_envoyees = []
+    monkeypatch.setattr(prechargement, "extraire_valeurs_regles",
+                        lambda source, client, regles, debut, fin: regles_envoyees.append(regles) or ("26.42",))
+
+    # Nom lu par l'extraction combinée différent du fournisseur connu
+    infos = {"nom_fournisseur": "SARL Bruneau", "date_facture": "29/09/2025", "source": "lot.pdf", "page_debut": 0, "page_fin": 0}
+    prechargeur = PrechargeurFactures(nb_workers=1)
+    prechargeur.planifier("facture.pdf", lambda: analyser_facture("facture.pdf", None, db_url, infos))
+    analyse = prechargeur.obtenir("facture.pdf", timeout=5)
+
+    # Résultat construit pour le fournisseur reconnu : l'écran le réutilise tel quel
+    assert analyse["fournisseur"] == "BRUNEAU" and analyse["fournisseur_lu"] == "SARL Bruneau"
+    assert analyse["associations"] == get_profil_fournisseur("BRUNEAU", db_url)["associations"]
+    assert analyse["imputations"] == ("26.42",)
+    assert regles_envoyees == [[("606100", "Total HT")]]
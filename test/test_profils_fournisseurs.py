@@ -0,0 +1,78 @@
+import pytest
+import src.gestion_bdd as gestion_bdd
+from src.gestion_bdd import (
+    get_profil_fournisseur, get_fournisseur_info, trouver_associations_fournisseur,
+    update_regles_fournisseur, CacheProfils,
+)
+
+COLONNES = ["id", "fournisseur", "fournisseur_associe", "mode", "associations"]
+
+
+class FausseBase:
+    """Connexion simulée : compte les requêtes, renvoie toujours la même ligne fournisseur."""
+    def __init__(self):
+        self.requetes = 0
+        self.description = [(colonne,) for colonne in COLONNES]
+        self.ligne = (1, "BRUNEAU", None, "A", [["606400", "Total HT"]])
+        self.parametres = []
+
+    def cursor(self):
+        return self
+
+    def execute(self, requete, parametres=None):
+        self.requetes += 1
+        self.parametres.append(parametres)
+
+    def fetchone(self):
+        return self.ligne
+
+    def commit(self):
+        pass
+
+
+@pytest.fixture
+def base(monkeypatch):
+    base = FausseBase()
+    monkeypatch.setattr(gestion_bdd, "_cache_profils", CacheProfils())
+    monkeypatch.setattr(gestion_bdd, "get_db_connection", lambda db_url: base)
+    monkeypatch.setattr(gestion_bdd, "rendre_connexion", lambda conn: None)
+    return base
+
+# ----------------------------
+# Test du profil fournisseur
+# ----------------------------
+def test_une_seule_requete_par_fournisseur(base):
+    profil = get_profil_fournisseur("Bruneau ", "db")
+
+    assert profil["mode"] == "A"
+    assert profil["associations"] == [("606400", "Total HT")]
+    assert get_fournisseur_info("BRUNEAU", "db") == "A"
+    assert trouver_associations_fournisseur("bruneau", "db") == [("606400", "Total HT")]
+    assert base.requetes == 1
+
+def test_modification_invalide_le_cache(base):
+    get_profil_fournisseur("BRUNEAU", "db")
+    update_regles_fournisseur("BRUNEAU", [("606100", "Total TTC")], "db")
+    get_profil_fournisseur("BRUNEAU", "db")
+
+    # Lecture, mise à jour, nouvelle lecture
+    assert base.requetes == 3
+
+def test_copie_du_profil(base):
+    get_profil_fournisseur("BRUNEAU", "db")["associations"].clear()
+
+    assert get_profil_fournisseur("BRUNEAU", "db")["associations"] == [("606400", "Total HT")]
+
+# ----------------------------
+# Test des règles d'imputation
+# ----------------------------
+def test_regles_remplacees_en_une_instruction(base):
+    regles = [("606400", "[page:-1] Total HT"), ("", "ignorée")] + [(f"6{i}", f"Règle {i}") for i in range(8)]
+    update_regles_fournisseur("Bruneau", regles, "db")
+
+    # Plus de limite à 6 comptes : une seule instruction pour les 9 règles
+    assert base.requetes == 1
+    valeur, positions, comptes, textes = base.parametres[0]
+    assert valeur == "BRUNEAU"
+    assert positions == list(range(1, 10))
+    assert comptes[0] == "606400" and textes[0] == "[page:-1] Total HT"
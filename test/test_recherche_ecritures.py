@@ -0,0 +1,35 @@
+import pytest
+from src.gestion_bdd import requete_recherche_ecritures
+
+# ----------------------------
+# Test de la requête du journal
+# ----------------------------
+def test_page_suivante_par_curseur():
+    sql_query, parametres = requete_recherche_ecritures(tri="compte_desc", apres=("01/025", 7), limite=50)
+
+    assert "(normaliser_compte(compte), id) < (%s, %s)" in sql_query
+    assert "ORDER BY normaliser_compte(compte) DESC, id DESC" in sql_query
+    # Une ligne de plus que la page pour savoir s'il en reste
+    assert parametres == ["01/025", 7, 51]
+
+def test_filtres_et_recherche_echappee():
+    sql_query, parametres = requete_recherche_ecritures(recherche="Bruneau 50%", date_min="2025-01-01", montant_max=100)
+
+    assert "texte_recherche_ecriture(fournisseur, compte, nom_fichier, date_facture) LIKE %s" in sql_query
+    assert "date_facture >= %s" in sql_query
+    assert "montant <= %s" in sql_query
+    assert parametres[0] == "%bruneau 50\\%%"
+
+def test_tri_par_pertinence():
+    sql_query, parametres = requete_recherche_ecritures(recherche="Brunau", tri="pertinence", apres=(0.8, 12), limite=50)
+
+    assert "OR %s <%% texte_recherche_ecriture(fournisseur, compte, nom_fichier, date_facture))" in sql_query
+    assert "word_similarity(%s, texte_recherche_ecriture(fournisseur, compte, nom_fichier, date_facture))" in sql_query
+    # Paramètres dans l'ordre du texte : score (SELECT), recherche, curseur, score (ORDER BY), limite
+    assert parametres == ["%brunau%", "brunau", "%brunau%", "brunau", "%brunau%", "brunau", 0.8, 12, "%brunau%", "brunau", 51]
+    # Sans texte recherché : tri par date
+    assert "ORDER BY COALESCE(date_facture, DATE '0001-01-01') DESC" in requete_recherche_ecritures(tri="pertinence")[0]
+
+def test_tri_inconnu():
+    with pytest.raises(ValueError):
+        requete_recherche_ecritures(tri="id; DROP TABLE ecritures_comptables")
@@ -0,0 +1,59 @@
+import pytest
+import src.resolution_fournisseurs as resolution_fournisseurs
+from src.resolution_fournisseurs import normaliser_nom, IndexFournisseurs, ResolveurFournisseurs
+
+FOURNISSEURS = [
+    {"fournisseur": "BRUNEAU", "fournisseur_associe": None},
+    {"fournisseur": "EDF", "fournisseur_associe": "ELECTRICITE DE FRANCE"},
+    {"fournisseur": "LYRECO", "fournisseur_associe": None},
+]
+
+
+class FausseBase:
+    """Compte les chargements de la liste des fournisseurs."""
+    def __init__(self):
+        self.chargements = 0
+        self.version = 0
+
+    def get_tous_les_fournisseurs(self, db_url):
+        self.chargements += 1
+        return FOURNISSEURS
+
+
+@pytest.fixture
+def base(monkeypatch):
+    base = FausseBase()
+    monkeypatch.setattr(resolution_fournisseurs, "get_tous_les_fournisseurs", base.get_tous_les_fournisseurs)
+    monkeypatch.setattr(resolution_fournisseurs, "version_fournisseurs", lambda: base.version)
+    return base
+
+# ----------------------------
+# Test de la normalisation
+# ----------------------------
+def test_normaliser_nom():
+    assert normaliser_nom("Sté Bruneau S.A.R.L.") == "BRUNEAU"
+    assert normaliser_nom("Électricité de France") == "ELECTRICITE FRANCE"
+    assert normaliser_nom("SAS") == "SAS"
+
+# ----------------------------
+# Test de l'index
+# ----------------------------
+def test_classement_des_candidats():
+    index = IndexFournisseurs(FOURNISSEURS)
+
+    assert index.rechercher("Bruneau SAS") == [("BRUNEAU", 1.0)]
+    assert index.rechercher("Electricite de France")[0] == ("EDF", 1.0)
+    meilleur, score = index.rechercher("BRUNEAUX")[0]
+    assert meilleur == "BRUNEAU" and 0.7 < score < 1
+    assert index.rechercher("Zzz") == []
+
+def test_resolveur_recharge_apres_modification(base):
+    resolveur = ResolveurFournisseurs("db")
+
+    assert resolveur.resoudre("Lyreco France SA", seuil=0.6) == "LYRECO"
+    assert resolveur.resoudre("Inconnue") is None
+    assert base.chargements == 1
+
+    base.version += 1  # un fournisseur a été modifié
+    resolveur.candidats("EDF")
+    assert base.chargements == 2
@@ -0,0 +1,42 @@
+from datetime import date
+import pytest
+from src.gestion_bdd import (
+    initialiser_bdd, ajouter_ecritures_comptables, update_ecriture, delete_ecriture, get_synthese_ecritures,
+)
+
+
+@pytest.fixture
+def db_url(tmp_path):
+    db_url = f"sqlite:///{tmp_path / 'comptabilite.db'}"
+    assert initialiser_bdd(db_url)
+    return db_url
+
+# ----------------------------
+# Test de la synthèse des écritures
+# ----------------------------
+def test_synthese_tenue_a_jour(db_url):
+    ids = ajouter_ecritures_comptables([
+        {"compte": "606100", "date_facture": date(2025, 1, 15), "fournisseur": "EDF", "montant": 100, "nom_fichier": "a.pdf"},
+        {"compte": "606100", "date_facture": date(2025, 1, 30), "fournisseur": "EDF", "montant": 50, "nom_fichier": "b.pdf"},
+        {"compte": "606400", "date_facture": date(2025, 3, 2), "fournisseur": "LYRECO", "montant": 20, "nom_fichier": "c.pdf"},
+        {"compte": "606400", "date_facture": None, "fournisseur": "LYRECO", "montant": 5, "nom_fichier": "d.pdf"},
+    ], db_url)
+
+    par_mois = get_synthese_ecritures(db_url, "mois", date(2025, 1, 1), date(2025, 12, 31))
+    assert [(l["cle"], l["nb_ecritures"], l["total"]) for l in par_mois] == [
+        (date(2025, 1, 1), 2, 150), (date(2025, 3, 1), 1, 20),
+    ]
+
+    # Modification (changement de mois et de montant) puis suppression
+    assert update_ecriture(ids[1], {"date_facture": date(2025, 3, 10), "montant": 60}, db_url)
+    assert delete_ecriture(ids[2], db_url)
+
+    par_mois = get_synthese_ecritures(db_url, "mois")
+    assert [(l["cle"], l["nb_ecritures"], l["total"]) for l in par_mois] == [
+        (None, 1, 5), (date(2025, 1, 1), 1, 100), (date(2025, 3, 1), 1, 60),
+    ]
+    par_compte = get_synthese_ecritures(db_url, "compte", date(2025, 1, 1), date(2025, 12, 31))
+    assert [(l["cle"], l["total"]) for l in par_compte] == [("606100", 160)]
+
+def test_axe_inconnu(db_url):
+    assert get_synthese_ecritures(db_url, "montant; DROP TABLE synthese_ecritures") == []
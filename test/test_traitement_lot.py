@@ -0,0 +1,70 @@
+import json
+import pytest
+from pathlib import Path
+from types import SimpleNamespace
+import src.traitement_lot as traitement_lot
+from src.appels_ia import liberer_documents
+from src.traitement_lot import soumettre_lot, etat_lot, recuperer_resultats_lot
+
+DOSSIER_TEST = Path(__file__).resolve().parent.parent / "data" / "fichiers_test"
+
+FACTURE = {"nom_fournisseur": "BRUNEAU", "numero_facture": "26.471.063", "date_facture": "29/09/2025",
+           "page_debut": 1, "page_fin": 1, "montant_total": "26,42"}
+
+
+class FauxLots:
+    """Simule `client.batches` : mémorise les requêtes et répond dans le même ordre."""
+    def __init__(self, refuser=False):
+        self.refuser = refuser
+        self.requetes = []
+
+    def create(self, model, src, config):
+        if self.refuser:
+            raise RuntimeError("API Batch indisponible")
+        self.requetes = src
+        return SimpleNamespace(name="batches/123")
+
+    def get(self, name):
+        reponses = [
+            SimpleNamespace(error=None, response=SimpleNamespace(text=json.dumps({"factures": [FACTURE]})))
+            for _ in self.requetes
+        ]
+        return SimpleNamespace(
+            state=SimpleNamespace(name="JOB_STATE_SUCCEEDED"),
+            dest=SimpleNamespace(inlined_responses=reponses),
+            completion_stats=None,
+        )
+
+
+@pytest.fixture(autouse=True)
+def sans_cache(monkeypatch):
+    monkeypatch.setattr(traitement_lot, "get_cache_ia", lambda: None)
+    yield
+    liberer_documents()
+
+# ----------------------------
+# Test du mode lot
+# ----------------------------
+def test_lot_gemini():
+    chemin = str(DOSSIER_TEST / "bruneau.pdf")
+    client = SimpleNamespace(batches=FauxLots())
+
+    suivi = soumettre_lot([chemin], client)
+    assert suivi["mode"] == "gemini"
+    assert len(client.batches.requetes) == 1
+
+    assert etat_lot(suivi, client) == "termine"
+    resultats = recuperer_resultats_lot(suivi, client)
+    assert resultats[chemin][0]["nom_fournisseur"] == "BRUNEAU"
+
+def test_lot_local_si_api_batch_refuse(monkeypatch):
+    chemin = str(DOSSIER_TEST / "bruneau.pdf")
+    client = SimpleNamespace(batches=FauxLots(refuser=True))
+    monkeypatch.setattr(traitement_lot, "extraire_facture_complete", lambda *args: [FACTURE])
+
+    suivi = soumettre_lot([chemin], client)
+    assert suivi["mode"] == "local"
+
+    traitement_lot._lots_locaux[suivi["nom"]][chemin].result(timeout=5)
+    assert etat_lot(suivi, client) == "termine"
+    assert recuperer_resultats_lot(suivi, client) == {chemin: [FACTURE]}